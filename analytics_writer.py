@@ -0,0 +1,156 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from database import record_contact_events
+from db_connection import ServiceError
+
+logger = logging.getLogger(__name__)
+
+# Attempts at writing what is still pending when the writer is closed.
+CLOSE_ATTEMPTS = 3
+
+
+class AnalyticsWriter:
+    """
+    Buffers analytics events in memory and writes them in batched transactions on a
+    background thread, when `flush_size` events are pending or `flush_interval` seconds
+    have passed since the first pending event. record() never touches the database.
+    close() (also registered with atexit) writes everything still queued, retrying a
+    failed write CLOSE_ATTEMPTS times; events that still can't be written are logged
+    and counted in `lost_events`. Events recorded after close() (by threads still
+    running at exit) are written synchronously, once; a failed write counts as lost too.
+    """
+
+    def __init__(self, flush_size=50, flush_interval=2.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.lost_events = 0
+
+    def record(self, contact_id, country, event_type, contact_level=None, priority=None, latency_ms=None):
+        """
+        Queue an event. The timestamp is taken now, not when the event is written.
+        :param event_type: "selected" or "emailed"
+        :param contact_level: the contact's level at the time of the event
+        :param priority: the country priority at the time of the pick
+        :param latency_ms: time taken to compose the email, for "emailed" events
+        """
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")  # same format as CURRENT_TIMESTAMP
+        event = (contact_id, event_type, country, timestamp, contact_level, priority, latency_ms)
+        # Checked and queued under the lock close() holds while queueing its stop sentinel,
+        # so no event can end up behind it.
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="AnalyticsWriter", daemon=True)
+                    self._thread.start()
+                self._queue.put(event)
+        if closed:
+            try:
+                record_contact_events([event])
+            except (sqlite3.Error, ServiceError, OSError) as e:
+                with self._lock:
+                    self.lost_events += 1
+                logger.error("An analytics event recorded after close could not be written and was lost: %s", e)
+
+    def flush(self, timeout=None):
+        """
+        Block until every event queued so far has been written.
+        :return: False if that didn't happen within `timeout` (e.g. the database is
+            unreachable) or events were lost on close
+        """
+        done = threading.Event()
+        with self._lock:
+            thread, closed = self._thread, self._closed
+            if thread is None:
+                return True
+            if not closed:
+                self._queue.put(done)
+        if closed:
+            thread.join(timeout)
+            return not thread.is_alive() and not self.lost_events
+        return done.wait(timeout) and not self.lost_events
+
+    def close(self, timeout=10):
+        """
+        Write all pending events and stop the background thread.
+        :return: False if events were lost (see lost_events) or the thread didn't finish in time
+        """
+        with self._lock:
+            if self._closed:
+                return not self.lost_events
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return False
+        return not self.lost_events
+
+    def _run(self):
+        pending, waiters = [], []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ...  # interval elapsed
+            stop = item is None
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif isinstance(item, tuple):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if stop:
+                self._write_on_close(pending)
+                for waiter in waiters:
+                    waiter.set()  # flush() reports lost events itself
+                return
+            if pending and (waiters or item is ... or len(pending) >= self.flush_size):
+                if self._write(pending):
+                    pending, deadline = [], None
+                else:
+                    # Keep the events and retry after another interval rather than dropping them.
+                    deadline = time.monotonic() + self.flush_interval
+            if not pending:
+                # Only now is everything queued before the waiters written.
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def _write_on_close(self, pending):
+        for attempt in range(CLOSE_ATTEMPTS):
+            if not pending or self._write(pending):
+                return
+            if attempt + 1 < CLOSE_ATTEMPTS:
+                time.sleep(min(self.flush_interval, 1.0))
+        with self._lock:
+            self.lost_events += len(pending)
+        logger.error("%d analytics events could not be written and were lost", len(pending))
+
+    def _write(self, events):
+        try:
+            record_contact_events(events)
+        except (sqlite3.Error, ServiceError, OSError) as e:  # database locked, service unreachable, ...
+            logger.warning("Writing %d analytics events failed, will retry: %s", len(events), e)
+            return False
+        return True
+
+
+# Shared writer used by the GUI; main.py closes it on exit.
+analytics_writer = AnalyticsWriter()
+atexit.register(analytics_writer.close)
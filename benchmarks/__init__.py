@@ -0,0 +1,4 @@
+"""
+Benchmark suite: synthetic data generators (datagen), the timed hot paths (run)
+and a comparison of two result files (compare). See run.py for usage.
+"""
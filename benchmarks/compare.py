@@ -0,0 +1,46 @@
+"""
+Compare two benchmark result files (from benchmarks.run) by median time.
+
+    python -m benchmarks.compare baseline.json new.json --threshold 10
+
+Exits with status 1 if any benchmark got slower by more than the threshold (percent).
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as file:
+        return {(result["name"], result["size"]): result for result in json.load(file)["results"]}
+
+
+def compare(baseline, current, threshold):
+    """ :return: (rows, regressions) where rows are (name, size, old ms, new ms, change %) """
+    rows, regressions = [], []
+    for key in sorted(set(baseline) & set(current), key=lambda key: (key[1], key[0])):
+        old, new = baseline[key]["median_ms"], current[key]["median_ms"]
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((*key, old, new, change))
+        if change > threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    rows, regressions = compare(load(args.baseline), load(args.current), args.threshold)
+    print(f"{'benchmark':28s} {'size':>8s} {'old ms':>10s} {'new ms':>10s} {'change':>8s}")
+    for name, size, old, new, change in rows:
+        flag = "  <-- slower" if (name, size) in regressions else ""
+        print(f"{name:28s} {size:8d} {old:10.2f} {new:10.2f} {change:+7.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Synthetic, reproducible data for the benchmarks: the same seed always produces the
+same contacts and events.
+"""
+import random
+from datetime import datetime, timedelta
+
+import db_connection
+from database import add_contacts_to_db, record_contact_events, set_country_priority
+from db_connection import transaction
+
+COUNTRIES = [
+    "USA", "UK", "Germany", "Canada", "France", "Japan", "Brazil", "Mexico", "India", "China",
+    "South Africa", "Nigeria", "Egypt", "Turkey", "Poland", "Indonesia", "Chile", "Peru",
+    "Colombia", "Argentina", "Kenya", "Ghana", "Vietnam", "Philippines", "Malaysia", "Thailand",
+    "Saudi Arabia", "Qatar", "Romania", "Hungary", "Czech Republic", "Ukraine", "Kazakhstan",
+    "Morocco", "Pakistan", "Sri Lanka", "Ecuador", "Uruguay", "Angola", "Zambia",
+]
+POSITIONS = ["Manager", "Developer", "Designer", "Analyst", "Director", "Economist",
+             "Portfolio Manager", "Strategist", "Minister", "Governor"]
+LEVELS = ["First Contact", "Second Contact", "Third Contact"]
+FIRST_NAMES = ["Ann", "Ben", "Chloe", "David", "Emma", "Farid", "Grace", "Hiro", "Ines", "Jon",
+               "Kemi", "Liam", "Maya", "Nikolai", "Olga", "Priya", "Quentin", "Rosa", "Sam", "Tariq"]
+LAST_NAMES = ["Smith", "Garcia", "Müller", "Okafor", "Tanaka", "Silva", "Kowalski", "Nguyen",
+              "Haddad", "Ivanova", "Patel", "Johnson", "Rossi", "Dubois", "Kim", "Mensah"]
+
+# Batch size for inserts
+BATCH_SIZE = 10000
+
+
+def country_weights(skew=1.2):
+    """ Zipf-like weights: the first countries get most of the contacts. skew=0 is uniform. """
+    return [1.0 / (rank ** skew) for rank in range(1, len(COUNTRIES) + 1)]
+
+
+def generate_contacts(count, seed=0, skew=1.2):
+    """ Yields (name, position, email, country, contact_level) tuples with unique emails. """
+    rng = random.Random(seed)
+    weights = country_weights(skew)
+    for number in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (f"{first} {last}", rng.choice(POSITIONS), f"{first}.{last}.{number}@example.com".lower(),
+               rng.choices(COUNTRIES, weights)[0], rng.choices(LEVELS, (5, 3, 2))[0])
+
+
+def generate_events(contacts, years=3, events_per_day=20, seed=0, end=None):
+    """
+    Yields analytics events (see database.record_contact_events) spread over `years`
+    years up to `end`: each "selected" event is followed by an "emailed" one about
+    half of the time.
+    :param contacts: list of (contact_id, country, contact_level)
+    """
+    rng = random.Random(seed)
+    end = end or datetime(2026, 1, 1)
+    day = end - timedelta(days=int(365 * years))
+    while day < end:
+        for _ in range(events_per_day):
+            contact_id, country, level = rng.choice(contacts)
+            moment = day + timedelta(seconds=rng.randrange(86400))
+            timestamp = moment.strftime("%Y-%m-%d %H:%M:%S")
+            priority = rng.randint(1, 5)
+            yield contact_id, "selected", country, timestamp, level, priority, None
+            if rng.random() < 0.5:
+                emailed = (moment + timedelta(minutes=rng.randrange(1, 60))).strftime("%Y-%m-%d %H:%M:%S")
+                yield contact_id, "emailed", country, emailed, level, priority, rng.uniform(50, 3000)
+        day += timedelta(days=1)
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_database(path, contacts=10000, years=3, events_per_day=20, seed=0, skew=1.2):
+    """
+    Create a database at `path` filled with synthetic data and make it the current
+    database (db_connection.configure).
+    :return: dict describing what was generated
+    """
+    db_connection.configure(path)
+    rng = random.Random(seed)
+    with transaction() as conn:
+        for batch in _batches(generate_contacts(contacts, seed, skew)):
+            add_contacts_to_db(batch)
+        for country in COUNTRIES:
+            set_country_priority(country, rng.randint(1, 5))
+        rows = [(row[0], row[1], row[2]) for row in conn.execute(
+            "SELECT id, country, priority FROM contacts_view")]
+    event_count = 0
+    for batch in _batches(generate_events(rows, years, events_per_day, seed)):
+        record_contact_events(batch)
+        event_count += len(batch)
+    db_connection.get_connection().execute("ANALYZE")
+    return {"contacts": contacts, "events": event_count, "years": years, "seed": seed, "skew": skew}
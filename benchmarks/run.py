@@ -0,0 +1,228 @@
+"""
+Times the hot paths on synthetic databases and writes the results as JSON.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.compare old.json new.json
+
+Each benchmark is run `--repeat` times after one warm-up run; the JSON holds
+min/median/p95 in milliseconds per (benchmark, size), plus the environment.
+Qt benchmarks use the offscreen platform, so no display is needed.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from benchmarks.datagen import build_database
+
+
+def measure(function, repeat):
+    function()  # warm-up (statement cache, page cache, imports)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+# =============================================================================
+# Benchmarks: name -> function(context) returning the callable to time
+# =============================================================================
+def bench_get_all_contacts(context):
+    from database import get_all_contacts
+    return get_all_contacts
+
+
+def bench_search_contacts(context):
+    from database import search_contacts
+    return lambda: search_contacts(name="ann", country="u", limit=500)
+
+
+def bench_apply_filters(context):
+    """ ManageContactsPage.apply_filters: first page of results into the table model. """
+    page = _manage_contacts_page(context)
+    texts = iter(["an", "ann", "smi", "a", ""] * 100000)
+
+    def run():
+        page.filter_name.setText(next(texts))  # textChanged -> apply_filters
+    return run
+
+
+def bench_scroll_table(context):
+    """ Fetch every page of the table model (what scrolling to the end does). """
+    page = _manage_contacts_page(context)
+
+    def run():
+        page.model.reload()
+        while page.model.canFetchMore():
+            page.model.fetchMore()
+    return run
+
+
+def bench_build_sampler(context):
+    from database import get_all_contacts, get_country_priorities
+    from sampler import ContactSampler
+    return lambda: ContactSampler(get_all_contacts(), get_country_priorities())
+
+
+def bench_pick_contact(context):
+    """ The selection done by MainWindow.show_notification, 1000 picks. """
+    from database import get_all_contacts, get_country_priorities
+    from sampler import ContactSampler
+    sampler = ContactSampler(get_all_contacts(), get_country_priorities())
+
+    def run():
+        for _ in range(1000):
+            sampler.pick()
+    return run
+
+
+def bench_analytics_summary(context):
+    from database import get_analytics_summary
+    return get_analytics_summary
+
+
+def bench_analytics_summary_30_days(context):
+    from database import get_analytics_summary
+    return lambda: get_analytics_summary("2025-12-01", "2026-01-01")
+
+
+def bench_find_duplicates(context):
+    """ The full-book duplicate sweep (dedupe.find_duplicates). """
+    from dedupe import find_duplicates
+    return find_duplicates
+
+
+def bench_find_similar(context):
+    """ The duplicate check run before a contact is added, 100 checks. """
+    from dedupe import find_similar
+    names = [("Ann Smyth", "ann.smith.7@example.com"), ("Garcia, David", "dgarcia@example.org"),
+             ("Dr. Priya Patel", "priya.patel+news@gmail.com"), ("Hiro Tanaka", "")] * 25
+
+    def run():
+        for name, email in names:
+            find_similar(name, email, "UK")
+    return run
+
+
+def bench_free_slots(context):
+    """ get_free_time_slots through the Outlook session, with a fake calendar. """
+    from calendar_provider import OutlookCalendarProvider
+    from email_utils import get_free_time_slots
+    from outlook_session import OutlookSession, FakeOutlookBackend, FakeAppointment
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    appointments = [FakeAppointment(start + timedelta(hours=3 * i), start + timedelta(hours=3 * i + 1))
+                    for i in range(200)]
+    session = OutlookSession(FakeOutlookBackend(appointments=appointments))
+    context["cleanup"].append(session.close)
+    provider = OutlookCalendarProvider(session)
+    return lambda: get_free_time_slots(provider)
+
+
+def _manage_contacts_page(context):
+    if "manage_contacts_page" not in context:
+        from PySide6.QtWidgets import QApplication
+        context["app"] = QApplication.instance() or QApplication([])
+        from gui import ManageContactsPage
+        page = ManageContactsPage(lambda **changes: None)
+        page.model.task_runner = None  # load synchronously so the load itself is timed
+        page.load_contacts()
+        context["manage_contacts_page"] = page
+    return context["manage_contacts_page"]
+
+
+BENCHMARKS = {
+    "get_all_contacts": bench_get_all_contacts,
+    "search_contacts": bench_search_contacts,
+    "apply_filters": bench_apply_filters,
+    "scroll_table": bench_scroll_table,
+    "build_sampler": bench_build_sampler,
+    "pick_contact_x1000": bench_pick_contact,
+    "analytics_summary": bench_analytics_summary,
+    "analytics_summary_30_days": bench_analytics_summary_30_days,
+    "find_duplicates": bench_find_duplicates,
+    "find_similar_x100": bench_find_similar,
+    "free_slots": bench_free_slots,
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(), "timestamp": datetime.now().isoformat(timespec="seconds")}
+
+
+def run(sizes, names, repeat, years, events_per_day, seed, workdir):
+    results = []
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        started = time.perf_counter()
+        dataset = build_database(path, contacts=size, years=years, events_per_day=events_per_day, seed=seed)
+        print(f"{size} contacts, {dataset['events']} events generated in "
+              f"{time.perf_counter() - started:.1f} s", file=sys.stderr)
+        context = {"cleanup": []}
+        for name in names:
+            result = {"name": name, "size": size, **measure(BENCHMARKS[name](context), repeat)}
+            print(f"  {name:28s} median {result['median_ms']:10.2f} ms", file=sys.stderr)
+            results.append(result)
+        for cleanup in context["cleanup"]:
+            cleanup()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated contact counts (up to 1000000)")
+    parser.add_argument("--only", default="", help="comma-separated benchmark names (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--years", type=float, default=3, help="years of analytics events")
+    parser.add_argument("--events-per-day", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="where the databases are created (default: a temp dir)")
+    parser.add_argument("--output", default="-", help="JSON file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.only.split(",") if name] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rollodex-bench-")
+
+    results = run(sizes, names, args.repeat, args.years, args.events_per_day, args.seed, workdir)
+    document = {"environment": environment(),
+                "parameters": {"sizes": sizes, "repeat": args.repeat, "years": args.years,
+                               "events_per_day": args.events_per_day, "seed": args.seed},
+                "results": results}
+    text = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
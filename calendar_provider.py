@@ -0,0 +1,380 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+class CalendarProvider:
+    """
+    Source of busy time and the user's display name.
+    Subclasses implement get_busy_slots() and get_user_name().
+    """
+
+    def thread_init(self):
+        """ Called once on each worker thread before the provider is used from it. """
+
+    def get_busy_slots(self, start, end):
+        """
+        :param start: timezone-aware datetime
+        :param end: timezone-aware datetime
+        :return: list of (start, end) timezone-aware datetimes overlapping [start, end)
+        """
+        raise NotImplementedError
+
+    def get_user_name(self):
+        raise NotImplementedError
+
+
+class OutlookCalendarProvider(CalendarProvider):
+    """
+    Reads the default Outlook calendar through the shared OutlookSession
+    (see outlook_session.py), which owns the COM connection.
+    """
+
+    def __init__(self, session=None):
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            from outlook_session import get_outlook_session
+            self._session = get_outlook_session()
+        return self._session
+
+    def get_busy_slots(self, start, end):
+        # Outlook reports appointment times as local wall-clock time.
+        tz = start.tzinfo
+        return [(_localize(tz, appt_start), _localize(tz, appt_end))
+                for appt_start, appt_end in self.session.get_appointments(start, end)]
+
+    def get_user_name(self):
+        user_name = [x.strip() for x in self.session.get_user_name().split(",")]
+        return f"{user_name[1][0].upper()}{user_name[1][1:].lower()} {user_name[0][0].upper()}{user_name[0][1:].lower()}"
+
+
+class IcsCalendarProvider(CalendarProvider):
+    """
+    Reads busy time from an iCalendar (.ics) file, for running without Outlook.
+    Supports UTC, TZID and floating DTSTART/DTEND values and all-day events;
+    recurrence rules are not expanded. The file is re-parsed when its mtime changes.
+    """
+
+    def __init__(self, path, user_name="", default_tz="Etc/UTC"):
+        self.path = path
+        self.user_name = user_name
+        self.default_tz = pytz.timezone(default_tz)
+        self._events = []
+        self._mtime = None
+
+    def get_busy_slots(self, start, end):
+        return [(s, e) for s, e in self._load() if s < end and e > start]
+
+    def get_user_name(self):
+        return self.user_name
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self._events = self.parse(file.read())
+            self._mtime = mtime
+        return self._events
+
+    def parse(self, text):
+        # Unfold continuation lines (RFC 5545 3.1)
+        lines = text.replace("\r\n", "\n").replace("\n ", "").replace("\n\t", "").split("\n")
+        events, event = [], None
+        for line in lines:
+            if line == "BEGIN:VEVENT":
+                event = {}
+            elif line == "END:VEVENT" and event is not None:
+                if "DTSTART" in event:
+                    start = event["DTSTART"]
+                    end = event.get("DTEND", start + timedelta(days=1))
+                    events.append((start, end))
+                event = None
+            elif event is not None and ":" in line:
+                name, value = line.split(":", 1)
+                key, *params = name.split(";")
+                if key in ("DTSTART", "DTEND"):
+                    event[key] = self._parse_datetime(value, dict(p.split("=", 1) for p in params if "=" in p))
+        events.sort()
+        return events
+
+    def _parse_datetime(self, value, params):
+        if params.get("VALUE") == "DATE" or len(value) == 8:
+            return self.default_tz.localize(datetime.strptime(value[:8], "%Y%m%d"))
+        if value.endswith("Z"):
+            return pytz.utc.localize(datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"))
+        tz = pytz.timezone(params["TZID"]) if "TZID" in params else self.default_tz
+        return tz.localize(datetime.strptime(value, "%Y%m%dT%H%M%S"))
+
+
+def default_provider():
+    """
+    The provider used by email_utils: an .ics file if ROLLODEX_CALENDAR_ICS is set,
+    otherwise Outlook.
+    """
+    ics_path = os.environ.get("ROLLODEX_CALENDAR_ICS")
+    if ics_path:
+        return IcsCalendarProvider(ics_path, user_name=os.environ.get("ROLLODEX_USER_NAME", ""))
+    return OutlookCalendarProvider()
+
+
+# =============================================================================
+# Free slot computation
+# =============================================================================
+
+# Working hours per weekday (0 = Monday): list of ("HH:MM", "HH:MM") windows.
+DEFAULT_WORKING_HOURS = {
+    0: [("09:00", "17:00")],
+    1: [("09:00", "17:00")],
+    2: [("09:00", "17:00")],
+    3: [("09:00", "17:00")],
+    4: [("09:00", "17:00")],
+    5: [],
+    6: [],
+}
+
+# Free slots are aligned to, and at least as long as, this granularity.
+DEFAULT_GRANULARITY = timedelta(minutes=30)
+
+
+def local_timezone():
+    """
+    Time zone named by ROLLODEX_TIMEZONE (e.g. "Europe/London"), else the system's.
+    The system zone is looked up by name (_system_timezone_name) so that days on either
+    side of a DST change get their own UTC offset; the current fixed offset is only
+    used when the system doesn't name its zone.
+    """
+    name = os.environ.get("ROLLODEX_TIMEZONE")
+    if name:
+        return pytz.timezone(name)
+    name = _system_timezone_name()
+    if name:
+        try:
+            return pytz.timezone(name)
+        except pytz.UnknownTimeZoneError:
+            pass
+    return datetime.now().astimezone().tzinfo
+
+
+def _system_timezone_name():
+    """ IANA name of the system time zone: from tzlocal if installed (Windows), else TZ or /etc/localtime. """
+    try:
+        import tzlocal
+    except ImportError:
+        tzlocal = None
+    if tzlocal is not None and hasattr(tzlocal, "get_localzone_name"):
+        try:
+            return tzlocal.get_localzone_name()
+        except Exception:  # tzlocal raises its own errors for unconfigured systems
+            pass
+    name = os.environ.get("TZ", "").lstrip(":")
+    if name and not os.path.isabs(name):
+        return name
+    path = os.path.realpath(name or "/etc/localtime")
+    marker = "zoneinfo" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return None
+
+
+def _localize(tz, naive):
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def _normalize(tz, moment):
+    """ Fix the UTC offset of a pytz datetime after arithmetic crossed a DST change. """
+    return tz.normalize(moment) if hasattr(tz, "normalize") else moment
+
+
+def merge_intervals(intervals):
+    """ Sort and merge overlapping/touching (start, end) intervals. """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _ceil(moment, day_start, granularity):
+    steps = -((day_start - moment) // granularity)
+    return day_start + steps * granularity
+
+
+def _floor(moment, day_start, granularity):
+    return day_start + ((moment - day_start) // granularity) * granularity
+
+
+def compute_free_slots(busy_slots, now, end_time, working_hours=None, granularity=DEFAULT_GRANULARITY):
+    """
+    Subtracts busy intervals from the working-hour windows of each day after `now`'s
+    day up to end_time, in `now`'s time zone.
+    Busy intervals are merged once and swept alongside the (chronological) windows,
+    so this is O(B log B + W) for B busy intervals and W windows.
+    :param busy_slots: iterable of (start, end) timezone-aware datetimes
+    :param now: timezone-aware datetime; its time zone is used for working hours
+    :param end_time: timezone-aware datetime
+    :param working_hours: dict weekday -> list of ("HH:MM", "HH:MM"), see DEFAULT_WORKING_HOURS
+    :param granularity: timedelta that free slot boundaries are aligned to
+    :return: list of (start, end) timezone-aware datetimes, in order
+    """
+    working_hours = DEFAULT_WORKING_HOURS if working_hours is None else working_hours
+    tz = now.tzinfo
+    busy = merge_intervals(busy_slots)
+    free, b = [], 0
+
+    day = now.date() + timedelta(days=1)  # Skip today
+    while day <= end_time.date():
+        midnight = _localize(tz, datetime.combine(day, datetime.min.time()))
+        for window_start, window_end in working_hours.get(day.weekday(), []):
+            cursor = _localize(tz, datetime.combine(day, datetime.strptime(window_start, "%H:%M").time()))
+            window_end = min(_localize(tz, datetime.combine(day, datetime.strptime(window_end, "%H:%M").time())),
+                             end_time)
+            # Busy intervals that ended before this window can never matter again.
+            while b < len(busy) and busy[b][1] <= cursor:
+                b += 1
+            i = b
+            while cursor < window_end:
+                if i < len(busy) and busy[i][0] < window_end:
+                    gap_end = busy[i][0]
+                    next_cursor = busy[i][1]
+                    i += 1
+                else:
+                    gap_end = next_cursor = window_end
+                start = _ceil(cursor, midnight, granularity)
+                end = _floor(min(gap_end, window_end), midnight, granularity)
+                if end - start >= granularity:
+                    free.append((_normalize(tz, start), _normalize(tz, end)))
+                cursor = max(cursor, next_cursor)
+        day += timedelta(days=1)
+    return free
+
+
+def format_free_slots(free_slots):
+    """
+    Groups free slots by day for display.
+    :return: dict - {"Monday, October 19": ["09:00 AM - 05:00 PM", ...], ...}
+    """
+    formatted = {}
+    for start, end in free_slots:
+        day = f"{start.strftime('%A')}, {start.strftime('%B %d')}"
+        formatted.setdefault(day, []).append(f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}")
+    return formatted
+
+
+def get_free_slots(provider, days=7, tz=None, working_hours=None, granularity=DEFAULT_GRANULARITY):
+    """
+    Retrieves free time slots for the next `days` days from the provider.
+    :return: list of (start, end) timezone-aware datetimes
+    """
+    tz = tz or local_timezone()
+    now = datetime.now(tz)
+    end_time = now + timedelta(days=days)
+    if hasattr(tz, "normalize"):
+        end_time = tz.normalize(end_time)  # fix the UTC offset if DST changes in between
+    return compute_free_slots(provider.get_busy_slots(now, end_time), now, end_time,
+                              working_hours, granularity)
+
+
+# =============================================================================
+# Background cache
+# =============================================================================
+class FreeSlotCache:
+    """
+    Caches the free slots (structured, see get_free_slots) and user name from a provider, refreshed on a background
+    thread. get() returns the cached values immediately while they are younger than
+    `ttl` seconds; stale values are still returned while a refresh runs in the
+    background. Only the very first call (nothing cached yet) waits for the provider.
+    """
+
+    def __init__(self, provider, ttl=300):
+        self.provider = provider
+        self.ttl = ttl
+        self._slots = None
+        self._user_name = None
+        self._fetched_at = 0.0
+        self._error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def prefetch(self):
+        """ Start the worker (if needed) and request a refresh. """
+        with self._lock:
+            if self._slots is None:
+                # Nothing to fall back on: get() waits for this attempt, not a past failure.
+                self._ready.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="FreeSlotCache", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def invalidate(self):
+        """ Mark the cached slots stale (e.g. after the calendar changed) and refresh. """
+        with self._lock:
+            self._fetched_at = 0.0
+        self.prefetch()
+
+    def get(self, timeout=30):
+        """
+        :return: (free_slots, user_name)
+        :raises: the provider's error if nothing could be fetched yet
+        """
+        if self._slots is None or time.monotonic() - self._fetched_at > self.ttl:
+            self.prefetch()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Timed out waiting for calendar data")
+        with self._lock:
+            if self._slots is None:
+                raise self._error
+            return self._slots, self._user_name
+
+    def _run(self):
+        try:
+            self.provider.thread_init()
+        except Exception as e:
+            with self._lock:
+                self._error = e
+                self._thread = None
+            self._ready.set()
+            return
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                fresh = self._slots is not None and time.monotonic() - self._fetched_at <= self.ttl
+            if fresh:
+                continue
+            try:
+                slots = get_free_slots(self.provider)
+                user_name = self.provider.get_user_name()
+            except Exception as e:
+                with self._lock:
+                    self._error = e
+            else:
+                with self._lock:
+                    self._slots, self._user_name = slots, user_name
+                    self._fetched_at = time.monotonic()
+                    self._error = None
+            self._ready.set()
+
+
+_cache = None
+
+def get_free_slot_cache():
+    """ Shared FreeSlotCache over default_provider(). """
+    global _cache
+    if _cache is None:
+        _cache = FreeSlotCache(default_provider())
+    return _cache
@@ -0,0 +1,317 @@
+import csv
+import json
+import os
+import re
+
+from database import add_contacts_to_db, get_contact_emails, iter_contacts, iter_analytics, write_batch
+
+CONTACT_LEVELS = ["First Contact", "Second Contact", "Third Contact"]
+DEFAULT_LEVEL = "First Contact"
+
+# Column names accepted in CSV headers / JSON keys, mapped to our fields.
+FIELD_ALIASES = {
+    "name": "name", "full name": "name", "full_name": "name",
+    "position": "position", "title": "position", "job title": "position",
+    "email": "email", "e-mail": "email", "email address": "email",
+    "country": "country",
+    "contact level": "level", "contact_level": "level", "level": "level", "priority": "level",
+}
+
+# Rows inserted per executemany call (all within one transaction).
+BATCH_SIZE = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = []  # (record number, reason)
+
+    @property
+    def processed(self):
+        return self.inserted + self.duplicates + len(self.invalid)
+
+    def summary(self):
+        return (f"Imported {self.inserted} contacts, skipped {self.duplicates} duplicates "
+                f"and {len(self.invalid)} invalid rows.")
+
+
+# =============================================================================
+# Readers (generators, one dict per contact)
+# =============================================================================
+def _normalize_keys(record):
+    contact = {}
+    for key, value in record.items():
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field and value is not None:
+            contact[field] = str(value).strip()
+    return contact
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            yield _normalize_keys(row)
+
+
+def read_json(path):
+    """
+    Reads a JSON array of objects (decoded one element at a time), or JSON Lines
+    (one object per line) for .jsonl/.ndjson files.
+    """
+    with open(path, encoding="utf-8") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line in file:
+                if line.strip():
+                    yield _normalize_keys(json.loads(line))
+        else:
+            for record in _iter_json_array(file):
+                yield _normalize_keys(record)
+
+
+def _iter_json_array(file, chunk_size=65536):
+    """ Yields the elements of a top-level JSON array, reading the file in chunks. """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    started = False
+
+    def skip(separators):
+        nonlocal position
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in separators):
+            position += 1
+
+    while True:
+        skip("," if started else "")
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array of contacts")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A value ending the buffer (a number) may continue in the next chunk.
+                if end < len(buffer) or eof:
+                    yield element
+                    position = end
+                    continue
+        elif eof:
+            raise ValueError("Unexpected end of the JSON array")
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_vcard(path):
+    """
+    Reads FN, TITLE, EMAIL, the ADR country component and X-CONTACT-LEVEL from each
+    vCard, streaming line by line.
+    """
+    contact = None
+    with open(path, encoding="utf-8") as file:
+        lines = _unfold(file)
+        for line in lines:
+            if ":" not in line:
+                continue
+            name, value = line.split(":", 1)
+            key = name.split(";")[0].upper()
+            if key == "BEGIN" and value.strip().upper() == "VCARD":
+                contact = {}
+            elif key == "END" and contact is not None:
+                yield contact
+                contact = None
+            elif contact is None:
+                continue
+            elif key == "FN":
+                contact["name"] = _unescape(value).strip()
+            elif key == "TITLE":
+                contact["position"] = _unescape(value).strip()
+            elif key == "EMAIL" and "email" not in contact:
+                contact["email"] = _unescape(value).strip()
+            elif key == "ADR":
+                parts = _split_components(value)
+                if len(parts) >= 7 and parts[6].strip():
+                    contact["country"] = _unescape(parts[6]).strip()
+            elif key == "X-CONTACT-LEVEL":
+                contact["level"] = _unescape(value).strip()
+
+
+def _split_components(value):
+    """ Splits a structured value (ADR) on its unescaped semicolons; parts stay escaped. """
+    parts, current, escaped = [], [], False
+    for char in value:
+        if char == ";" and not escaped:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+        escaped = char == "\\" and not escaped
+    parts.append("".join(current))
+    return parts
+
+
+def _escape(value):
+    """ Escapes a text value for a vCard line (RFC 6350 section 3.4). """
+    return (str(value or "").replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+            .replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n"))
+
+
+def _unescape(value):
+    """ Reverses _escape; "\\N" is read as a newline too. """
+    return re.sub(r"\\(.)", lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _unfold(lines):
+    previous = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and previous is not None:
+            previous += line[1:]
+            continue
+        if previous is not None:
+            yield previous
+        previous = line
+    if previous is not None:
+        yield previous
+
+
+READERS = {".csv": read_csv, ".json": read_json, ".jsonl": read_json, ".ndjson": read_json,
+           ".vcf": read_vcard, ".vcard": read_vcard}
+
+
+def read_contacts(path):
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {path}")
+    return reader(path)
+
+
+# =============================================================================
+# Import
+# =============================================================================
+def validate_contact(contact):
+    """
+    The email is optional (stored as NULL), but must look like one when given.
+    :return: (row tuple for add_contacts_to_db, None) or (None, reason)
+    """
+    name = contact.get("name", "")
+    email = contact.get("email", "")
+    country = contact.get("country", "")
+    level = contact.get("level") or DEFAULT_LEVEL
+    if not name:
+        return None, "missing name"
+    if email and "@" not in email:
+        return None, "invalid email"
+    if not country:
+        return None, "missing country"
+    matches = [known for known in CONTACT_LEVELS if known.lower() == level.lower()]
+    if not matches:
+        return None, f"unknown contact level '{level}'"
+    return (name, contact.get("position", ""), email, country, matches[0]), None
+
+
+def import_contacts(path, progress_callback=None):
+    """
+    Streams contacts from a CSV/JSON/vCard file, validates them, skips emails that are
+    already in the database or earlier in the file, and inserts the rest in a single
+    transaction (executemany in batches of BATCH_SIZE).
+    :param progress_callback: called as progress_callback(report) after each batch
+    :return: ImportReport
+    """
+    report = ImportReport()
+    seen_emails = get_contact_emails()
+    batch = []
+    with write_batch():
+        for number, contact in enumerate(read_contacts(path), start=1):
+            row, reason = validate_contact(contact)
+            if row is None:
+                report.invalid.append((number, reason))
+                continue
+            email = row[2].lower()
+            if email:  # contacts without an email are stored with NULL and never duplicates
+                if email in seen_emails:
+                    report.duplicates += 1
+                    continue
+                seen_emails.add(email)
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                report.inserted += add_contacts_to_db(batch)
+                batch = []
+                if progress_callback:
+                    progress_callback(report)
+        if batch:
+            report.inserted += add_contacts_to_db(batch)
+    if progress_callback:
+        progress_callback(report)
+    return report
+
+
+# =============================================================================
+# Export
+# =============================================================================
+CONTACT_EXPORT_FIELDS = ["id", "name", "position", "email", "country", "contact_level"]
+ANALYTICS_EXPORT_FIELDS = ["id", "contact_id", "event_type", "country", "timestamp",
+                           "contact_level", "priority", "latency_ms"]
+
+
+EXPORT_EXTENSIONS = (".csv", ".json", ".jsonl", ".ndjson")
+
+
+def _write_rows(path, fields, rows):
+    count = 0
+    ext = os.path.splitext(path)[1].lower()
+    # Checked before open() truncates the file.
+    if ext not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type: {path}")
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if ext == ".csv":
+            writer = csv.writer(file)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        elif ext == ".json":
+            # A JSON array, written one element at a time
+            file.write("[")
+            for row in rows:
+                file.write((",\n" if count else "\n") + json.dumps(dict(zip(fields, row))))
+                count += 1
+            file.write("\n]\n")
+        else:
+            for row in rows:
+                file.write(json.dumps(dict(zip(fields, row))) + "\n")
+                count += 1
+    return count
+
+
+def export_contacts(path):
+    """
+    Streams all contacts to a .csv, .json, .jsonl or .vcf file.
+    :return: number of contacts written
+    """
+    if os.path.splitext(path)[1].lower() in (".vcf", ".vcard"):
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as file:  # the lines already end in \r\n
+            for contact_id, name, position, email, country, level in iter_contacts():
+                file.write("BEGIN:VCARD\r\nVERSION:3.0\r\n"
+                           f"FN:{_escape(name)}\r\nTITLE:{_escape(position)}\r\nEMAIL:{_escape(email)}\r\n"
+                           f"ADR:;;;;;;{_escape(country)}\r\nX-CONTACT-LEVEL:{_escape(level)}\r\nEND:VCARD\r\n")
+                count += 1
+        return count
+    return _write_rows(path, CONTACT_EXPORT_FIELDS, iter_contacts())
+
+
+def export_analytics(path):
+    """
+    Streams the analytics events to a .csv, .json or .jsonl file.
+    :return: number of events written
+    """
+    return _write_rows(path, ANALYTICS_EXPORT_FIELDS, iter_analytics())
@@ -0,0 +1,185 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+
+from database import CONTACT_COLUMNS, search_contacts, get_contacts_by_ids
+from tracing import traced
+
+
+class ContactTableModel(QAbstractTableModel):
+    """
+    Table model over the contacts table.
+    Only the ids matching the current filters are kept, fetched a page at a time as the
+    view scrolls (canFetchMore/fetchMore); contact rows are loaded per page and cached.
+    Filtering and sorting are done in SQL by search_contacts(). With a task_runner,
+    reloads (new filters or sort order) and further pages run on a worker thread, and
+    a load still in flight is superseded by the next reload. Incremental updates (contact_added, ...) take
+    contact tuples the caller loaded, and find rows through an id -> row index.
+    """
+    HEADERS = ["Name", "Position", "Email", "Country", "Contact Level"]
+    PAGE_SIZE = 500
+
+    load_failed = Signal(str)  # error message of a failed background reload
+
+    def __init__(self, parent=None, task_runner=None):
+        super().__init__(parent)
+        self.task_runner = task_runner
+        self.filters = {}
+        self.order_by = None
+        self.descending = False
+        self.ids = []        # ids fetched so far, in display order
+        self.rows = {}       # id -> row, kept in step with ids
+        self.contacts = {}   # id -> contact tuple (id, name, position, email, country, contact_level)
+        self.exhausted = True
+        self.loading = False  # a background load is in flight; no other page is fetched meanwhile
+
+    # ---- Qt model interface ----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        contact = self.contacts.get(self.ids[index.row()])
+        if contact is None:
+            return None
+        return contact[index.column() + 1]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    @traced(category="ui")
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.loading:
+            return
+        args = (dict(self.filters), self.order_by, self.descending, len(self.ids))
+        if self.task_runner is None:
+            self._show_next_page(self._load_page(*args))
+        else:
+            self.loading = True
+            self.task_runner.submit(self._load_page, *args, key=("contacts-reload", id(self)),
+                                    name="load contacts page", on_result=self._show_next_page,
+                                    on_error=self._load_error)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.order_by = CONTACT_COLUMNS[column]
+        self.descending = order == Qt.DescendingOrder
+        self.reload()
+
+    # ---- Loading ----
+
+    def set_filters(self, **filters):
+        """ Apply new column filters (see database.search_contacts) and reload. """
+        self.filters = filters
+        self.reload()
+
+    def reload(self):
+        args = (dict(self.filters), self.order_by, self.descending, 0)
+        if self.task_runner is None:
+            self._show_first_page(self._load_page(*args))
+        else:
+            self.loading = True
+            self.task_runner.submit(self._load_page, *args, key=("contacts-reload", id(self)),
+                                    name="load contacts", on_result=self._show_first_page,
+                                    on_error=self._load_error)
+
+    @classmethod
+    @traced(category="model")
+    def _load_page(cls, filters, order_by, descending, offset):
+        """ Runs on a worker thread: must not touch the model. """
+        ids = search_contacts(limit=cls.PAGE_SIZE, offset=offset, order_by=order_by, descending=descending, **filters)
+        return ids, get_contacts_by_ids(ids)
+
+    def _load_error(self, error):
+        self.loading = False
+        self.load_failed.emit(str(error))
+
+    @traced(category="ui")
+    def _show_first_page(self, page):
+        ids, contacts = page
+        self.loading = False
+        self.beginResetModel()
+        self.ids = ids
+        self.rows = {contact_id: row for row, contact_id in enumerate(ids)}
+        self.contacts = contacts
+        self.exhausted = len(ids) < self.PAGE_SIZE
+        self.endResetModel()
+
+    @traced(category="ui")
+    def _show_next_page(self, page):
+        ids, contacts = page
+        self.loading = False
+        self.exhausted = len(ids) < self.PAGE_SIZE
+        ids = [contact_id for contact_id in ids if contact_id not in self.rows]  # e.g. added meanwhile
+        if not ids:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.ids), len(self.ids) + len(ids) - 1)
+        self.rows.update((contact_id, row) for row, contact_id in enumerate(ids, start=len(self.ids)))
+        self.ids.extend(ids)
+        self.contacts.update(contacts)
+        self.endInsertRows()
+
+    # ---- Incremental updates ----
+
+    def contact_id(self, row):
+        return self.ids[row]
+
+    def row_of(self, contact_id):
+        return self.rows.get(contact_id, -1)
+
+    def matches_filters(self, contact):
+        for column, text in self.filters.items():
+            value = contact[CONTACT_COLUMNS.index(column) + 1] or ""
+            if text.strip().lower() not in value.lower():
+                return False
+        return True
+
+    def contact_added(self, contact):
+        """
+        Show a newly added contact (tuple) if it matches the filters. While more pages
+        are still to be fetched it will appear when the view scrolls to it.
+        """
+        contact_id = contact[0]
+        if contact_id in self.rows:
+            self.contact_updated(contact_id, contact)
+            return
+        if not self.exhausted or not self.matches_filters(contact):
+            return
+        row = len(self.ids)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.ids.append(contact_id)
+        self.rows[contact_id] = row
+        self.contacts[contact_id] = contact
+        self.endInsertRows()
+
+    def contact_updated(self, contact_id, contact):
+        """ :param contact: the contact's new tuple, or None if it no longer exists """
+        row = self.row_of(contact_id)
+        if row < 0:
+            if contact is not None:
+                self.contact_added(contact)
+            return
+        if contact is None or not self.matches_filters(contact):
+            self.contact_removed(contact_id)
+            return
+        self.contacts[contact_id] = contact
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def contact_removed(self, contact_id):
+        row = self.row_of(contact_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.ids[row]
+        del self.rows[contact_id]
+        for later_row in range(row, len(self.ids)):  # the rows below move up
+            self.rows[self.ids[later_row]] = later_row
+        self.contacts.pop(contact_id, None)
+        self.endRemoveRows()
@@ -124,123 +124,375 @@
 # setup_database()
 
 
-import sqlite3
+import functools
 import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 
-DB_NAME = "contacts.db"
+from db_connection import get_connection, transaction, on_database_switch, on_rollback
+from migrations import DEFAULT_COOLDOWN_DAYS
+from tracing import traced
 
 def setup_database():
-    create_tables = not os.path.exists(DB_NAME)
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # Contacts table: priority is stored as TEXT (contact level)
-    cursor.execute('''CREATE TABLE IF NOT EXISTS contacts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT,
-                        position TEXT,
-                        email TEXT,
-                        country TEXT,
-                        priority TEXT)''')
-    
-    # Settings table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS settings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        frequency TEXT,
-                        time TEXT)''')
-    
-    # Country priority table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS country_priority (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        country TEXT UNIQUE,
-                        priority INTEGER)''')
-    
-    # Analytics table: records events when a contact is selected or emailed.
-    cursor.execute('''CREATE TABLE IF NOT EXISTS analytics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        contact_id INTEGER,
-                        event_type TEXT,   -- "selected" or "emailed"
-                        country TEXT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )''')
-    
-    conn.commit()
-    conn.close()
+    """
+    Create or upgrade the schema (see migrations.py) now. Not required: this also
+    happens on the first connection.
+    """
+    clear_caches()
+    get_connection()
+
+def clear_caches():
+    """ Forget cached lookups, e.g. after a write was rolled back or db_connection.configure switched files. """
+    _level_ids.clear()
+    _distinct_values.clear()
+
+on_database_switch(clear_caches)
+# A rolled-back transaction may have added a contact level, whose id _level_id has cached.
+on_rollback(clear_caches)
+
+# ---------------------------
+# Contacts
+# (stored with the level as an id into contact_levels; read through contacts_view,
+#  which returns (id, name, position, email, country, contact level name))
+# ---------------------------
+
+# Contact level name -> id, filled from contact_levels on first use.
+_level_ids = {}
+
+def _level_id(conn, level):
+    """ Id of the named contact level; unknown names are added to contact_levels. """
+    if not _level_ids:
+        _level_ids.update((name, level_id) for level_id, name in conn.execute("SELECT id, name FROM contact_levels"))
+    level_id = _level_ids.get(level)
+    if level_id is None:
+        conn.execute("INSERT OR IGNORE INTO contact_levels (name) VALUES (?)", (level,))
+        level_id = conn.execute("SELECT id FROM contact_levels WHERE name = ?", (level,)).fetchone()[0]
+        _level_ids[level] = level_id
+    return level_id
+
+def _contact_row(conn, name, position, email, country, priority):
+    email = (email or "").strip() or None  # NULL rather than '' so the unique index ignores it
+    return (name, position or "", email, country or "", _level_id(conn, priority))
+
+def _index_contact_keys(conn, where, params=()):
+    """ (Re)write the duplicate detection keys (see dedupe.py) of the contacts matching `where`. """
+    from dedupe import blocking_keys  # dedupe imports this module
+    rows = conn.execute(f"SELECT id, name, email FROM contacts WHERE {where}", params).fetchall()
+    conn.executemany("DELETE FROM contact_keys WHERE contact_id = ?", [(row[0],) for row in rows])
+    conn.executemany("INSERT INTO contact_keys (key, contact_id) VALUES (?, ?)",
+                     [(key, contact_id) for contact_id, name, email in rows for key in blocking_keys(name, email)])
 
 def add_contact_to_db(name, position, email, country, priority):
     """
     priority: For contacts this can be a text representing the contact level.
+    :raises sqlite3.IntegrityError: if another contact already has this email
+    """
+    with transaction() as conn:
+        contact_id = conn.execute(
+            "INSERT INTO contacts (name, position, email, country, level) VALUES (?, ?, ?, ?, ?)",
+            _contact_row(conn, name, position, email, country, priority)).lastrowid
+        _index_contact_keys(conn, "id = ?", (contact_id,))
+    _distinct_values.clear()
+    return contact_id
+
+def add_contacts_to_db(contacts):
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO contacts (name, position, email, country, priority) VALUES (?, ?, ?, ?, ?)",
-                   (name, position, email, country, priority))
-    conn.commit()
-    conn.close()
+    Insert many contacts with one executemany in the current (or a new) transaction.
+    :param contacts: iterable of (name, position, email, country, priority) tuples
+    :return: number of rows inserted
+    """
+    with transaction() as conn:
+        # AUTOINCREMENT ids only grow, so the new rows are the ones above the current maximum.
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM contacts").fetchone()[0]
+        inserted = conn.executemany(
+            "INSERT INTO contacts (name, position, email, country, level) VALUES (?, ?, ?, ?, ?)",
+            (_contact_row(conn, *contact) for contact in contacts)).rowcount
+        _index_contact_keys(conn, "id > ?", (last_id,))
+    _distinct_values.clear()
+    return inserted
 
 def get_all_contacts():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM contacts")
-    contacts = cursor.fetchall()
-    conn.close()
+    return get_connection().execute("SELECT * FROM contacts_view").fetchall()
+
+def iter_contacts(batch_size=1000):
+    """ Yields contact tuples without loading the whole table into memory. """
+    cursor = get_connection().execute("SELECT * FROM contacts_view ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def get_contact_emails():
+    """ Returns the set of lower-cased emails of all contacts. """
+    return {row[0] for row in get_connection().execute(
+        "SELECT lower(email) FROM contacts WHERE email IS NOT NULL")}
+
+def get_contact(contact_id):
+    """ Returns the contact tuple for the given id, or None. """
+    return get_connection().execute("SELECT * FROM contacts_view WHERE id = ?", (contact_id,)).fetchone()
+
+# SQLite's default limit on host parameters per statement is 999.
+_MAX_PARAMS = 900
+
+def get_contacts_by_ids(contact_ids):
+    """ Returns a dict {id: contact tuple} for the given ids. """
+    contact_ids = list(contact_ids)
+    contacts = {}
+    conn = get_connection()
+    for start in range(0, len(contact_ids), _MAX_PARAMS):
+        chunk = contact_ids[start:start + _MAX_PARAMS]
+        rows = conn.execute(f"SELECT * FROM contacts_view WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        contacts.update((row[0], row) for row in rows)
     return contacts
 
 def update_contact_in_db(contact_id, name, position, email, country, priority):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE contacts SET name = ?, position = ?, email = ?, country = ?, priority = ? WHERE id = ?",
-        (name, position, email, country, priority, contact_id)
-    )
-    conn.commit()
-    conn.close()
+    """ :raises sqlite3.IntegrityError: if another contact already has this email """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE contacts SET name = ?, position = ?, email = ?, country = ?, level = ? WHERE id = ?",
+            (*_contact_row(conn, name, position, email, country, priority), contact_id)
+        )
+        _index_contact_keys(conn, "id = ?", (contact_id,))
+    _distinct_values.clear()
 
 def delete_contact_from_db(contact_id):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+    _distinct_values.clear()
+
+def update_contacts_in_db(contact_ids, **fields):
+    """
+    Set the same field values on several contacts in one transaction.
+    :param contact_ids: iterable of contact ids
+    :param fields: column values to set, e.g. country="UK", priority="Second Contact"
+    """
+    fields = {column: value for column, value in fields.items() if column in CONTACT_COLUMNS}
+    if not fields:
+        return
+    with transaction() as conn:
+        if "priority" in fields:
+            fields["level"] = _level_id(conn, fields.pop("priority"))
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        contact_ids = list(contact_ids)
+        conn.executemany(f"UPDATE contacts SET {assignments} WHERE id = ?",
+                         [(*fields.values(), contact_id) for contact_id in contact_ids])
+        if "name" in fields or "email" in fields:
+            for start in range(0, len(contact_ids), _MAX_PARAMS):
+                chunk = contact_ids[start:start + _MAX_PARAMS]
+                _index_contact_keys(conn, f"id IN ({', '.join('?' * len(chunk))})", chunk)
+    _distinct_values.clear()
+
+def delete_contacts_from_db(contact_ids):
+    """ Delete several contacts in one transaction. """
+    with transaction() as conn:
+        conn.executemany("DELETE FROM contacts WHERE id = ?", [(contact_id,) for contact_id in contact_ids])
+    _distinct_values.clear()
+
+# ---------------------------
+# Duplicate Contacts
+# (candidate lookups for dedupe.py; contact_keys is written with the contacts above)
+# ---------------------------
+
+def get_contact_key_blocks(max_block_size, max_gram_block_size):
+    """
+    Returns [(key, [contact ids])] for every key shared by 2 to max_block_size contacts
+    (max_gram_block_size for the "g:" name trigram keys). Larger blocks are skipped.
+    """
+    rows = get_connection().execute(
+        "SELECT key, group_concat(contact_id) FROM contact_keys GROUP BY key "
+        "HAVING COUNT(*) BETWEEN 2 AND (CASE WHEN key LIKE 'g:%' THEN ? ELSE ? END)",
+        (max_gram_block_size, max_block_size))
+    return [(key, [int(contact_id) for contact_id in ids.split(",")]) for key, ids in rows]
+
+def get_contacts_with_keys(keys, max_block_size, max_gram_block_size):
+    """
+    Returns [(key, contact_id)] for the contacts filed under any of `keys`, skipping
+    keys shared by more than max_block_size (max_gram_block_size) contacts.
+    Each key reads at most one more row than its limit from the index.
+    """
+    conn = get_connection()
+    matches = []
+    for key in keys:
+        limit = max_gram_block_size if key.startswith("g:") else max_block_size
+        ids = conn.execute("SELECT contact_id FROM contact_keys WHERE key = ? LIMIT ?", (key, limit + 1)).fetchall()
+        if len(ids) <= limit:
+            matches.extend((key, contact_id) for contact_id, in ids)
+    return matches
+
+def merge_contacts(keep_id, duplicate_ids):
+    """
+    Merge duplicates into the contact `keep_id` in one transaction: its empty fields are
+    filled from the duplicates (lowest id first), their analytics events move to it,
+    and they are deleted. The kept contact's level is unchanged.
+    :return: the merged contact tuple
+    """
+    duplicate_ids = [contact_id for contact_id in duplicate_ids if contact_id != keep_id]
+    placeholders = ", ".join("?" * len(duplicate_ids))
+    with transaction() as conn:
+        keep = conn.execute("SELECT name, position, email, country FROM contacts WHERE id = ?", (keep_id,)).fetchone()
+        if keep is None:
+            raise ValueError(f"Contact {keep_id} does not exist.")
+        merged = list(keep)
+        if duplicate_ids:
+            duplicates = conn.execute(f"SELECT name, position, email, country FROM contacts "
+                                      f"WHERE id IN ({placeholders}) ORDER BY id", duplicate_ids).fetchall()
+            for duplicate in duplicates:
+                merged = [value if value else other for value, other in zip(merged, duplicate)]
+            conn.execute(f"UPDATE analytics SET contact_id = ? WHERE contact_id IN ({placeholders})",
+                         (keep_id, *duplicate_ids))
+            # Delete first: the kept contact may take over a duplicate's (unique) email.
+            conn.execute(f"DELETE FROM contacts WHERE id IN ({placeholders})", duplicate_ids)
+            conn.execute("UPDATE contacts SET name = ?, position = ?, email = ?, country = ? WHERE id = ?",
+                         (*merged, keep_id))
+            _index_contact_keys(conn, "id = ?", (keep_id,))
+            # The rollup triggers only follow inserts and deletes; recount the kept contact.
+            conn.execute(f"DELETE FROM analytics_contact_rollup WHERE contact_id IN (?, {placeholders})",
+                         (keep_id, *duplicate_ids))
+            conn.execute('''INSERT INTO analytics_contact_rollup
+                                (contact_id, selected_count, emailed_count, last_selected, last_emailed, last_contacted)
+                            SELECT contact_id, SUM(event_type = 'selected'), SUM(event_type = 'emailed'),
+                                   MAX(CASE WHEN event_type = 'selected' THEN timestamp END),
+                                   MAX(CASE WHEN event_type = 'emailed' THEN timestamp END),
+                                   MAX(timestamp)
+                            FROM analytics WHERE contact_id = ? GROUP BY contact_id''', (keep_id,))
+    _distinct_values.clear()
+    return get_contact(keep_id)
+
+# ---------------------------
+# Contact Search
+# ---------------------------
+
+# Trigram index needs at least 3 characters; shorter filters are matched by scanning.
+_FTS_MIN_LENGTH = 3
+
+# Distinct values of the low-cardinality columns (country, priority), cleared on every
+# contact write. Filters on those columns are resolved against this short list and
+# pushed down as an indexed "IN (...)".
+_distinct_values = {}
+
+def _matching_values(column, text):
+    values = _distinct_values.get(column)
+    if values is None:
+        values = [row[0] for row in get_connection().execute(
+            f"SELECT DISTINCT {column} FROM contacts_view WHERE {column} IS NOT NULL")]
+        _distinct_values[column] = values
+    return [value for value in values if text in value.lower()]
+
+def _has_contact_fts():
+    return get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'").fetchone() is not None
+
+CONTACT_COLUMNS = ("name", "position", "email", "country", "priority")
+
+def search_contacts(name="", position="", email="", country="", priority="", limit=None, offset=0,
+                    order_by=None, descending=False):
+    """
+    Returns the ids of contacts whose fields contain all of the given filters
+    (case-insensitive substring match).
+    :param name/position/email/country/priority: filter text; empty strings match everything
+    :param limit: maximum number of ids to return (None for all)
+    :param offset: number of matching ids to skip, for paging
+    :param order_by: one of CONTACT_COLUMNS to sort by (default: id)
+    :param descending: reverse the sort order
+    """
+    conditions, params = [], []
+
+    for column, text in (("country", country), ("priority", priority)):
+        text = text.strip().lower()
+        if text:
+            values = _matching_values(column, text)
+            if not values:
+                return []
+            if column == "priority":
+                # Filter on the indexed level ids rather than the names from contacts_view.
+                column = "level"
+                values = [_level_id(get_connection(), value) for value in values]
+            conditions.append(f"c.{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    use_fts = _has_contact_fts()
+    fts_terms = []
+    for column, text in (("name", name), ("position", position), ("email", email)):
+        text = text.strip().lower()
+        if not text:
+            continue
+        if use_fts and len(text) >= _FTS_MIN_LENGTH:
+            fts_terms.append(f'{column} : "{text.replace(chr(34), chr(34) * 2)}"')
+        else:
+            conditions.append(f"instr(unicode_lower(c.{column}), ?) > 0")
+            params.append(text)
+    if fts_terms:
+        conditions.insert(0, "c.id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)")
+        params.insert(0, " AND ".join(fts_terms))
+
+    query = "SELECT c.id FROM contacts c"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    direction = "DESC" if descending else "ASC"
+    if order_by == "priority":
+        query += f" ORDER BY c.level {direction}, c.id {direction}"
+    elif order_by in CONTACT_COLUMNS:
+        query += f" ORDER BY c.{order_by} COLLATE NOCASE {direction}, c.id {direction}"
+    else:
+        query += f" ORDER BY c.id {direction}"
+    query += " LIMIT ? OFFSET ?"
+    params.extend([-1 if limit is None else limit, offset])
+    return [row[0] for row in get_connection().execute(query, params)]
+
+DEFAULT_TEMPLATE_PATH = "user.json"
 
 def get_settings():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT frequency, time FROM settings LIMIT 1")
-    result = cursor.fetchone()
-    conn.close()
+    """
+    Returns (frequency, time, template_path, cooldown_days) where frequency is a list of day names.
+    """
+    result = get_connection().execute(
+        "SELECT frequency, time, template_path, cooldown_days FROM settings ORDER BY id LIMIT 1").fetchone()
     # Return default values if no settings are found.
-    return result if result else ([], "13:00")
+    if not result:
+        return [], "13:00", DEFAULT_TEMPLATE_PATH, DEFAULT_COOLDOWN_DAYS
+    frequency, time, template_path, cooldown_days = result
+    frequency = [day for day in (frequency or "").split(",") if day]
+    return frequency, time or "13:00", template_path or DEFAULT_TEMPLATE_PATH, cooldown_days
 
-def set_settings(frequency, time):
+def set_settings(frequency, time, template_path=None, cooldown_days=None):
     """
     frequency: a list of frequency values (will be stored as a comma separated string)
     time: time string in format HH:MM
+    template_path: path of the JSON file holding the email template
+    cooldown_days: days before a contact who was selected or emailed may be picked again
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM settings")
-    cursor.execute("INSERT INTO settings (frequency, time) VALUES (?, ?)", (','.join(frequency), time))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        updated = conn.execute(
+            "UPDATE settings SET frequency = ?, time = ?, template_path = COALESCE(?, template_path), "
+            "cooldown_days = COALESCE(?, cooldown_days) "
+            "WHERE id = (SELECT id FROM settings ORDER BY id LIMIT 1)",
+            (','.join(frequency), time, template_path, cooldown_days)).rowcount
+        if not updated:
+            conn.execute("INSERT INTO settings (frequency, time, template_path, cooldown_days) VALUES (?, ?, ?, ?)",
+                         (','.join(frequency), time, template_path or DEFAULT_TEMPLATE_PATH,
+                          DEFAULT_COOLDOWN_DAYS if cooldown_days is None else cooldown_days))
 
 def set_country_priority(country, priority):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO country_priority (country, priority) VALUES (?, ?)",
-        (country, priority)
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO country_priority (country, priority) VALUES (?, ?)",
+            (country, priority)
+        )
 
 def get_country_priorities():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT country, priority FROM country_priority")
-    priorities = cursor.fetchall()
-    conn.close()
-    return priorities
+    return get_connection().execute("SELECT country, priority FROM country_priority").fetchall()
+
+# ---------------------------
+# Data Versions
+# ---------------------------
+
+def get_data_versions():
+    """
+    Returns {table name: change counter} for the tables in migrations.VERSIONED_TABLES.
+    A counter only ever increases, so a differing value means the table was written.
+    """
+    return dict(get_connection().execute("SELECT name, version FROM data_versions"))
 
 # ---------------------------
 # New Analytics Functions
@@ -253,32 +505,178 @@ def record_contact_event(contact_id, country, event_type):
     :param country: The contact's country
     :param event_type: A string, either "selected" or "emailed"
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO analytics (contact_id, event_type, country) VALUES (?, ?, ?)",
-                   (contact_id, event_type, country))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("INSERT INTO analytics (contact_id, event_type, country) VALUES (?, ?, ?)",
+                     (contact_id, event_type, country))
+
+def record_contact_events(events):
+    """
+    Records many events in one transaction.
+    :param events: iterable of (contact_id, event_type, country, timestamp,
+                   contact_level, priority, latency_ms) tuples; timestamp is
+                   "YYYY-MM-DD HH:MM:SS" UTC, like CURRENT_TIMESTAMP
+    """
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO analytics (contact_id, event_type, country, timestamp, contact_level, priority, latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", events)
 
-def get_analytics_summary():
+def iter_analytics(batch_size=1000):
     """
-    Returns aggregated analytics data.
+    Yields analytics rows (id, contact_id, event_type, country, timestamp, contact_level,
+    priority, latency_ms) in id order.
+    """
+    cursor = get_connection().execute(
+        "SELECT id, contact_id, event_type, country, timestamp, contact_level, priority, latency_ms "
+        "FROM analytics ORDER BY id")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def get_analytics_summary(start=None, end=None):
+    """
+    Returns aggregated analytics data from the rollup tables.
     The result is a list of tuples: (country, selected_count, emailed_count)
+    :param start: first day to include, "YYYY-MM-DD" (UTC); None for all time
+    :param end: day after the last day to include, "YYYY-MM-DD"; None for no limit
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    # Use conditional aggregation to count events by type per country.
-    cursor.execute("""
-        SELECT 
-            country,
-            SUM(CASE WHEN event_type = 'selected' THEN 1 ELSE 0 END) AS selected_count,
-            SUM(CASE WHEN event_type = 'emailed' THEN 1 ELSE 0 END) AS emailed_count
-        FROM analytics
+    conn = get_connection()
+    if start is None and end is None:
+        return conn.execute("""
+            SELECT NULLIF(country, ''), selected_count, emailed_count
+            FROM analytics_country_rollup
+            WHERE selected_count > 0 OR emailed_count > 0
+            ORDER BY country
+        """).fetchall()
+    return conn.execute("""
+        SELECT NULLIF(country, ''), SUM(selected_count), SUM(emailed_count)
+        FROM analytics_daily_rollup
+        WHERE day >= ? AND day < ?
         GROUP BY country
-    """)
-    summary = cursor.fetchall()
-    conn.close()
-    return summary
+        HAVING SUM(selected_count) > 0 OR SUM(emailed_count) > 0
+        ORDER BY country
+    """, (start or "0000-00-00", end or "9999-99-99")).fetchall()
+
+def get_analytics_timeline(start=None, end=None, period="day"):
+    """
+    Returns event counts per period from the daily rollup.
+    :param period: "day" or "week" (ISO 8601 year-week, e.g. "2025-W05"; the days around
+        New Year belong to the week, and year, containing that week's Thursday)
+    :return: list of tuples (period, country, selected_count, emailed_count)
+    """
+    # ISO weeks are numbered by their Thursday: its year, and its day of the year // 7 + 1.
+    thursday = "date(day, '-3 days', 'weekday 4')"
+    bucket = "day" if period == "day" else (
+        f"strftime('%Y', {thursday}) || '-W' || printf('%02d', (strftime('%j', {thursday}) - 1) / 7 + 1)")
+    return get_connection().execute(f"""
+        SELECT {bucket} AS period, NULLIF(country, ''), SUM(selected_count), SUM(emailed_count)
+        FROM analytics_daily_rollup
+        WHERE day >= ? AND day < ?
+        GROUP BY period, country
+        ORDER BY period, country
+    """, (start or "0000-00-00", end or "9999-99-99")).fetchall()
+
+def get_contact_analytics(contact_id):
+    """
+    Returns (selected_count, emailed_count, last_selected, last_emailed) for a contact,
+    or None if it has no events.
+    """
+    return get_connection().execute(
+        "SELECT selected_count, emailed_count, NULLIF(last_selected, ''), NULLIF(last_emailed, '') "
+        "FROM analytics_contact_rollup WHERE contact_id = ?", (contact_id,)).fetchone()
+
+def get_recently_contacted(since):
+    """
+    Returns {contact_id: last_contacted} for contacts selected or emailed at or after
+    `since` ("YYYY-MM-DD HH:MM:SS" UTC). Reads only that range of the last_contacted index.
+    """
+    return dict(get_connection().execute(
+        "SELECT contact_id, last_contacted FROM analytics_contact_rollup WHERE last_contacted >= ?", (since,)))
+
+def analytics_date_range(name, today=None):
+    """
+    Converts a named range into (start, end) day strings for get_analytics_summary.
+    :param name: "all", "last_7_days", "last_30_days", "this_quarter" or "this_year"
+    """
+    today = today or datetime.now(timezone.utc).date()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    if name == "last_7_days":
+        return (today - timedelta(days=6)).isoformat(), tomorrow
+    if name == "last_30_days":
+        return (today - timedelta(days=29)).isoformat(), tomorrow
+    if name == "this_quarter":
+        first_month = 3 * ((today.month - 1) // 3) + 1
+        return today.replace(month=first_month, day=1).isoformat(), tomorrow
+    if name == "this_year":
+        return today.replace(month=1, day=1).isoformat(), tomorrow
+    return None, None
+
+# ---------------------------
+# Service Mode
+# ---------------------------
+
+# Functions a db_service server can run for other processes (see use_service).
+# Writes are committed by the service's writer thread; reads may come from its cache.
+READ_FUNCTIONS = (
+    "get_all_contacts", "iter_contacts", "get_contact_emails", "get_contact", "get_contacts_by_ids",
+    "search_contacts", "get_settings", "get_country_priorities", "get_data_versions", "iter_analytics",
+    "get_analytics_summary", "get_analytics_timeline", "get_contact_analytics", "get_recently_contacted",
+    "get_contact_key_blocks", "get_contacts_with_keys",
+)
+WRITE_FUNCTIONS = (
+    "add_contact_to_db", "add_contacts_to_db", "update_contact_in_db", "delete_contact_from_db",
+    "update_contacts_in_db", "delete_contacts_from_db", "set_settings", "set_country_priority",
+    "record_contact_event", "record_contact_events", "merge_contacts",
+)
+
+_service = None
+
+def use_service(url, token=None):
+    """
+    Send the READ_FUNCTIONS/WRITE_FUNCTIONS calls to the db_service server at `url`
+    (e.g. "http://127.0.0.1:8765") instead of opening the database file.
+    use_service(None) switches back to direct mode. This applies to every caller,
+    including modules that imported the functions by name.
+    Also enabled at import by ROLLODEX_DB_SERVICE (and ROLLODEX_DB_SERVICE_TOKEN).
+    :return: the db_service.ServiceClient, or None
+    """
+    global _service
+    if url:
+        from db_service import ServiceClient
+        _service = ServiceClient(url, token)
+    else:
+        _service = None
+    return _service
+
+def get_service():
+    """ The ServiceClient in service mode, None in direct mode. """
+    return _service
+
+@contextmanager
+def write_batch():
+    """
+    Commit the writes made in the block together. In service mode each call is
+    committed by the service, which groups concurrent writes itself.
+    """
+    if _service is None:
+        with transaction():
+            yield
+    else:
+        yield
+
+def _routed(function):
+    @functools.wraps(function)
+    def call(*args, **kwargs):
+        if _service is None:
+            return function(*args, **kwargs)
+        return _service.call(function.__name__, args, kwargs)
+    return call
+
+# Each call is also recorded as a tracing span (in the service process in service mode).
+for _name in READ_FUNCTIONS + WRITE_FUNCTIONS:
+    globals()[_name] = _routed(traced(globals()[_name], category="db"))
 
-# Ensure the database is set up when this module is imported.
-setup_database()
+if os.environ.get("ROLLODEX_DB_SERVICE"):
+    use_service(os.environ["ROLLODEX_DB_SERVICE"], os.environ.get("ROLLODEX_DB_SERVICE_TOKEN"))
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_NAME = "contacts.db"
+
+# PRAGMAs applied to every new connection. Values can be changed with configure().
+PRAGMAS = {
+    "journal_mode": "WAL",      # readers don't block the writer (Qt thread + scheduler thread)
+    "synchronous": "NORMAL",    # safe with WAL, avoids an fsync per commit
+    "mmap_size": 268435456,     # 256 MB memory-mapped I/O
+    "cache_size": -16000,       # negative = KiB, i.e. ~16 MB page cache per connection
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # wait up to 5 s for a lock instead of failing immediately
+}
+
+# Number of compiled statements sqlite3 keeps per connection (prepared statement cache).
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []
+_generation = 0
+
+# The schema is created/upgraded (migrations.migrate) on the first connection to each
+# database rather than at import time. Re-entrant because migrate() itself connects.
+_schema_lock = threading.RLock()
+_schema_ready = False
+
+# Called by configure() after switching to another database file, so modules can drop
+# what they cached from the old one (see on_database_switch).
+_switch_callbacks = []
+
+# Called after a transaction() was rolled back, so modules can drop what they cached
+# from its uncommitted writes (see on_rollback).
+_rollback_callbacks = []
+
+
+class ServiceError(RuntimeError):
+    """
+    The database service (db_service.py) failed a call, or could not be reached.
+    Defined here so callers can catch it without importing the HTTP modules.
+    """
+
+
+def configure(db_name=None, **pragmas):
+    """
+    Change the database file and/or PRAGMA values.
+    Existing connections become stale: this thread's is closed now, and every other
+    thread closes its own and reconnects on its next call, so a query running on a
+    worker thread is never cut off.
+    :param db_name: path of the SQLite database file
+    :param pragmas: PRAGMA overrides, e.g. configure(synchronous="FULL")
+    """
+    global DB_NAME, _schema_ready
+    if db_name is not None:
+        DB_NAME = db_name
+        _schema_ready = False
+    PRAGMAS.update(pragmas)
+    _retire_connections()
+    if db_name is not None:
+        for callback in list(_switch_callbacks):
+            callback()
+
+
+def on_database_switch(callback):
+    """ Have configure() call callback() whenever it switches the database file. """
+    _switch_callbacks.append(callback)
+
+
+def on_rollback(callback):
+    """ Have transaction() call callback() on the rolling-back thread after every rollback. """
+    _rollback_callbacks.append(callback)
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_NAME,
+        isolation_level=None,  # autocommit; transactions are opened explicitly by transaction()
+        check_same_thread=False,  # only so close_all() can close it at shutdown
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    # SQLite's lower() only folds ASCII; this one matches str.lower() on the Python side.
+    conn.create_function("unicode_lower", 1, _unicode_lower, deterministic=True)
+    return conn
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def get_connection():
+    """
+    Return the persistent connection for the calling thread, opening it on first use.
+    The first connection to the database brings its schema up to date.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation != _generation and not _local.depth:
+        # Stale since configure(); only its own thread closes it, and not inside a transaction.
+        _discard(conn)
+        conn = None
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+        _local.depth = 0
+        with _lock:
+            _connections.append(conn)
+    if not _schema_ready:
+        _ensure_schema()
+    return conn
+
+
+def _ensure_schema():
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready or getattr(_local, "migrating", False):
+            return
+        from migrations import migrate
+        _local.migrating = True
+        try:
+            migrate(get_connection())
+        finally:
+            _local.migrating = False
+        _schema_ready = True
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Run a block of statements in a single transaction on this thread's connection.
+    Nested calls join the outermost transaction, so functions that open their own
+    transaction can be combined into one commit by wrapping them in another.
+    :param immediate: take the write lock when the transaction starts (BEGIN IMMEDIATE)
+        rather than at its first write; ignored for nested calls
+
+        with transaction() as conn:
+            conn.execute(...)
+    """
+    conn = get_connection()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    _local.depth = 1
+    try:
+        yield conn
+        conn.execute("COMMIT")  # may fail (SQLITE_BUSY), leaving the transaction open
+    except BaseException:
+        if conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass  # the original error is the one worth raising
+        for callback in list(_rollback_callbacks):
+            callback()
+        raise
+    finally:
+        if conn.in_transaction:
+            # Neither COMMIT nor ROLLBACK went through: don't let later BEGINs fail on this connection.
+            _discard(conn)
+        _local.depth = 0
+
+
+def _discard(conn):
+    """ Close the calling thread's connection; the next get_connection() opens a new one. """
+    with _lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    _local.conn = None
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def _retire_connections():
+    """ Mark every connection stale (see get_connection) and close this thread's. """
+    global _generation
+    with _lock:
+        _generation += 1
+    conn = getattr(_local, "conn", None)
+    if conn is not None and not _local.depth:
+        _discard(conn)
+
+
+def close_all():
+    """
+    Close every connection opened by any thread (call on application exit, once the
+    threads using them have stopped; see configure() for switching files while running).
+    """
+    global _generation
+    with _lock:
+        connections = list(_connections)
+        _connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,475 @@
+"""
+Shared database service: one process owns the SQLite file and runs the database.py
+functions for the other copies of the app, over JSON-RPC 2.0 on HTTP.
+
+    python -m rollodex --db S:/team/contacts.db serve --port 8765
+    ROLLODEX_DB_SERVICE=http://127.0.0.1:8765 python main.py
+
+- Writes go to a single writer thread. It commits everything queued at that moment
+  in one transaction (group commit), each call in its own savepoint so a failing
+  call does not undo the others. Clients never contend for the SQLite write lock.
+- Reads run on a small pool of reader connections and are cached until the next commit
+  (except the whole-table readers in UNCACHED_READS).
+- GET /changes?since=<generation> waits until something was committed and returns
+  the data_versions counters, so clients learn about other clients' changes without polling.
+
+Requests are POST /rpc with {"jsonrpc": "2.0", "id": 1, "method": "search_contacts",
+"params": {"args": [...], "kwargs": {...}}}. Tuples, sets and dicts with non-string
+keys are tagged (see encode) so results come back with the same types as in direct mode.
+If a token is set, requests must carry it in the X-Rollodex-Token header. Without a
+token the service only listens on a loopback address (see DatabaseService).
+"""
+import hmac
+import http.client
+import inspect
+import ipaddress
+import itertools
+import json
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from db_connection import ServiceError
+from tracing import span
+
+DEFAULT_PORT = 8765
+
+# Reader connections (threads) serving uncached reads.
+READ_WORKERS = 4
+
+# Most writes committed in one transaction.
+MAX_GROUP_SIZE = 256
+
+# Read results kept (least recently used are dropped first); cleared on every commit.
+CACHE_SIZE = 512
+
+# Reads that return whole tables (exports, dedupe, imports): never cached, so one
+# call cannot pin the full contacts or analytics history in the server's memory.
+UNCACHED_READS = frozenset({
+    "get_all_contacts", "iter_contacts", "iter_analytics", "get_contact_emails", "get_contact_key_blocks",
+})
+
+# Largest request body accepted (a batch of add_contacts_to_db rows is well below this).
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Longest a GET /changes request waits before answering "nothing changed".
+LONG_POLL_TIMEOUT = 25.0
+
+TOKEN_HEADER = "X-Rollodex-Token"
+
+# Exceptions re-raised with their own type on the client; others become ServiceError.
+ERROR_TYPES = {error.__name__: error for error in (
+    sqlite3.IntegrityError, sqlite3.OperationalError, sqlite3.DatabaseError, ValueError, TypeError, KeyError)}
+
+# JSON-RPC error codes
+METHOD_NOT_FOUND = -32601
+INVALID_REQUEST = -32600
+SERVER_ERROR = -32000
+
+
+class _UnknownMethod(Exception):
+    pass
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+def encode(value):
+    """ Make `value` JSON-serializable, tagging the types JSON would lose. """
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": [encode(item) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode(item) for key, item in value.items()}
+        return {"__dict__": [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, bytes):
+        raise TypeError("bytes cannot be sent to the database service")
+    return [encode(item) for item in value]  # lists, generators and other iterables
+
+
+def decode(value):
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, items = next(iter(value.items()))
+            if tag == "__tuple__":
+                return tuple(decode(item) for item in items)
+            if tag == "__set__":
+                return {decode(item) for item in items}
+            if tag == "__dict__":
+                return {decode(key): decode(item) for key, item in items}
+        return {key: decode(item) for key, item in value.items()}
+    return value
+
+
+# =============================================================================
+# Server
+# =============================================================================
+def is_loopback(host):
+    """ True if `host` is only reachable from this machine ("" and 0.0.0.0 mean every interface). """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:  # a host name
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except OSError:
+            return False
+        return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback
+                                       for address in addresses)
+
+
+class DatabaseService:
+    """
+    Serves the database configured in db_connection (call db_connection.configure first).
+    serve_forever() blocks; start() runs the server on a background thread.
+    Every write function can be called, so a host other than a loopback address
+    requires a token.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, token=None, read_workers=READ_WORKERS):
+        if not token and not is_loopback(host):
+            raise ValueError(f"Refusing to serve on {host or 'all interfaces'} without a token: anyone who can "
+                             f"reach it could change the database. Set a token or serve on 127.0.0.1.")
+        import database
+        self.database = database
+        self.token = token
+        # Bumped after every commit. Starts from the clock so a restarted service never
+        # repeats a generation a client saw from the previous one.
+        self.generation = time.time_ns() // 1000
+        self.commits = 0
+        self.writes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._changed = threading.Condition()  # guards generation and the cache
+        self._cache = OrderedDict()
+        self._writes = queue.Queue()
+        self._readers = ThreadPoolExecutor(read_workers, thread_name_prefix="db-read")
+        self._writer = threading.Thread(target=self._write_loop, name="db-write", daemon=True)
+        self._thread = None
+        self.server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self.database.setup_database()  # migrate before the first client arrives
+        if not self._writer.is_alive():
+            self._writer.start()
+        self.server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="db-service", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._writes.put(None)
+        if self._writer.is_alive():
+            self._writer.join()
+        self._readers.shutdown()
+
+    def status(self):
+        with self._changed:
+            return {"generation": self.generation, "commits": self.commits, "writes": self.writes,
+                    "cache_entries": len(self._cache), "cache_hits": self.cache_hits,
+                    "cache_misses": self.cache_misses, "queued_writes": self._writes.qsize()}
+
+    # ---- Calls ----
+
+    def call(self, method, args, kwargs):
+        """ Run a database function; returns the encoded result. """
+        if method in self.database.WRITE_FUNCTIONS:
+            future = Future()
+            self._writes.put((method, args, kwargs, future))
+            return encode(future.result())
+        if method in self.database.READ_FUNCTIONS:
+            if method in UNCACHED_READS:
+                return encode(self._readers.submit(self._read, method, args, kwargs).result())
+            return self._cached_read(method, args, kwargs)
+        raise _UnknownMethod(method)
+
+    def _cached_read(self, method, args, kwargs):
+        key = json.dumps([method, encode(args), encode(kwargs)], sort_keys=True)
+        with self._changed:
+            generation = self.generation
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return result
+            self.cache_misses += 1
+        result = encode(self._readers.submit(self._read, method, args, kwargs).result())
+        with self._changed:
+            # Only cache what no commit could have changed while it was being read.
+            if self.generation == generation:
+                self._cache[key] = result
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _direct(self, method):
+        """ The database function itself, not the use_service() router around it. """
+        return getattr(self.database, method).__wrapped__
+
+    def _read(self, method, args, kwargs):
+        result = self._direct(method)(*args, **kwargs)
+        return list(result) if inspect.isgenerator(result) else result
+
+    # ---- Writer thread ----
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+            group = [item]
+            # Everything that queued up while the previous group was committing goes in this one.
+            while len(group) < MAX_GROUP_SIZE:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._writes.put(None)
+                    break
+                group.append(item)
+            self._commit(group)
+
+    def _commit(self, group):
+        from db_connection import transaction
+        outcomes = []
+        try:
+            with span("group commit", "service", writes=len(group)), transaction(immediate=True) as conn:
+                for method, args, kwargs, future in group:
+                    conn.execute("SAVEPOINT service_write")
+                    try:
+                        result = self._direct(method)(*args, **kwargs)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO service_write")
+                        self.database.clear_caches()
+                        outcomes.append((future, None, e))
+                    else:
+                        outcomes.append((future, result, None))
+                    conn.execute("RELEASE service_write")
+        except Exception as e:  # BEGIN or COMMIT failed: nothing was written
+            self.database.clear_caches()
+            for method, args, kwargs, future in group:
+                future.set_exception(e)
+            return
+        with self._changed:
+            self.generation += 1
+            self.commits += 1
+            self.writes += len(group)
+            self._cache.clear()
+            self._changed.notify_all()
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # ---- Change notifications ----
+
+    def wait_for_changes(self, since, timeout=LONG_POLL_TIMEOUT):
+        """ Wait until the generation differs from `since`; return it with the data_versions. """
+        with self._changed:
+            self._changed.wait_for(lambda: self.generation != since, min(timeout, LONG_POLL_TIMEOUT))
+            generation = self.generation
+        versions = self._readers.submit(self._direct("get_data_versions")).result()
+        return {"generation": generation, "versions": versions}
+
+    def handle_rpc(self, request):
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _rpc_error(request_id, INVALID_REQUEST, "Invalid request")
+        params = decode(request.get("params") or {})
+        try:
+            result = self.call(request["method"], params.get("args", ()), params.get("kwargs", {}))
+        except _UnknownMethod:
+            return _rpc_error(request_id, METHOD_NOT_FOUND, f"Unknown method '{request['method']}'")
+        except Exception as e:
+            return _rpc_error(request_id, SERVER_ERROR, str(e), {"type": type(e).__name__})
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def _rpc_error(request_id, code, message, data=None):
+    error = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection per client thread
+
+    def log_message(self, format, *args):
+        pass
+
+    def _authorized(self):
+        token = self.server.service.token
+        if not token or hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+            return True
+        self._send_json({"error": "unauthorized"}, 403)
+        return False
+
+    def _send_json(self, document, status=200):
+        body = json.dumps(document).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_REQUEST_BYTES:
+            # The body is left unread, so this connection can't be reused.
+            self.close_connection = True
+            self._send_json({"error": f"request body must be 0 to {MAX_REQUEST_BYTES} bytes"},
+                            400 if length < 0 else 413)
+            return
+        body = self.rfile.read(length)
+        if not self._authorized():
+            return
+        if urlsplit(self.path).path != "/rpc":
+            self._send_json({"error": "not found"}, 404)
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(_rpc_error(None, -32700, "Parse error"))
+            return
+        self._send_json(self.server.service.handle_rpc(request))
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/changes":
+            try:
+                since = int(query.get("since", ["-1"])[0])
+                timeout = float(query.get("timeout", [str(LONG_POLL_TIMEOUT)])[0])
+                if not timeout >= 0:  # also rejects NaN
+                    raise ValueError(timeout)
+            except ValueError:
+                self._send_json({"error": "since must be an integer and timeout a number of seconds"}, 400)
+                return
+            self._send_json(self.server.service.wait_for_changes(since, timeout))
+        elif url.path == "/status":
+            self._send_json(self.server.service.status())
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+# =============================================================================
+# Client
+# =============================================================================
+class ServiceClient:
+    """
+    Calls a DatabaseService. Each thread keeps its own keep-alive connection.
+    database.use_service() routes the database functions through one of these.
+    """
+
+    def __init__(self, url, token=None, timeout=60):
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _connection(self, timeout):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            self._local.connection = connection
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def _request(self, method, path, body=None, timeout=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        for attempt in range(2):
+            connection = self._connection(timeout or self.timeout)
+            reused = connection.sock is not None
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                self._local.connection = None
+                # A kept-alive connection may have been closed by the server: retry once on a new one.
+                if reused and attempt == 0 and isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError,
+                                                              ConnectionResetError)):
+                    continue
+                raise ServiceError(f"Database service at {self.host}:{self.port} unreachable: {e}") from e
+            if response.status != 200:
+                raise ServiceError(f"Database service answered {response.status}: {data[:200]!r}")
+            return json.loads(data)
+
+    def call(self, method, args=(), kwargs=None):
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method,
+                   "params": {"args": encode(list(args)), "kwargs": encode(kwargs or {})}}
+        with span(method, "service"):
+            response = self._request("POST", "/rpc", json.dumps(request).encode("utf-8"))
+        if "error" in response:
+            error = response["error"]
+            error_type = ERROR_TYPES.get((error.get("data") or {}).get("type"), ServiceError)
+            raise error_type(error.get("message", "database service error"))
+        return decode(response["result"])
+
+    def status(self):
+        return self._request("GET", "/status")
+
+    def wait_for_changes(self, since=-1, timeout=LONG_POLL_TIMEOUT):
+        """ :return: {"generation": int, "versions": {table: version}} """
+        return self._request("GET", f"/changes?since={since}&timeout={timeout}", timeout=timeout + 10)
+
+    def watch(self, callback, retry_interval=5.0):
+        """
+        Call callback(versions) on a background thread after every commit made by any client.
+        :return: threading.Event; set it to stop watching
+        """
+        stop = threading.Event()
+
+        def run():
+            generation = None
+            while not stop.is_set():
+                try:
+                    changes = self.wait_for_changes(-1 if generation is None else generation)
+                except ServiceError:
+                    stop.wait(retry_interval)
+                    continue
+                if generation is not None and changes["generation"] != generation:
+                    callback(changes["versions"])
+                generation = changes["generation"]
+        threading.Thread(target=run, name="db-service-watch", daemon=True).start()
+        return stop
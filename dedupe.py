@@ -0,0 +1,302 @@
+"""
+Duplicate contact detection.
+
+Every contact has a set of blocking keys (blocking_keys), stored in the contact_keys
+table and kept current by database.py on every insert and update. Two contacts are
+only compared if they share a key, so finding the candidates for a new contact is a
+few index lookups (find_similar), and a sweep of the whole book (find_duplicates)
+compares the members of each block instead of every pair. Keys:
+
+    e:<email>            normalized email (case, dots and +tags for Gmail, +tags elsewhere)
+    l:<local part>       the same person at another domain; generic mailboxes (info@) excluded
+    d:<domain>:<soundex> same domain and a similar-sounding surname
+    p:<soundex ...>      the name tokens' Soundex codes in sorted order ("Smith, Jon" = "John Smith")
+    a:<letters>          the name's letters sorted ("Smtih" = "Smith", "NeMatic" = "Ne Matic")
+    g:<trigram>          character trigrams of the name, for typos the codes miss
+
+Names keep their letters in any script, without accents; the Soundex keys are only
+made for names written entirely in Latin letters. Bump KEYS_VERSION whenever the keys
+change, so migrations.refresh_contact_keys rebuilds the stored ones.
+
+Blocks with more than MAX_BLOCK_SIZE members (MAX_GRAM_BLOCK_SIZE for trigrams) say
+too little to be worth comparing and are skipped. Candidate pairs are scored (score)
+and merged with database.merge_contacts, keeping the oldest contact.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from itertools import groupby
+from operator import add
+
+from database import get_contacts_by_ids, get_contact_key_blocks, get_contacts_with_keys
+
+# Version of blocking_keys; stored with contact_keys (see migrations.refresh_contact_keys).
+KEYS_VERSION = 2
+
+# Pairs at or above this score are reported as duplicates by the sweep.
+DUPLICATE_THRESHOLD = 0.85
+
+# Pairs at or above this score are shown as possible duplicates when adding a contact.
+SIMILAR_THRESHOLD = 0.75
+
+MAX_BLOCK_SIZE = 50
+MAX_GRAM_BLOCK_SIZE = 12
+
+# Pairs found only through trigram blocks must share at least this many trigrams.
+MIN_SHARED_GRAMS = 3
+
+GENERIC_MAILBOXES = {"info", "contact", "admin", "office", "hello", "sales", "mail", "support",
+                     "enquiries", "inquiries", "team", "secretariat", "noreply", "no-reply"}
+DOTLESS_DOMAINS = {"gmail.com", "googlemail.com"}
+NAME_TITLES = {"mr", "mrs", "ms", "miss", "dr", "prof", "sir", "madam", "jr", "sr", "phd"}
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+_SOUNDEX_CODES = str.maketrans("abcdefghijklmnopqrstuvwxyz", "01230120022455012623010202")
+
+DuplicatePair = namedtuple("DuplicatePair", "score first second reasons")
+
+
+# =============================================================================
+# Normalization and keys
+# =============================================================================
+def normalize_email(email):
+    """ :return: (local part, domain) lower-cased without +tags (and dots for Gmail), or None """
+    email = (email or "").strip().lower()
+    if "@" not in email:
+        return None
+    local, _, domain = email.rpartition("@")
+    local = local.split("+", 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return (local, domain) if local and domain else None
+
+
+def name_tokens(name):
+    """
+    Case-folded name tokens without accents or titles; "Smith, John" gives ["john", "smith"],
+    "Zoë Müller" ["zoe", "muller"]. Letters of other scripts are kept ("Иван" gives ["иван"]).
+    """
+    name = unicodedata.normalize("NFKD", (name or "").casefold())
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    if "," in name:
+        last, _, first = name.partition(",")
+        name = f"{first} {last}"
+    return [token for token in _NON_ALNUM.sub(" ", name.replace("-", " ")).split() if token not in NAME_TITLES]
+
+
+@lru_cache(maxsize=65536)  # names share a few thousand tokens
+def soundex(word):
+    """ American Soundex code, e.g. soundex("Robert") == "R163". """
+    word = "".join(char for char in word.lower() if "a" <= char <= "z")
+    if not word:
+        return ""
+    # h and w don't separate letters with the same code; vowels (0) do.
+    digits = (word[0] + word[1:].replace("h", "").replace("w", "")).translate(_SOUNDEX_CODES)
+    code = "".join(digit for digit, _ in groupby(digits))[1:].replace("0", "")
+    return (word[0].upper() + code + "000")[:4]
+
+
+def _codes(tokens):
+    """ Sorted Soundex codes of the tokens, or [] unless every token has one (is Latin). """
+    codes = sorted(map(soundex, tokens))
+    return codes if codes and all(codes) else []
+
+
+def _letters(tokens):
+    return "".join(sorted("".join(tokens)))
+
+
+def _trigrams(tokens):
+    compact = "".join(sorted(tokens))
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+
+def blocking_keys(name, email):
+    """ The set of keys a contact is filed under (see the module docstring). """
+    keys = set()
+    tokens = name_tokens(name)
+    normalized = normalize_email(email)
+    if normalized:
+        local, domain = normalized
+        keys.add(f"e:{local}@{domain}")
+        local_compact = re.sub(r"[^0-9a-z]", "", local)
+        if len(local_compact) >= 4 and local not in GENERIC_MAILBOXES:
+            keys.add(f"l:{local_compact}")
+        if tokens and soundex(tokens[-1]):
+            keys.add(f"d:{domain}:{soundex(tokens[-1])}")
+    if tokens:
+        codes = _codes(tokens)
+        if codes:
+            keys.add("p:" + " ".join(codes))
+        keys.add(f"a:{_letters(tokens)}")
+        keys.update(f"g:{gram}" for gram in _trigrams(tokens))
+    return keys
+
+
+# =============================================================================
+# Scoring
+# =============================================================================
+# What score() compares, worked out once per contact.
+_Features = namedtuple("_Features", "name codes letters bigrams email email_bigrams country")
+
+
+def _bigrams(text):
+    """ Character pairs of the text, padded so first and last letters count as much as the rest. """
+    text = f" {text} "
+    return frozenset(map(add, text, text[1:]))
+
+
+def _similarity(first, second):
+    """ Dice coefficient of two bigram sets: 1.0 for the same text, 0.0 for nothing in common. """
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+def _features(contact):
+    tokens = sorted(name_tokens(contact[1]))
+    name = " ".join(tokens)
+    email = normalize_email(contact[3])
+    return _Features(name, _codes(tokens), _letters(tokens),
+                     _bigrams(name), email, _bigrams(email[0]) if email else None, (contact[4] or "").strip().lower())
+
+
+def _score(first, second):
+    """ score() on two _features. """
+    if first.email and first.email == second.email:
+        return 1.0, ["same email"]
+    reasons = []
+    if not first.name or not second.name:
+        name_score = 0.0  # no name to compare, which is no evidence either way
+    elif first.name == second.name:
+        name_score = 1.0
+        reasons.append("same name")
+    else:
+        name_score = _similarity(first.bigrams, second.bigrams)
+        if (first.codes and first.codes == second.codes) or first.letters == second.letters:
+            name_score = max(name_score, 0.9)  # "Jon"/"John", "Smith"/"Smtih", "NeMatic"/"Ne Matic"
+        if name_score >= 0.8:
+            reasons.append("similar name")
+
+    if first.email and second.email:
+        if first.email[0] == second.email[0]:
+            email_score = 0.95
+            reasons.append("same email name")
+        else:
+            email_score = _similarity(first.email_bigrams, second.email_bigrams)
+            if first.email[1] == second.email[1]:
+                email_score = min(1.0, email_score + 0.1)
+        total = 0.6 * name_score + 0.4 * email_score
+    else:
+        total = 0.95 * name_score  # a name alone is a little weaker evidence
+
+    if first.country and second.country and first.country != second.country:
+        total *= 0.9
+    return round(total, 3), reasons
+
+
+def score(first, second):
+    """
+    Similarity of two contact tuples (id, name, position, email, country, level): 1.0 for
+    the same email, otherwise mostly the name (spelling, sound and letter order) and the
+    email's local part. A missing name counts as no match. A name alone counts for a little less, a different country for less.
+    :return: (score between 0 and 1, list of reasons)
+    """
+    return _score(_features(first), _features(second))
+
+
+# =============================================================================
+# Finding duplicates
+# =============================================================================
+def _scored_pairs(pairs, contacts, threshold):
+    features = {}
+    results = []
+    for first_id, second_id in pairs:
+        first, second = contacts.get(first_id), contacts.get(second_id)
+        if first is None or second is None:
+            continue
+        if first_id not in features:
+            features[first_id] = _features(first)
+        if second_id not in features:
+            features[second_id] = _features(second)
+        value, reasons = _score(features[first_id], features[second_id])
+        if value >= threshold:
+            results.append(DuplicatePair(value, first, second, reasons))
+    results.sort(key=lambda pair: (-pair.score, pair.first[0], pair.second[0]))
+    return results
+
+
+def find_similar(name, email, country="", exclude_id=None, threshold=SIMILAR_THRESHOLD):
+    """
+    Existing contacts that may be the person about to be added (or edited, with
+    exclude_id), best match first. Runs a handful of indexed lookups, not a scan.
+    :return: list of DuplicatePair with first = the new contact (id None or exclude_id)
+    """
+    candidate = (exclude_id, name, "", email, country, "")
+    keys = blocking_keys(name, email)
+    matches = get_contacts_with_keys(sorted(keys), MAX_BLOCK_SIZE, MAX_GRAM_BLOCK_SIZE)
+    shared_grams = {}
+    candidate_ids = set()
+    for key, contact_id in matches:
+        if contact_id == exclude_id:
+            continue
+        if key.startswith("g:"):
+            shared_grams[contact_id] = shared_grams.get(contact_id, 0) + 1
+        else:
+            candidate_ids.add(contact_id)
+    candidate_ids.update(contact_id for contact_id, count in shared_grams.items() if count >= MIN_SHARED_GRAMS)
+    contacts = get_contacts_by_ids(candidate_ids)
+    contacts[exclude_id] = candidate
+    return _scored_pairs(((exclude_id, contact_id) for contact_id in candidate_ids), contacts, threshold)
+
+
+def find_duplicates(threshold=DUPLICATE_THRESHOLD, progress=None):
+    """
+    Sweep the whole book for duplicates.
+    :param progress: called with (blocks done, total blocks) now and then
+    :return: list of DuplicatePair, first being the older contact, best match first
+    """
+    pairs = set()
+    gram_pairs = {}
+    blocks = get_contact_key_blocks(MAX_BLOCK_SIZE, MAX_GRAM_BLOCK_SIZE)
+    for number, (key, contact_ids) in enumerate(blocks, start=1):
+        contact_ids = sorted(contact_ids)
+        block_pairs = ((a, b) for index, a in enumerate(contact_ids) for b in contact_ids[index + 1:])
+        if key.startswith("g:"):
+            for pair in block_pairs:
+                gram_pairs[pair] = gram_pairs.get(pair, 0) + 1
+        else:
+            pairs.update(block_pairs)
+        if progress and number % 1000 == 0:
+            progress(number, len(blocks))
+    pairs.update(pair for pair, count in gram_pairs.items() if count >= MIN_SHARED_GRAMS)
+    if progress:
+        progress(len(blocks), len(blocks))
+    if not pairs:
+        return []
+    # Only the contacts in some candidate pair, not the whole book.
+    contacts = get_contacts_by_ids({contact_id for pair in pairs for contact_id in pair})
+    return _scored_pairs(pairs, contacts, threshold)
+
+
+def group_duplicates(pairs):
+    """
+    Join pairs into groups of contacts that are all the same person (union-find).
+    :return: list of sorted id lists; the first id in each is the contact to keep
+    """
+    parent = {}
+
+    def root(contact_id):
+        parent.setdefault(contact_id, contact_id)
+        while parent[contact_id] != contact_id:
+            parent[contact_id] = parent[parent[contact_id]]
+            contact_id = parent[contact_id]
+        return contact_id
+
+    for pair in pairs:
+        first, second = root(pair.first[0]), root(pair.second[0])
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+    groups = {}
+    for contact_id in parent:
+        groups.setdefault(root(contact_id), []).append(contact_id)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: group[0])
@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import threading
+
+# Placeholders a template may use, filled in by email_utils.
+PLACEHOLDERS = ("recipient_name", "position", "country", "contact_level", "user_name", "times_formatted")
+
+# Alternative spellings accepted for backwards compatibility (the old tooltip advertised {recepient_name}).
+ALIASES = {"recepient_name": "recipient_name"}
+
+DEFAULT_SUBJECT = "Morgan Stanley Investment Management Investor Meeting"
+
+DEFAULT_BODY = (
+    "Dear {recipient_name},\n\nI hope this email finds you well. I work for Morgan Stanley Investment "
+    "Management on the Emerging Markets Debt team and we're investors in {country}. We are interested in "
+    "recent economic developments in the county and are looking to schedule a meeting.\n"
+    "Please find my availability below:\n{times_formatted}\n\nKindly let me know which of these works best "
+    "for you, or if you have any alternative preferences.\n\nThank you and best regards,\n{user_name}"
+)
+
+_TOKEN = re.compile(r"\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)\}|[{}]")
+
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal text and placeholder slots.
+    `{name}` is replaced by the value of a known placeholder (see PLACEHOLDERS/ALIASES);
+    `{{` and `}}` produce literal braces as with str.format. Anything else - stray
+    braces, unknown `{names}` - is kept as literal text instead of raising, and is
+    listed in `problems`.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = []     # literal strings and placeholder names, alternating as found
+        self.fields = []    # indexes into parts that are placeholder names
+        self.problems = []  # human-readable issues found while parsing
+        literal = []
+        position = 0
+        for match in _TOKEN.finditer(text):
+            literal.append(text[position:match.start()])
+            position = match.end()
+            token, name = match.group(0), match.group(1)
+            if token in ("{{", "}}"):
+                literal.append(token[0])
+            elif name is None:
+                literal.append(token)
+                self.problems.append(f"Stray '{token}' at line {text.count(chr(10), 0, match.start()) + 1}")
+            else:
+                field = ALIASES.get(name, name)
+                if field not in PLACEHOLDERS:
+                    literal.append(token)
+                    self.problems.append(f"Unknown placeholder {token}")
+                    continue
+                self.parts.append("".join(literal))
+                literal = []
+                self.fields.append(len(self.parts))
+                self.parts.append(field)
+        literal.append(text[position:])
+        self.parts.append("".join(literal))
+        self._fields = set(self.fields)
+
+    def render(self, values):
+        """
+        :param values: dict placeholder -> value; missing placeholders render as ""
+        """
+        return "".join(str(values.get(part, "")) if i in self._fields else part
+                       for i, part in enumerate(self.parts))
+
+
+def validate_template(text):
+    """ :return: list of problems (empty if the template is fine) """
+    return CompiledTemplate(text).problems
+
+
+class EmailTemplate:
+    """ A named subject/body pair, optionally restricted to a country and/or contact level. """
+
+    def __init__(self, name, body, subject=DEFAULT_SUBJECT, country=None, contact_level=None):
+        self.name = name
+        self.country = country
+        self.contact_level = contact_level
+        self.subject = CompiledTemplate(subject)
+        self.body = CompiledTemplate(body)
+
+    def matches(self, country, contact_level):
+        return ((self.country is None or self.country == country)
+                and (self.contact_level is None or self.contact_level == contact_level))
+
+    @property
+    def specificity(self):
+        return (self.country is not None) * 2 + (self.contact_level is not None)
+
+    def render(self, values):
+        """ :return: (subject, body) """
+        return self.subject.render(values), self.body.render(values)
+
+
+class TemplateSet:
+    """
+    The templates stored in one user file:
+        {"email_body": "...",                      # default body
+         "templates": [{"name": "UK first contact", "country": "UK",
+                        "contact_level": "First Contact", "subject": "...", "body": "..."}]}
+    """
+
+    def __init__(self, data):
+        default_body = data.get("email_body") or DEFAULT_BODY
+        self.default = EmailTemplate("default", default_body, data.get("email_subject") or DEFAULT_SUBJECT)
+        self.templates = [EmailTemplate(entry.get("name", ""), entry.get("body") or default_body,
+                                        entry.get("subject") or DEFAULT_SUBJECT,
+                                        entry.get("country") or None, entry.get("contact_level") or None)
+                          for entry in data.get("templates", [])]
+
+    def select(self, country, contact_level):
+        """ The most specific template for the contact: country and level > country > level > default. """
+        best = self.default
+        for template in self.templates:
+            if template.matches(country, contact_level) and template.specificity > best.specificity:
+                best = template
+        return best
+
+
+class TemplateCache:
+    """
+    Loads and compiles each user file once, and again only when its mtime or size
+    changes, so rendering an email doesn't read and parse JSON every time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> ((mtime_ns, size), TemplateSet)
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+        templates = TemplateSet(read_template_file(path) if stamp else {})
+        with self._lock:
+            self._entries[path] = (stamp, templates)
+        return templates
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+def read_template_file(path):
+    """ :return: the file's JSON object, or {} if it is missing or unreadable """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+template_cache = TemplateCache()
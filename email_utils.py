@@ -1,107 +1,88 @@
-import win32com.client
-import pytz
-from datetime import datetime, timedelta
-from win32com.client import constants
-import os
 import json
 
-def get_free_time_slots():
+from calendar_provider import default_provider, get_free_slots, get_free_slot_cache, format_free_slots
+from email_templates import template_cache, read_template_file
+from tracing import traced
+
+@traced(category="calendar")
+def get_free_time_slots(provider=None):
     """
-    Retrieves free time slots from the Outlook calendar and merges consecutive slots.
+    Retrieves free time slots from the calendar (Outlook by default) within working hours.
     Excludes weekends and the current day.
-    :return: dict - Dictionary of available time slots grouped by day
+    :return: list - (start, end) timezone-aware datetimes; see calendar_provider.format_free_slots
     """
-    outlook = win32com.client.Dispatch("Outlook.Application")
-    namespace = outlook.GetNamespace("MAPI")
-    calendar = namespace.GetDefaultFolder(9)  # 9 represents the Calendar folder
-    
-    tz = pytz.timezone("Etc/UTC")  # Adjust to your local timezone if necessary
-    now = datetime.now(tz)
-    end_time = now + timedelta(days=7)  # Checking availability for the next 7 days
-    
-    appointments = calendar.Items
-    appointments.Sort("[Start]")
-    appointments = appointments.Restrict(f"[Start] >= '{now.strftime('%m/%d/%Y %I:%M %p')}' AND [End] <= '{end_time.strftime('%m/%d/%Y %I:%M %p')}'")
-    
-    busy_slots = [(appt.Start.replace(tzinfo=tz), appt.End.replace(tzinfo=tz)) for appt in appointments]
-    
-    free_slots = {}
-    current_time = now.replace(hour=9, minute=0, second=0, microsecond=0)  # Start at 9 AM
-    current_weekday = now.weekday()  # 0 = Monday, 6 = Sunday
-    
-    while current_time < end_time:
-        next_time = current_time + timedelta(hours=1)
-        day_name = current_time.strftime('%A')
-        day_date = current_time.strftime('%B %d')
-        day = f"{day_name}, {day_date}"
-        
-        if current_time.date() > now.date() and current_time.weekday() < 5:  # Skip today and weekends
-            if all(not (start <= current_time < end) for start, end in busy_slots):
-                if day not in free_slots:
-                    free_slots[day] = []
-                
-                if free_slots[day] and free_slots[day][-1].split(' - ')[1] == current_time.strftime('%I:%M %p'):
-                    free_slots[day][-1] = free_slots[day][-1].split(' - ')[0] + f" - {next_time.strftime('%I:%M %p')}"
-                else:
-                    free_slots[day].append(f"{current_time.strftime('%I:%M %p')} - {next_time.strftime('%I:%M %p')}")
-        
-        current_time = next_time
-        if current_time.hour >= 17:
-            current_time = current_time.replace(hour=9) + timedelta(days=1)  # Next day's working hours
-    
-    return free_slots
+    return get_free_slots(provider or default_provider())
 
-def get_outlook_user_details():
+def get_outlook_user_details(provider=None):
     """
-    Retrieves the current user's name and email signature from Outlook.
-    :return: tuple - (user_name, email_signature)
+    Retrieves the current user's name from Outlook.
+    :return: str - user_name
     """
-    outlook = win32com.client.Dispatch("Outlook.Application")
-    namespace = outlook.GetNamespace("MAPI")
-    user_name = [x.strip() for x in namespace.CurrentUser.Name.split(",")] 
-    user_name = f"{user_name[1][0].upper()}{user_name[1][1:].lower()} {user_name[0][0].upper()}{user_name[0][1:].lower()}"
-    return user_name
+    return (provider or default_provider()).get_user_name()
+
+
+def format_times(free_slots):
+    """ The {times_formatted} text for a list of free slots. """
+    meeting_times = format_free_slots(free_slots)
+    return "\n".join(f"\n{day}:\n" + "\n".join(f"- {time}" for time in times) for day, times in meeting_times.items())
+
 
+def _template_values(contact, user_name, times_formatted):
+    return {"recipient_name": contact[1], "position": contact[2], "country": contact[4],
+            "contact_level": contact[5], "user_name": user_name, "times_formatted": times_formatted}
 
-def email_body(recipient_name, country,user_file):
+
+def email_body(recipient_name, country, user_file, contact_level=None):
     """
     Generates a formal email template for scheduling a meeting.
     :param recipient_name: str - Name of the recipient
-    :param meeting_times: list - List of available time slots
-    :return: str - Formatted email string
+    :param country: str - the recipient's country
+    :param user_file: str - JSON file holding the templates (see email_templates.TemplateSet)
+    :param contact_level: str - the recipient's contact level
+    :return: str - Formatted email string, from the template that best matches the
+             country and level (like render_emails)
     """
-    meeting_times = get_free_time_slots()
-    times_formatted = "\n".join(f"\n{day}:\n" + "\n".join(f"- {time}" for time in times) for day, times in meeting_times.items())
-    user_name = get_outlook_user_details()
-    
-    body = load_email_template(user_file)
-    if body != "":
-        body = body.format(recipient_name=recipient_name,country=country,
-                           times_formatted=times_formatted,user_name=user_name)
-    else:
-        body = f"""Dear {recipient_name},\n\nI hope this email finds you well. I work for Morgan Stanley Investment Management on the Emerging Markets Debt team and we're investors in {country}. We are interested in recent economic developments in the county and are looking to schedule a meeting.\nPlease find my availability below:\n{times_formatted}\n\nKindly let me know which of these works best for you, or if you have any alternative preferences.\n\nThank you and best regards,\n{user_name}"""
-    
-    return body
+    # Free slots and user name come from a background cache (see calendar_provider.FreeSlotCache)
+    free_slots, user_name = get_free_slot_cache().get()
+    values = {"recipient_name": recipient_name, "country": country, "contact_level": contact_level,
+              "user_name": user_name, "times_formatted": format_times(free_slots)}
+    return template_cache.get(user_file).select(country, contact_level).body.render(values)
 
 def save_email_template(content, user_file):
-    """ Saves the email template to a JSON file """
+    """
+    Saves the default email template to a JSON file, keeping any other templates in it.
+    Use validate_template() first to check for unknown placeholders.
+    """
+    data = read_template_file(user_file)
+    data["email_body"] = content
     with open(user_file, "w", encoding="utf-8") as file:
-        json.dump({"email_body": content}, file, indent=4)
+        json.dump(data, file, indent=4)
+    template_cache.invalidate(user_file)
 
 def load_email_template(template_file):
     """ Loads the email template from a JSON file """
-    try:
-        if os.path.exists(template_file):
-            with open(template_file, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                return data.get("email_body", "")
-        return ""  # Return empty string if file doesn't exist
-    except:
-        return ""
+    return read_template_file(template_file).get("email_body", "")
     
 def email_template(contact, user_file):
-    mail_to = contact[3]
-    subject = f"Morgan Stanley Investment Management Investor Meeting"
-    body = email_body(recipient_name=contact[1], country=contact[4],user_file=user_file)
-    return mail_to, subject, body
-    
\ No newline at end of file
+    """
+    :return: (mail_to, subject, body) using the template that best matches the
+             contact's country and level
+    """
+    return render_emails([contact], user_file)[0]
+
+def render_emails(contacts, user_file):
+    """
+    Renders emails for many contacts in one pass: the calendar and the template file
+    are read once, and each template is compiled once.
+    :param contacts: contact tuples (id, name, position, email, country, contact_level)
+    :return: list of (mail_to, subject, body), in the same order
+    """
+    free_slots, user_name = get_free_slot_cache().get()
+    times_formatted = format_times(free_slots)
+    templates = template_cache.get(user_file)
+    emails = []
+    for contact in contacts:
+        subject, body = templates.select(contact[4], contact[5]).render(
+            _template_values(contact, user_name, times_formatted))
+        emails.append((contact[3], subject, body))
+    return emails
@@ -1,32 +1,92 @@
 import sys
-import random
-import time
+import sqlite3
 import threading
-import schedule
-import numpy as np
-import os
-import json
+import time
 
 # user_file = "user.json"
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, QComboBox,
-    QMessageBox, QStackedWidget, QSpinBox, QFormLayout, QDialog,QRadioButton,
-     QTextEdit,
+    QMessageBox, QSpinBox, QFormLayout, QDialog, QTableView,
+    QAbstractItemView, QTextEdit, QFileDialog, QProgressDialog, QCheckBox,
 )
-from PySide6.QtGui import QFont
-from PySide6.QtCore import Qt, Signal, QObject, QTimer, QTime, QDate, QDateTime
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, Signal, QObject, QTimer
+from datetime import datetime
 
 # Imported functions (assumed implemented elsewhere)
 from database import (
-    add_contact_to_db, get_all_contacts, get_settings, set_settings, update_contact_in_db, delete_contact_from_db, set_country_priority, get_country_priorities, get_analytics_summary, record_contact_event
+    add_contact_to_db, get_contact, get_contacts_by_ids, update_contact_in_db, update_contacts_in_db,
+    delete_contacts_from_db, set_country_priority, get_country_priorities, get_analytics_summary,
+    analytics_date_range, get_data_versions, get_service, merge_contacts, write_batch
 )
 
 from email_utils import email_template, save_email_template, load_email_template
+from email_templates import validate_template
+from calendar_provider import get_free_slot_cache
 
+from scheduler import next_fire_time, timer_delay_ms, MISSED_GRACE
+from settings_store import Settings, settings_store
 from utils import MultiComboBox
-from win32com.client import Dispatch
+from contact_model import ContactTableModel
+from analytics_writer import analytics_writer
+from sampler import build_sampler, DEFAULT_COUNTRY_PRIORITY
+from lazy_pages import LazyStackedWidget, REFRESH_STALE, REFRESH_ALWAYS
+from task_runner import task_runner
+# dedupe, contact_io, outreach, mail_backends (smtplib, email.*) and outlook_session are
+# imported where they are used, so they don't add to startup time.
+import tracing
+from tracing import traced
+
+# =============================================================================
+# Background work (see task_runner.TaskRunner)
+# =============================================================================
+def show_task_error(parent, title):
+    """ on_error callback that reports a failed task in a message box. """
+    return lambda error: QMessageBox.critical(parent, "Error", f"{title} failed: {error}")
+
+
+def run_file_job(parent, title, function, on_success, write=False):
+    """
+    Run function(progress) on the task runner with a modal busy dialog. Progress
+    values with a `processed` attribute are shown as a row count.
+    :param write: the job changes data (see TaskRunner.submit)
+    """
+    dialog = QProgressDialog(title, None, 0, 0, parent)
+    dialog.setWindowTitle(title)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+
+    def finish(callback):
+        def handler(value):
+            dialog.close()
+            callback(value)
+        return handler
+
+    dialog.show()
+    return task_runner.submit(
+        function, name=title, write=write, on_result=finish(on_success), on_error=finish(show_task_error(parent, title)),
+        on_progress=lambda report: dialog.setLabelText(f"{title}: {getattr(report, 'processed', '')} rows processed"))
+
+
+def confirm_not_duplicate(parent, matches):
+    """
+    Ask whether to save a contact that find_similar says may already exist.
+    :return: True to save it
+    """
+    # The same address is refused by the database, with its own message.
+    email = matches[0].first[3].strip().lower() if matches and matches[0].first[3] else ""
+    matches = [pair for pair in matches if not email or (pair.second[3] or "").lower() != email]
+    if not matches:
+        return True
+    lines = "\n".join(f"{pair.second[1]} <{pair.second[3] or 'no email'}>, {pair.second[4]} ({pair.score:.0%})"
+                      for pair in matches[:5])
+    reply = QMessageBox.question(parent, "Possible Duplicate",
+                                 f"This contact may already exist:\n\n{lines}\n\nSave it anyway?",
+                                 QMessageBox.Yes | QMessageBox.No)
+    return reply == QMessageBox.Yes
+
 
 # =============================================================================
 # Page 1: New Contact Page
@@ -34,7 +94,7 @@ from win32com.client import Dispatch
 class NewContactPage(QWidget):
     def __init__(self, refresh_contacts_callback):
         """
-        refresh_contacts_callback: function to call after a new contact is added
+        refresh_contacts_callback: function to call with added=[id] after a new contact is added
         """
         super().__init__()
         self.refresh_contacts_callback = refresh_contacts_callback
@@ -100,25 +160,48 @@ class NewContactPage(QWidget):
             QMessageBox.critical(self, "Error", "Please fill all fields correctly.")
             return
 
+        # Look for a possible duplicate first; if the check itself fails, add the contact anyway.
+        from dedupe import find_similar
+        contact = (name, position, email, country, contact_level)
+        task_runner.submit(find_similar, name, email, country, name="duplicate check",
+                           on_result=lambda matches: self.confirm_add(contact, matches),
+                           on_error=lambda error: self.confirm_add(contact, []))
+
+    def confirm_add(self, contact, matches):
+        if not confirm_not_duplicate(self, matches):
+            return
         # Use external function; note that add_contact_to_db is assumed to accept the contact_level.
-        add_contact_to_db(name, position, email, country, contact_level)
+        task_runner.submit(add_contact_to_db, *contact, write=True, on_result=self.contact_added, on_error=self.add_failed)
+
+    def contact_added(self, contact_id):
         QMessageBox.information(self, "Success", "Contact added successfully.")
 
         # Clear fields after adding contact (optional)
         self.name_entry.clear()
         self.email_entry.clear()
         # Also refresh any tables that display contacts
-        self.refresh_contacts_callback()
+        self.refresh_contacts_callback(added=[contact_id])
+
+    def add_failed(self, error):
+        if isinstance(error, sqlite3.IntegrityError):
+            QMessageBox.critical(self, "Error", "A contact with this email already exists.")
+        else:
+            QMessageBox.critical(self, "Error", f"Failed to add contact: {error}")
 
 class ManageContactsPage(QWidget):
+    # Reload when shown if contacts were changed by something other than this app's
+    # incremental updates (see MainWindow.refresh_contacts).
+    REFRESH_ON_SHOW = REFRESH_STALE
+    DATA_TABLES = ("contacts",)
+
     def __init__(self, refresh_callback):
         """
-        refresh_callback: a function that is called whenever the dataset is updated.
+        refresh_callback: a function that is called whenever the dataset is updated,
+        with the ids that were added/updated/removed (see MainWindow.refresh_contacts).
         """
         super().__init__()
         self.refresh_callback = refresh_callback
-        self.selected_contact_id = None  # will hold the id of the currently selected contact
-        self.all_contacts = []  # store all contacts from the database
+        self.selected_ids = set()  # ids of the currently selected contacts
         self.init_ui()
 
     def init_ui(self):
@@ -139,6 +222,18 @@ class ManageContactsPage(QWidget):
         self.delete_button = QPushButton("Delete")
         self.delete_button.clicked.connect(self.delete_selected_contact)
         top_layout.addWidget(self.delete_button)
+
+        self.import_button = QPushButton("Import")
+        self.import_button.clicked.connect(self.import_contacts)
+        top_layout.addWidget(self.import_button)
+
+        self.export_button = QPushButton("Export")
+        self.export_button.clicked.connect(self.export_contacts)
+        top_layout.addWidget(self.export_button)
+
+        self.duplicates_button = QPushButton("Find Duplicates")
+        self.duplicates_button.clicked.connect(self.find_duplicates)
+        top_layout.addWidget(self.duplicates_button)
         main_layout.addLayout(top_layout)
 
         # Filtering Layout: One QLineEdit per filterable column
@@ -171,105 +266,155 @@ class ManageContactsPage(QWidget):
 
         main_layout.addLayout(filter_layout)
 
-        # Table Widget with a "Select" column plus contact details
-        self.table = QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(["Select", "Name", "Position", "Email", "Country", "Contact Level"])
+        # Table view over a model that only loads the rows being displayed
+        self.model = ContactTableModel(self, task_runner)
+        self.model.load_failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Loading contacts failed: {message}"))
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setDefaultSectionSize(24)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.setSortingEnabled(True)
+        self.table.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        self.model.modelReset.connect(self.selected_ids.clear)
+        self.model.rowsAboutToBeRemoved.connect(self.on_rows_about_to_be_removed)
         main_layout.addWidget(self.table)
 
         # Load the data
         self.load_contacts()
 
     def load_contacts(self):
-        """Loads all contacts from the database and applies the current filters."""
-        self.all_contacts = get_all_contacts()  # each contact is assumed to be a tuple (id, name, position, email, country, contact_level)
+        """Reloads the contacts from the database using the current filters."""
         self.apply_filters()
 
+    def refresh(self):
+        self.load_contacts()
+
     def apply_filters(self):
-        """Filter the complete dataset based on input in the filter fields."""
-        name_filter = self.filter_name.text().lower()
-        pos_filter = self.filter_position.text().lower()
-        email_filter = self.filter_email.text().lower()
-        country_filter = self.filter_country.text().lower()
-        level_filter = self.filter_level.text().lower()
-
-        filtered_contacts = []
-        for contact in self.all_contacts:
-            # contact structure: (id, name, position, email, country, contact_level)
-            if (name_filter in contact[1].lower() and
-                pos_filter in contact[2].lower() and
-                email_filter in contact[3].lower() and
-                country_filter in contact[4].lower() and
-                level_filter in contact[5].lower()):
-                filtered_contacts.append(contact)
-        self.populate_table(filtered_contacts)
-
-    def populate_table(self, contacts):
-        """Populate the QTableWidget with the given contacts."""
-        self.table.setRowCount(0)
-        self.selected_contact_id = None  # Reset the selection whenever the table is repopulated.
-        for contact in contacts:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            
-            # Create a radio button for selecting the contact.
-            radio = QRadioButton()
-            # Store the contact id in a property.
-            radio.contact_id = contact[0]
-            radio.toggled.connect(self.on_radio_toggled)
-            self.table.setCellWidget(row_position, 0, radio)
-            
-            # Set the rest of the columns.
-            self.table.setItem(row_position, 1, QTableWidgetItem(contact[1]))
-            self.table.setItem(row_position, 2, QTableWidgetItem(contact[2]))
-            self.table.setItem(row_position, 3, QTableWidgetItem(contact[3]))
-            self.table.setItem(row_position, 4, QTableWidgetItem(contact[4]))
-            self.table.setItem(row_position, 5, QTableWidgetItem(contact[5]))
-
-    def on_radio_toggled(self):
+        """Filter the dataset in SQL based on input in the filter fields."""
+        self.model.set_filters(name=self.filter_name.text(),
+                               position=self.filter_position.text(),
+                               email=self.filter_email.text(),
+                               country=self.filter_country.text(),
+                               priority=self.filter_level.text())
+
+    def contacts_changed(self, added=(), updated=(), removed=(), contacts=None):
         """
-        Called whenever any radio button is toggled.
-        It iterates through the table to find the currently selected contact.
+        Apply incremental changes to the table without reloading it.
+        :param contacts: id -> contact tuple of the added and updated contacts; if not
+            given they are loaded on the task runner first
         """
-        for row in range(self.table.rowCount()):
-            widget = self.table.cellWidget(row, 0)
-            if widget and widget.isChecked():
-                self.selected_contact_id = widget.contact_id
-                return
+        if contacts is None and (added or updated):
+            task_runner.submit(get_contacts_by_ids, list(added) + list(updated), name="load changed contacts",
+                               on_result=lambda loaded: self.contacts_changed(added, updated, removed, loaded),
+                               on_error=show_task_error(self, "Loading changed contacts"))
+            return
+        for contact_id in added:
+            if contact_id in contacts:
+                self.model.contact_added(contacts[contact_id])
+        for contact_id in updated:
+            self.model.contact_updated(contact_id, contacts.get(contact_id))
+        for contact_id in removed:
+            self.model.contact_removed(contact_id)
+
+    def on_selection_changed(self, selected, deselected):
+        """Apply the selection delta to selected_ids (only the rows that changed)."""
+        for selection_range in deselected:
+            for row in range(selection_range.top(), selection_range.bottom() + 1):
+                self.selected_ids.discard(self.model.contact_id(row))
+        for selection_range in selected:
+            for row in range(selection_range.top(), selection_range.bottom() + 1):
+                self.selected_ids.add(self.model.contact_id(row))
+
+    def on_rows_about_to_be_removed(self, parent, first, last):
+        for row in range(first, last + 1):
+            self.selected_ids.discard(self.model.contact_id(row))
 
     def edit_selected_contact(self):
-        """Open the edit dialog for the currently selected contact."""
-        if self.selected_contact_id is None:
+        """Open the edit dialog for the selected contact, or the bulk edit dialog for several."""
+        if not self.selected_ids:
             QMessageBox.information(self, "Select Contact", "Please select a contact to edit.")
             return
-        # Open the edit dialog (this dialog is assumed to be defined elsewhere).
-        dialog = EditContactDialog(self.selected_contact_id, self.refresh_callback)
-        dialog.exec_()
-        self.load_contacts()
-        self.refresh_callback()
+        if len(self.selected_ids) == 1:
+            contact_id = next(iter(self.selected_ids))
+            contact = self.model.contacts.get(contact_id)
+            if contact is None:  # selected rows are normally loaded already
+                task_runner.submit(get_contact, contact_id, name="load contact", on_result=self.open_edit_dialog,
+                                   on_error=show_task_error(self, "Loading the contact"))
+            else:
+                self.open_edit_dialog(contact)
+            return
+        BulkEditContactDialog(set(self.selected_ids), self.refresh_callback).exec_()
+
+    def open_edit_dialog(self, contact):
+        if contact is None:
+            QMessageBox.critical(self, "Error", "Contact not found.")
+            self.refresh_callback()
+            return
+        EditContactDialog(contact, self.refresh_callback).exec_()
 
     def delete_selected_contact(self):
-        """Delete the currently selected contact after confirmation."""
-        if self.selected_contact_id is None:
+        """Delete the selected contacts after confirmation."""
+        if not self.selected_ids:
             QMessageBox.information(self, "Select Contact", "Please select a contact to delete.")
             return
-        reply = QMessageBox.question(
-            self, "Confirm Delete", "Are you sure you want to delete this contact?",
-            QMessageBox.Yes | QMessageBox.No
-        )
+        contact_ids = list(self.selected_ids)
+        message = ("Are you sure you want to delete this contact?" if len(contact_ids) == 1
+                   else f"Are you sure you want to delete these {len(contact_ids)} contacts?")
+        reply = QMessageBox.question(self, "Confirm Delete", message, QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            delete_contact_from_db(self.selected_contact_id)
-            QMessageBox.information(self, "Deleted", "Contact deleted successfully.")
-            self.load_contacts()
+            def on_deleted(_):
+                QMessageBox.information(self, "Deleted", f"{len(contact_ids)} contact(s) deleted successfully.")
+                self.refresh_callback(removed=contact_ids)
+            task_runner.submit(delete_contacts_from_db, contact_ids, write=True, on_result=on_deleted,
+                               on_error=show_task_error(self, "Deleting contacts"))
+
+    def import_contacts(self):
+        """Bulk import contacts from a CSV/JSON/vCard file on a background thread."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Contacts", "", "Contacts (*.csv *.json *.jsonl *.vcf);;All Files (*)")
+        if not path:
+            return
+        from contact_io import import_contacts
+
+        def on_success(report):
+            QMessageBox.information(self, "Import", report.summary())
             self.refresh_callback()
 
+        run_file_job(self, "Importing contacts",
+                     lambda progress: import_contacts(path, progress), on_success, write=True)
+
+    def export_contacts(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Contacts", "contacts.csv", "CSV (*.csv);;JSON (*.json);;JSON Lines (*.jsonl);;vCard (*.vcf)")
+        if not path:
+            return
+        from contact_io import export_contacts
+        run_file_job(self, "Exporting contacts", lambda progress: export_contacts(path),
+                     lambda count: QMessageBox.information(self, "Export", f"Exported {count} contacts."))
+
+    def find_duplicates(self):
+        """Sweep all contacts for duplicates on a background thread and list them for merging."""
+        from dedupe import find_duplicates
+
+        def on_success(pairs):
+            if not pairs:
+                QMessageBox.information(self, "Find Duplicates", "No duplicate contacts found.")
+                return
+            DuplicatesDialog(pairs, self.refresh_callback).exec_()
+
+        run_file_job(self, "Finding duplicates", lambda progress: find_duplicates(), on_success)
+
 
 # A simple dialog for editing a contact (assumes update_contact_in_db exists)
 class EditContactDialog(QDialog):
-    def __init__(self, contact_id, refresh_callback):
+    def __init__(self, contact, refresh_callback):
+        """ contact: tuple (id, name, position, email, country, contact_level) as shown in the table """
         super().__init__()
-        self.contact_id = contact_id
+        self.contact = contact
+        self.contact_id = contact[0]
         self.refresh_callback = refresh_callback
         self.setWindowTitle("Edit Contact")
         self.init_ui()
@@ -277,13 +422,6 @@ class EditContactDialog(QDialog):
     def init_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
-        # For simplicity, we reload the contact info from get_all_contacts
-        contacts = get_all_contacts()
-        self.contact = next((c for c in contacts if c[0] == self.contact_id), None)
-        if not self.contact:
-            QMessageBox.critical(self, "Error", "Contact not found.")
-            self.reject()
-            return
 
         form_layout = QFormLayout()
         self.name_entry = QLineEdit(self.contact[1])
@@ -326,28 +464,186 @@ class EditContactDialog(QDialog):
             QMessageBox.critical(self, "Error", "Please fill all fields.")
             return
 
-        update_contact_in_db(self.contact_id, name, position, email, country, level)
+        contact = (self.contact_id, name, position, email, country, level)
+        if (name, email) == (self.contact[1], self.contact[3] or ""):
+            self.confirm_save(contact, [])
+            return
+        # Name or email changed: check that this doesn't make it a duplicate of another contact.
+        from dedupe import find_similar
+        task_runner.submit(find_similar, name, email, country, self.contact_id, name="duplicate check",
+                           on_result=lambda matches: self.confirm_save(contact, matches),
+                           on_error=lambda error: self.confirm_save(contact, []))
+
+    def confirm_save(self, contact, matches):
+        if not confirm_not_duplicate(self, matches):
+            return
+        task_runner.submit(update_contact_in_db, *contact, write=True, on_result=self.contact_saved, on_error=self.save_failed)
+
+    def contact_saved(self, _):
         QMessageBox.information(self, "Saved", "Contact updated successfully.")
-        self.refresh_callback()
+        self.refresh_callback(updated=[self.contact_id])
         self.accept()
 
+    def save_failed(self, error):
+        if isinstance(error, sqlite3.IntegrityError):
+            QMessageBox.critical(self, "Error", "A contact with this email already exists.")
+        else:
+            QMessageBox.critical(self, "Error", f"Failed to save contact: {error}")
+
+
+# Dialog for changing the same fields on several contacts at once
+class BulkEditContactDialog(QDialog):
+    UNCHANGED = "(Unchanged)"
+
+    def __init__(self, contact_ids, refresh_callback):
+        super().__init__()
+        self.contact_ids = contact_ids
+        self.refresh_callback = refresh_callback
+        self.setWindowTitle(f"Edit {len(contact_ids)} Contacts")
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.addWidget(QLabel("Fields left empty are not changed."))
+
+        form_layout = QFormLayout()
+        self.position_entry = QLineEdit()
+        self.country_entry = QLineEdit()
+        self.level_entry = QComboBox()
+        self.level_entry.addItems([self.UNCHANGED, "First Contact", "Second Contact", "Third Contact"])
+        form_layout.addRow("Position:", self.position_entry)
+        form_layout.addRow("Country:", self.country_entry)
+        form_layout.addRow("Contact Level:", self.level_entry)
+        layout.addLayout(form_layout)
+
+        button_box = QHBoxLayout()
+        save_button = QPushButton("Save")
+        cancel_button = QPushButton("Cancel")
+        save_button.clicked.connect(self.save_contacts)
+        cancel_button.clicked.connect(self.reject)
+        button_box.addWidget(save_button)
+        button_box.addWidget(cancel_button)
+        layout.addLayout(button_box)
+
+    def save_contacts(self):
+        fields = {}
+        if self.position_entry.text():
+            fields["position"] = self.position_entry.text()
+        if self.country_entry.text():
+            fields["country"] = self.country_entry.text()
+        if self.level_entry.currentText() != self.UNCHANGED:
+            fields["priority"] = self.level_entry.currentText()
+        if not fields:
+            self.reject()
+            return
+
+        def on_saved(_):
+            QMessageBox.information(self, "Saved", f"{len(self.contact_ids)} contacts updated successfully.")
+            self.refresh_callback(updated=list(self.contact_ids))
+            self.accept()
+        task_runner.submit(lambda: update_contacts_in_db(self.contact_ids, **fields), name="update contacts", write=True,
+                           on_result=on_saved, on_error=show_task_error(self, "Saving contacts"))
+
+
+# Dialog listing possible duplicates (dedupe.find_duplicates) to merge
+class DuplicatesDialog(QDialog):
+    HEADERS = ["Score", "Keep", "Duplicate", "Why"]
+
+    def __init__(self, pairs, refresh_callback):
+        super().__init__()
+        self.pairs = list(pairs)
+        self.refresh_callback = refresh_callback
+        self.setWindowTitle(f"{len(self.pairs)} Possible Duplicates")
+        self.resize(900, 500)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.addWidget(QLabel("Merging moves the duplicate's history to the contact kept and fills "
+                                "its empty fields, then deletes the duplicate."))
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        self.show_pairs()
+
+        button_box = QHBoxLayout()
+        merge_button = QPushButton("Merge Selected")
+        close_button = QPushButton("Close")
+        merge_button.clicked.connect(self.merge_selected)
+        close_button.clicked.connect(self.accept)
+        button_box.addWidget(merge_button)
+        button_box.addWidget(close_button)
+        layout.addLayout(button_box)
+
+    def show_pairs(self):
+        def describe(contact):
+            return f"{contact[1]} <{contact[3] or 'no email'}>, {contact[4]}"
+
+        self.table.setRowCount(len(self.pairs))
+        for row, pair in enumerate(self.pairs):
+            for column, text in enumerate([f"{pair.score:.0%}", describe(pair.first), describe(pair.second),
+                                           ", ".join(pair.reasons)]):
+                self.table.setItem(row, column, QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+    def merge_selected(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            QMessageBox.information(self, "Select Duplicates", "Please select the pairs to merge.")
+            return
+        # Pairs sharing a contact are merged as one group, into its oldest contact.
+        from dedupe import group_duplicates
+        groups = group_duplicates([self.pairs[row] for row in rows])
+        removed = [contact_id for group in groups for contact_id in group[1:]]
+        reply = QMessageBox.question(self, "Confirm Merge", f"Merge {len(removed)} duplicate(s) into "
+                                     f"{len(groups)} contact(s)?", QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        def merge():
+            with write_batch():
+                for group in groups:
+                    merge_contacts(group[0], group[1:])
+
+        def on_merged(_):
+            # A full refresh, like an import: the sampler must also pick up the merged cooldowns.
+            self.refresh_callback()
+            gone = set(removed)
+            self.pairs = [pair for pair in self.pairs if pair.first[0] not in gone and pair.second[0] not in gone]
+            self.show_pairs()
+        task_runner.submit(merge, name="merge contacts", write=True, on_result=on_merged,
+                           on_error=show_task_error(self, "Merging contacts"))
+
 
 # =============================================================================
 # Page 3: Scheduler Page
 # =============================================================================
 
 class SchedulerPage(QWidget):
-    def __init__(self, show_notification_callback):
+    # Mail backends offered for batch outreach (see mail_backends.py)
+    OUTREACH_BACKENDS = ["Outlook (save to Drafts)", "Outlook (open each email)", ".eml folder", "SMTP"]
+
+    def __init__(self, show_notification_callback, settings_changed_signal, outreach_callback=None):
+        """
+        outreach_callback: called with (number of contacts, mail backend) to start a batch outreach.
+        """
         super().__init__()
         self.show_notification_callback = show_notification_callback
+        self.outreach_callback = outreach_callback
+        self.user_file = None  # set with the settings, see load
         self.init_ui()
-        # self.user_file = "user.json"
+        settings_changed_signal.connect(self.show_settings)
+        self.load()
 
     def init_ui(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
-        
-        self.user_file = "user.json"
 
         title = QLabel("Scheduler Settings")
         title.setFont(QFont("Arial", 16, QFont.Bold))
@@ -374,6 +670,13 @@ class SchedulerPage(QWidget):
         
         layout.addLayout(time_layout)
 
+        # Cooldown: days before a contacted person can be picked again
+        layout.addWidget(QLabel("Cooldown (days)"))
+        self.cooldown_select = QSpinBox()
+        self.cooldown_select.setRange(0, 365)
+        self.cooldown_select.setToolTip("Contacts selected or emailed within this many days are not picked. 0 turns it off.")
+        layout.addWidget(self.cooldown_select)
+
         # Set Frequency Button
         set_button = QPushButton("Set Frequency")
         set_button.clicked.connect(self.set_frequency)
@@ -383,38 +686,111 @@ class SchedulerPage(QWidget):
         force_button = QPushButton("Force Notification")
         force_button.clicked.connect(self.show_notification_callback)
         layout.addWidget(force_button)
+
+        # Batch outreach: emails for several contacts at once
+        if self.outreach_callback is not None:
+            outreach_layout = QHBoxLayout()
+            outreach_layout.addWidget(QLabel("Batch Outreach"))
+            self.outreach_count = QSpinBox()
+            self.outreach_count.setRange(1, 100)
+            self.outreach_count.setValue(5)
+            outreach_layout.addWidget(self.outreach_count)
+            self.outreach_backend = QComboBox()
+            self.outreach_backend.addItems(self.OUTREACH_BACKENDS)
+            outreach_layout.addWidget(self.outreach_backend)
+            outreach_button = QPushButton("Generate Emails")
+            outreach_button.clicked.connect(self.start_outreach)
+            outreach_layout.addWidget(outreach_button)
+            layout.addLayout(outreach_layout)
         
         # Email Template Editor
         element = QHBoxLayout()
         self.email_edit_label = QLabel("Edit Email Template")
         self.email_edit_label2 = QLabel("TEST")
-        self.email_edit_label.setToolTip("Recepient name: {recepient_name}, Country: {country}, Your Name: {user_name}, Available times: {times_formatted}")
+        self.email_edit_label.setToolTip("Recipient name: {recipient_name}, Position: {position}, Country: {country}, "
+                                         "Contact level: {contact_level}, Your Name: {user_name}, Available times: {times_formatted}")
         element.addWidget(self.email_edit_label) # Change str to Alignment Type - first improt
         # element.addWidget(self.email_edit_label2,0,"Qt::AlignRight")
         # layout.addWidget(self.email_edit_label)
         layout.addLayout(element)
         
         self.email_editor = QTextEdit()
-        self.email_editor.setText(load_email_template(self.user_file))  # Load existing template
         layout.addWidget(self.email_editor)
         
-        # Save Email Template Button
-        save_button = QPushButton("Save Email Template")
-        save_button.clicked.connect(self.save_email_template)
-        layout.addWidget(save_button)
+        # Save Email Template Button (enabled once the template has been loaded)
+        self.save_template_button = QPushButton("Save Email Template")
+        self.save_template_button.setEnabled(False)
+        self.save_template_button.clicked.connect(self.save_email_template)
+        layout.addWidget(self.save_template_button)
 
         layout.addStretch()
 
+    def load(self):
+        """ Read the settings and the email template on a worker thread, then show them. """
+        def read():
+            settings = settings_store.get()
+            return settings, load_email_template(settings.template_path)
+
+        def show(result):
+            settings, template = result
+            self.show_settings(settings)
+            self.email_editor.setText(template)
+            self.save_template_button.setEnabled(True)
+        task_runner.submit(read, key=("scheduler-settings", id(self)), name="load scheduler settings",
+                           on_result=show, on_error=show_task_error(self, "Loading the scheduler settings"))
+
+    def show_settings(self, settings):
+        """Reflect the stored settings in the form (called on every settings change)."""
+        if settings.frequency:
+            self.frequency_select.setCurrentText(settings.frequency[0])
+        hour, minute = settings.time.split(":")
+        self.hour_select.setCurrentText(hour)
+        self.minute_select.setCurrentText(minute)
+        self.cooldown_select.setValue(settings.cooldown_days)
+        self.user_file = settings.template_path
+
     def set_frequency(self):
         frequency = self.frequency_select.currentText()
         time_str = f"{self.hour_select.currentText()}:{self.minute_select.currentText()}"
-        set_settings([frequency], time_str)
-        QMessageBox.information(self, "Success", f"Frequency updated! Notifications scheduled for {frequency} at {time_str}.")
+        cooldown_days = self.cooldown_select.value()
+        task_runner.submit(
+            lambda: settings_store.update(frequency=[frequency], time=time_str, cooldown_days=cooldown_days),
+            name="save settings", write=True,
+            on_result=lambda _: QMessageBox.information(
+                self, "Success", f"Frequency updated! Notifications scheduled for {frequency} at {time_str}."),
+            on_error=show_task_error(self, "Saving settings"))
+
+    def start_outreach(self):
+        from mail_backends import OutlookBackend, SmtpBackend, EmlDirectoryBackend
+        choice = self.outreach_backend.currentText()
+        if choice.startswith("Outlook"):
+            backend = OutlookBackend(display=choice == "Outlook (open each email)")
+        elif choice == "SMTP":
+            backend = SmtpBackend.from_environment()
+            if backend is None:
+                QMessageBox.critical(self, "Error", "Set ROLLODEX_SMTP_HOST (and _PORT, _USER, _PASSWORD, _SENDER) to use SMTP.")
+                return
+        else:
+            directory = QFileDialog.getExistingDirectory(self, "Folder for .eml files")
+            if not directory:
+                return
+            backend = EmlDirectoryBackend(directory)
+        self.outreach_callback(self.outreach_count.value(), backend)
 
     def save_email_template(self):
         content = self.email_editor.toPlainText()
-        save_email_template(content,self.user_file)
-        QMessageBox.information(self, "Success", "Email template saved successfully!")
+        problems = validate_template(content)
+        if problems:
+            reply = QMessageBox.question(
+                self, "Check Template",
+                "The template has problems; they will appear as written in emails:\n\n"
+                + "\n".join(problems) + "\n\nSave anyway?",
+                QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+        task_runner.submit(save_email_template, content, self.user_file, write=True,
+                           on_result=lambda _: QMessageBox.information(self, "Success", "Email template saved successfully!"),
+                           on_error=show_task_error(self, "Saving the email template"))
 
 
 # =============================================================================
@@ -422,10 +798,16 @@ class SchedulerPage(QWidget):
 # =============================================================================
 
 class AnalyticsPage(QWidget):
+    # Requery when shown again only if new events were recorded meanwhile.
+    REFRESH_ON_SHOW = REFRESH_STALE
+    DATA_TABLES = ("analytics",)
+
     def __init__(self):
         super().__init__()
         self.init_ui()
-        # Optionally, update the analytics data every time the page is shown.
+        self.update_analytics()
+
+    def refresh(self):
         self.update_analytics()
 
     def init_ui(self):
@@ -438,10 +820,22 @@ class AnalyticsPage(QWidget):
         header_layout.addWidget(title)
         header_layout.addStretch()
 
+        # Time range served from the daily rollup table
+        self.range_select = QComboBox()
+        for label, name in [("All Time", "all"), ("Last 7 Days", "last_7_days"), ("Last 30 Days", "last_30_days"),
+                            ("This Quarter", "this_quarter"), ("This Year", "this_year")]:
+            self.range_select.addItem(label, name)
+        self.range_select.currentIndexChanged.connect(self.update_analytics)
+        header_layout.addWidget(self.range_select)
+
         refresh_button = QPushButton("Refresh")
         refresh_button.clicked.connect(self.update_analytics)
         header_layout.addWidget(refresh_button)
 
+        export_button = QPushButton("Export")
+        export_button.clicked.connect(self.export_analytics)
+        header_layout.addWidget(export_button)
+
         self.layout.addLayout(header_layout)
 
         # Table to display analytics data
@@ -452,11 +846,25 @@ class AnalyticsPage(QWidget):
 
         self.layout.addStretch()
 
+    def export_analytics(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Analytics", "analytics.csv", "CSV (*.csv);;JSON (*.json);;JSON Lines (*.jsonl)")
+        if not path:
+            return
+        from contact_io import export_analytics
+        run_file_job(self, "Exporting analytics", lambda progress: export_analytics(path),
+                     lambda count: QMessageBox.information(self, "Export", f"Exported {count} events."))
+
     def update_analytics(self):
         """
         Query the database for analytics summary and update the table.
         """
-        summary = get_analytics_summary()  # List of tuples: (country, selected_count, emailed_count)
+        start, end = analytics_date_range(self.range_select.currentData())
+        task_runner.submit(get_analytics_summary, start, end, key=("analytics-summary", id(self)),
+                           on_result=self.show_summary, on_error=show_task_error(self, "Loading analytics"))
+
+    def show_summary(self, summary):
+        """ summary: list of tuples (country, selected_count, emailed_count) """
         self.table.setRowCount(0)
         for country, selected_count, emailed_count in summary:
             row = self.table.rowCount()
@@ -471,8 +879,15 @@ class AnalyticsPage(QWidget):
 # Page 5: Country Priority Page
 # =============================================================================
 class CountryPage(QWidget):
-    def __init__(self):
+    REFRESH_ON_SHOW = REFRESH_STALE
+    DATA_TABLES = ("country_priority",)
+
+    def __init__(self, priority_changed_callback=None):
+        """
+        priority_changed_callback: called with (country, priority) after a priority is saved.
+        """
         super().__init__()
+        self.priority_changed_callback = priority_changed_callback
         self.init_ui()
 
     def init_ui(self):
@@ -511,14 +926,27 @@ class CountryPage(QWidget):
         priority = self.priority_spin.value()
         # Assume set_country_priority is implemented externally to update the database.
         from database import set_country_priority
-        set_country_priority(country, priority)
+        task_runner.submit(set_country_priority, country, priority, write=True,
+                           on_result=lambda _: self.priority_saved(country, priority),
+                           on_error=show_task_error(self, "Saving the priority"))
+
+    def priority_saved(self, country, priority):
+        if self.priority_changed_callback:
+            self.priority_changed_callback(country, priority)
         QMessageBox.information(self, "Success", f"Priority for {country} updated to {priority}.")
         self.load_country_priorities()
 
+    def refresh(self):
+        self.load_country_priorities()
+
     def load_country_priorities(self):
         # Assume get_country_priorities returns a list of tuples: (country, priority)
         from database import get_country_priorities
-        priorities = get_country_priorities()
+        task_runner.submit(get_country_priorities, key=("country-priorities", id(self)),
+                           on_result=self.show_country_priorities,
+                           on_error=show_task_error(self, "Loading country priorities"))
+
+    def show_country_priorities(self, priorities):
         self.table.setRowCount(0)
         for country, priority in priorities:
             row = self.table.rowCount()
@@ -527,6 +955,157 @@ class CountryPage(QWidget):
             self.table.setItem(row, 1, QTableWidgetItem(str(priority)))
 
 
+# =============================================================================
+# Diagnostics Page (hidden, Ctrl+Shift+D)
+# =============================================================================
+class DiagnosticsPage(QWidget):
+    """
+    Timings recorded by tracing: per operation count and p50/p95/p99/max duration,
+    with export to Chrome trace JSON for a timeline of what ran on which thread.
+    """
+    REFRESH_ON_SHOW = REFRESH_ALWAYS
+
+    def __init__(self):
+        super().__init__()
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        header_layout = QHBoxLayout()
+        title = QLabel("Diagnostics")
+        title.setFont(QFont("Arial", 16, QFont.Bold))
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+
+        self.record_checkbox = QCheckBox("Record timings")
+        self.record_checkbox.setChecked(tracing.is_enabled())
+        self.record_checkbox.toggled.connect(lambda on: tracing.enable() if on else tracing.disable())
+        header_layout.addWidget(self.record_checkbox)
+
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        header_layout.addWidget(refresh_button)
+
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+        header_layout.addWidget(clear_button)
+
+        export_button = QPushButton("Export Trace")
+        export_button.clicked.connect(self.export_trace)
+        header_layout.addWidget(export_button)
+
+        self.layout.addLayout(header_layout)
+
+        self.summary_label = QLabel()
+        self.layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels(["Operation", "Category", "Count", "p50 ms", "p95 ms", "p99 ms", "Max ms"])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.layout.addWidget(self.table)
+
+    def refresh(self):
+        stats = tracing.operation_stats()
+        self.summary_label.setText(f"{sum(entry.count for entry in stats)} spans recorded"
+                                   if stats or tracing.is_enabled() else
+                                   "Recording is off; tick Record timings (or set ROLLODEX_TRACE=1).")
+        self.table.setRowCount(len(stats))
+        for row, entry in enumerate(stats):
+            values = [entry.name, entry.category, str(entry.count)] + [
+                f"{value:.2f}" for value in (entry.p50_ms, entry.p95_ms, entry.p99_ms, entry.max_ms)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def clear(self):
+        tracing.clear()
+        self.refresh()
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "rollodex-trace.json", "Chrome trace (*.json)")
+        if not path:
+            return
+        try:
+            count = tracing.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Exporting the trace failed: {e}")
+            return
+        QMessageBox.information(self, "Export", f"Exported {count} spans. Open the file in chrome://tracing "
+                                                "or https://ui.perfetto.dev.")
+
+
+# =============================================================================
+# Notification Scheduler
+# =============================================================================
+class SettingsNotifier(QObject):
+    """Re-emits settings_store changes as a Qt signal (safe to emit from any thread)."""
+    changed = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        settings_store.subscribe(self.changed.emit)
+
+
+class RemoteChangeNotifier(QObject):
+    """Re-emits commits made through the database service, by any client, as a Qt signal."""
+    changed = Signal(object)
+
+    def __init__(self, service, parent=None):
+        super().__init__(parent)
+        stop = service.watch(self.changed.emit)
+        self.destroyed.connect(lambda *_: stop.set())
+
+
+class NotificationScheduler(QObject):
+    """
+    Fires `notification_due` at the configured day(s)/time using a single-shot timer
+    armed for the next occurrence, instead of polling the clock and the database.
+    """
+    notification_due = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.frequency = []
+        self.time_str = None
+        self.next_fire = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def reschedule(self, settings):
+        """Arm the timer for the next notification of the given settings."""
+        self.frequency, self.time_str = settings.frequency, settings.time
+        self.next_fire = next_fire_time(self.frequency, self.time_str, datetime.now())
+        self.arm()
+
+    def arm(self):
+        if self.next_fire is None:
+            self.timer.stop()
+            return
+        self.timer.start(timer_delay_ms(self.next_fire, datetime.now()))
+
+    def on_timeout(self):
+        # The timer is capped (see MAX_TIMER_INTERVAL) and runs on a monotonic clock, so
+        # compare against the wall clock: we may be early (capped interval, clock moved
+        # back) or late (machine was asleep, clock moved forward).
+        now = datetime.now()
+        if now < self.next_fire:
+            self.arm()
+            return
+        missed_by = now - self.next_fire
+        self.next_fire = next_fire_time(self.frequency, self.time_str, now)
+        self.arm()
+        if missed_by <= MISSED_GRACE:
+            self.notification_due.emit()
+
+
 # =============================================================================
 # Main Window with Sidebar Navigation and Page Switching
 # =============================================================================
@@ -536,10 +1115,18 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("Contact Notifier")
         self.setGeometry(100, 100, 1000, 600)
-        self.contacts = []  # Cache contacts if needed
+        self.sampler = None  # ContactSampler, built on first notification
         
-        # get user settings from user.json
-        self.user_file = "user.json"
+        # Defaults until the stored settings are loaded (see the end of __init__).
+        self.user_file = Settings.template_path
+        self.cooldown_days = Settings.cooldown_days
+        self.settings_notifier = SettingsNotifier(self)
+        self.settings_notifier.changed.connect(self.on_settings_changed)
+        # With a shared database service, other copies of the app change the data too.
+        self.remote_versions = None
+        if get_service() is not None:
+            self.remote_changes = RemoteChangeNotifier(get_service(), self)
+            self.remote_changes.changed.connect(self.on_remote_change)
         
         # Main container widget and layout
         container = QWidget()
@@ -547,169 +1134,234 @@ class MainWindow(QMainWindow):
         main_layout = QHBoxLayout()
         container.setLayout(main_layout)
 
+        # Page registry: only the first page is built up front; the others are built the
+        # first time they are shown, and refreshed on show if their data changed
+        # (see LazyStackedWidget).
+        self.pages = LazyStackedWidget(get_data_versions, task_runner=task_runner)
+        self.new_contact_page = None
+        self.manage_contacts_page = None
+        self.scheduler_page = None
+        self.analytics_page = None
+        self.country_page = None
+        self.diagnostics_page = None
+        self.pages.add_page("New Contact", self.create_new_contact_page)
+        self.manage_contacts_index = self.pages.add_page("Manage Contacts", self.create_manage_contacts_page)
+        self.pages.add_page("Scheduler", self.create_scheduler_page)
+        self.pages.add_page("Analytics", self.create_analytics_page)
+        self.country_index = self.pages.add_page("Country", self.create_country_page)
+        self.pages.setCurrentIndex(0)
+
         # Sidebar navigation
         self.sidebar = self.create_sidebar()
+        # Registered after the sidebar so it gets no button; opened with Ctrl+Shift+D.
+        self.diagnostics_index = self.pages.add_page("Diagnostics", self.create_diagnostics_page)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self,
+                  activated=lambda: self.pages.setCurrentIndex(self.diagnostics_index))
         main_layout.addWidget(self.sidebar)
-
-        # Stacked widget for pages
-        self.pages = QStackedWidget()
         main_layout.addWidget(self.pages, 1)  # stretch factor so pages expand
 
-        # Create pages
+        self.notification_scheduler = NotificationScheduler(self)
+        self.notification_scheduler.notification_due.connect(self.show_notification)
+        # Arms the notification timer once the settings are read (off the GUI thread).
+        task_runner.submit(settings_store.get, key="load-settings", name="load settings",
+                           on_result=self.on_settings_changed, on_error=show_task_error(self, "Loading settings"))
+
+        # Start fetching calendar free slots so the Email button doesn't wait on Outlook
+        get_free_slot_cache().prefetch()
+
+    # ---- Page factories ----
+
+    def create_new_contact_page(self):
         self.new_contact_page = NewContactPage(self.refresh_contacts)
+        return self.new_contact_page
+
+    def create_manage_contacts_page(self):
         self.manage_contacts_page = ManageContactsPage(self.refresh_contacts)
-        # self.scheduler_page = SchedulerPage(self.show_notification)
-        
-        self.scheduler_page = SchedulerPage(self.show_notification)
+        return self.manage_contacts_page
 
-        
-        self.notification_timer = QTimer(self)
-        self.notification_timer.timeout.connect(self.schedule_notification)
-        self.notification_timer.start(10)  # check every 30 seconds
-        
-        self.pushed_today = False
-        
+    def create_scheduler_page(self):
+        self.scheduler_page = SchedulerPage(self.show_notification, self.settings_notifier.changed, self.start_outreach)
+        return self.scheduler_page
+
+    def create_analytics_page(self):
         self.analytics_page = AnalyticsPage()
-        self.country_page = CountryPage()
+        return self.analytics_page
 
-        # Add pages to the stacked widget
-        self.pages.addWidget(self.new_contact_page)       # index 0
-        self.pages.addWidget(self.manage_contacts_page)     # index 1
-        self.pages.addWidget(self.scheduler_page)           # index 2
-        self.pages.addWidget(self.analytics_page)           # index 3
-        self.pages.addWidget(self.country_page)             # index 4
+    def create_country_page(self):
+        self.country_page = CountryPage(self.on_country_priority_changed)
+        return self.country_page
 
-        # Start the scheduler thread
-        threading.Thread(target=self.run_scheduler, daemon=True).start()
-        # self.run_scheduler()
+    def create_diagnostics_page(self):
+        self.diagnostics_page = DiagnosticsPage()
+        return self.diagnostics_page
 
-    
     def create_sidebar(self):
         sidebar = QWidget()
         layout = QVBoxLayout()
         sidebar.setLayout(layout)
 
-        # Buttons for navigation
-        buttons = [
-            ("New Contact", 0),
-            ("Manage Contacts", 1),
-            ("Scheduler", 2),
-            ("Analytics", 3),
-            ("Country", 4),
-        ]
-        for text, index in buttons:
+        # Buttons for navigation, one per registered page
+        for index, text in enumerate(self.pages.titles):
             btn = QPushButton(text)
             btn.clicked.connect(lambda _, idx=index: self.pages.setCurrentIndex(idx))
             layout.addWidget(btn)
         layout.addStretch()
         return sidebar
 
-    def refresh_contacts(self):
-        # Refresh contacts on pages that display them
-        self.manage_contacts_page.load_contacts()
-        # Also update internal contacts list used for notification selection
-        self.contacts = get_all_contacts()
-
-    def run_scheduler(self):
-        # This thread will run scheduled tasks without blocking the UI.
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
-
-    def schedule_notification(self):
-        # # Retrieve frequency settings from database (assumed implemented)
-        # frequency = get_settings("frequency")
-        # time_str = get_settings("time")
-        # # In this example, we schedule the notification daily at the specified time.
-        # schedule.every().day.at(time_str).do(self.show_notification)
+    def refresh_contacts(self, added=(), updated=(), removed=()):
         """
-        Retrieve frequency settings from the database and schedule a notification job.
-        The frequency is expected to be a day name ("Monday", "Tuesday", etc.)
-        and the time is in "HH:MM" format (local time).
+        Called after contacts change. Pages are updated incrementally with the ids that
+        changed; with no ids everything is reloaded.
         """
-        # Retrieve settings (note: our set_settings stores frequency as a comma separated string,
-        # but here we assume that only one frequency is selected)
-        
-        dt_now = QDateTime.currentDateTime().toString("dddd,hh:mm").lower().split(",")
-        date_now = dt_now[0]
-        time_now = dt_now[1]
-        
-        if self.pushed_today:
-            if time_now == "00:00":
-                self.pushed_today = False
-        
-        if not self.pushed_today:
-            frequency, time_str = get_settings()  # e.g., (["Monday"], "13:00")
-
-            #print(frequency, time_str)
-            if not frequency:
-                # No frequency was set; you might decide to schedule a default or do nothing.
-                return
+        if not (added or updated or removed):
+            if self.manage_contacts_page is not None:
+                self.manage_contacts_page.load_contacts()
+            self.pages.mark_fresh(self.manage_contacts_index)
+            self.sampler = None  # rebuilt on the next notification
+            return
+        if added or updated:
+            # One read, on the task runner, for the table and the sampler.
+            task_runner.submit(get_contacts_by_ids, list(added) + list(updated), name="load changed contacts",
+                               on_result=lambda contacts: self.apply_contact_changes(added, updated, removed, contacts),
+                               on_error=show_task_error(self, "Loading changed contacts"))
+        else:
+            self.apply_contact_changes(added, updated, removed, {})
+
+    def apply_contact_changes(self, added, updated, removed, contacts):
+        """ refresh_contacts, once the changed contacts (id -> tuple) are loaded. """
+        # Refresh contacts on pages that display them (a page not built yet loads fresh data when it is)
+        if self.manage_contacts_page is not None:
+            self.manage_contacts_page.contacts_changed(added, updated, removed, contacts)
+        self.pages.mark_fresh(self.manage_contacts_index)
+        # Also update the sampler used for notification selection
+        if self.sampler is not None:
+            for contact in contacts.values():
+                self.sampler.update_contact(contact)
+            for contact_id in removed:
+                self.sampler.remove_contact(contact_id)
+
+    def on_country_priority_changed(self, country, priority):
+        self.pages.mark_fresh(self.country_index)
+        if self.sampler is not None:
+            self.sampler.set_country_priority(country, priority)
+
+    def on_remote_change(self, versions):
+        """ Something was committed through the database service: update what is on screen. """
+        sampler_tables = ("contacts", "country_priority")
+        if self.remote_versions is None or any(
+                versions.get(table) != self.remote_versions.get(table) for table in sampler_tables):
+            self.sampler = None  # rebuilt with the other clients' changes on the next pick
+        self.remote_versions = versions
+        if self.pages.currentIndex() in self.pages.built:
+            self.pages.refresh_if_needed(self.pages.currentIndex())
+
+    def with_sampler(self, callback):
+        """
+        Call callback(sampler) with the ContactSampler, building it on a worker thread
+        first if needed (it loads every contact).
+        """
+        if self.sampler is not None:
+            callback(self.sampler)
+            return
 
-            # for day in frequency:
-            day = frequency.lower()
-            day = day.lower()
-            if date_now == day:
-                if time_now == time_str:
-                    self.show_notification()
-                    self.pushed_today = True
-                    # time.sleep(3)
+        def on_built(sampler):
+            if self.sampler is None:
+                self.sampler = sampler
+            callback(self.sampler)
+        task_runner.submit(build_sampler, self.cooldown_days, key="build-sampler", name="build sampler", on_result=on_built,
+                           on_error=show_task_error(self, "Loading contacts"))
+
+    def on_settings_changed(self, settings):
+        self.user_file = settings.template_path
+        if settings.cooldown_days != self.cooldown_days:
+            self.cooldown_days = settings.cooldown_days
+            self.sampler = None  # rebuilt with the new window on the next pick
+        self.schedule_notification(settings)
+
+    def schedule_notification(self, settings):
+        """
+        Re-arm the notification timer after the frequency/time settings changed.
+        The frequency is a list of day names ("Monday", "Tuesday", etc.)
+        and the time is in "HH:MM" format (local time).
+        """
+        self.notification_scheduler.reschedule(settings)
 
     def show_notification(self):
-        # Reload contacts
-        self.contacts = get_all_contacts()
-        if not self.contacts:
+        self.with_sampler(self.notify_with)
+
+    def notify_with(self, sampler):
+        # Pick a country weighted by (6 - priority), then the best contact level in it
+        # (see sampler.ContactSampler).
+        selected_contact = sampler.pick()
+        if selected_contact is None and len(sampler):
+            QMessageBox.information(self, "Notification",
+                                    f"Every contact was contacted in the last {self.cooldown_days} days.")
+            return
+        if selected_contact is None:
             QMessageBox.information(self, "Notification", "No contacts available to notify.")
             return
 
-        # --- New Notification Selection Logic ---
-        # 1. Group contacts by country.
-        contacts_by_country = {}
-        for contact in self.contacts:
-            # Assuming contact structure: (id, name, position, email, country, contact_level)
-            country = contact[4]
-            contacts_by_country.setdefault(country, []).append(contact)
+        # Create and show the notification popup.
+        self.show_notification_popup(selected_contact)
+
+    def start_outreach(self, count, backend):
+        """ Pick `count` contacts and queue an email to each through `backend`, with a progress dialog. """
+        self.with_sampler(lambda sampler: self.send_outreach(sampler, count, backend))
 
-        if not contacts_by_country:
-            QMessageBox.information(self, "Notification", "No contacts available.")
+    def send_outreach(self, sampler, count, backend):
+        from outreach import pick_contacts, run_outreach
+        contacts = pick_contacts(sampler, count)
+        if not contacts and len(sampler):
+            QMessageBox.information(self, "Outreach", f"Every contact was contacted in the last {self.cooldown_days} days.")
             return
-
-        # 2. Retrieve country priorities.
-        # Assume get_country_priorities returns a list of tuples: (country, priority)
-        from database import get_country_priorities
-        country_priority_dict = dict(get_country_priorities())
-        # For any country not set, assume a default priority value (e.g., 3)
-        default_priority = 3
-        countries = list(contacts_by_country.keys())
-        weights = []
-        for country in countries:
-            # Lower numeric priority means higher importance; we use (6 - priority) as weight.
-            cp = country_priority_dict.get(country, default_priority)
-            weights.append(6 - cp)
-
-        # 3. Randomly select a country using the weights.
-        selected_country = random.choices(countries, weights=weights, k=1)[0]
-
-        # 4. Within that country, select a contact based on contact level priority.
-        # Preferred order: First Contact > Second Contact > Third Contact.
-        candidates = contacts_by_country[selected_country]
-        preferred_order = ["First Contact", "Second Contact", "Third Contact"]
-        selected_contact = None
-        for level in preferred_order:
-            level_candidates = [c for c in candidates if c[5] == level]
-            if level_candidates:
-                selected_contact = random.choice(level_candidates)
-                break
-        if not selected_contact:
-            # Fallback: choose any contact
-            selected_contact = random.choice(candidates)
-
-        # 5. Create and show the notification popup.
-        self.show_notification_popup(selected_contact)
+        if not contacts:
+            QMessageBox.information(self, "Outreach", "No contacts available to notify.")
+            return
+        priorities = {contact[4]: sampler.priorities.get(contact[4], DEFAULT_COUNTRY_PRIORITY) for contact in contacts}
+        recorded = 0
+
+        def record_sent(report):
+            # Only contacts whose email went out count as selected and start their cooldown.
+            nonlocal recorded
+            sent = report.sent[recorded:]
+            recorded += len(sent)
+            for email in sent:
+                contact = email.contact
+                analytics_writer.record(contact[0], contact[4], "selected", contact_level=contact[5],
+                                        priority=priorities[contact[4]])
+                sampler.mark_contacted(contact[0])
+
+        dialog = QProgressDialog(f"Queueing {len(contacts)} emails via {backend.name}...", "Cancel", 0, len(contacts), self)
+        dialog.setWindowTitle("Batch Outreach")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        cancel_event = threading.Event()
+        dialog.canceled.connect(cancel_event.set)
+
+        def on_progress(report):
+            record_sent(report)
+            dialog.setValue(report.processed)
+            dialog.setLabelText(f"{report.processed} of {report.total} emails processed, {len(report.failed)} failed")
+
+        def on_result(report):
+            record_sent(report)
+            dialog.close()
+            QMessageBox.information(self, "Outreach", report.summary())
+
+        def on_error(error):
+            dialog.close()
+            QMessageBox.critical(self, "Outreach", f"Batch outreach failed: {error}")
+
+        dialog.show()
+        task_runner.submit(run_outreach, contacts, self.user_file, backend, cancel_event=cancel_event,
+                           priorities=priorities, name="batch outreach",
+                           on_progress=on_progress, on_result=on_result, on_error=on_error)
 
     def show_notification_popup(self, contact):
-        # Record that this contact has been selected.
-        record_contact_event(contact[0], contact[4], "selected")
+        # Record that this contact has been selected (written in the background).
+        priority = self.sampler.priorities.get(contact[4], DEFAULT_COUNTRY_PRIORITY)
+        analytics_writer.record(contact[0], contact[4], "selected", contact_level=contact[5], priority=priority)
+        self.sampler.mark_contacted(contact[0])
 
         popup = QDialog(self)
         popup.setWindowTitle("Contact Reminder")
@@ -731,9 +1383,8 @@ class MainWindow(QMainWindow):
         layout.addWidget(info_label)
 
         email_button = QPushButton("Email")
-        # When the user clicks the Email button, record that event and send email.
-        email_button.clicked.connect(lambda: [self.send_email(contact),
-                                                record_contact_event(contact[0], contact[4], "emailed")])
+        # When the user clicks the Email button, send the email and record that event.
+        email_button.clicked.connect(lambda: self.send_email(contact, priority))
         layout.addWidget(email_button)
 
         close_button = QPushButton("Close")
@@ -742,15 +1393,30 @@ class MainWindow(QMainWindow):
 
         popup.exec_()
 
-    def send_email(self, contact):
-        mail_to, subject, body = email_template(contact,self.user_file)
-        try:
-            outlook = Dispatch("outlook.application")
-            mail = outlook.CreateItem(0)
-            mail.To = mail_to #contact[3]  # Assuming email is at index 3
-            mail.Subject = subject #"Hello"
-            mail.Body = body #"This is a reminder to connect."
-            mail.Display()
-        except Exception as e:
-            QMessageBox.critical(self, "Email Error", f"Failed to send email: {e}")
+    def send_email(self, contact, priority=None):
+        """ Compose the email in Outlook on a worker thread, so a slow Outlook can't freeze the window. """
+        started = time.perf_counter()
+
+        def record(_):
+            latency_ms = (time.perf_counter() - started) * 1000
+            analytics_writer.record(contact[0], contact[4], "emailed", contact_level=contact[5],
+                                    priority=priority, latency_ms=latency_ms)
+            if self.sampler is not None:
+                self.sampler.mark_contacted(contact[0])
+
+        def on_error(error):
+            # Not recorded: like outreach.send_emails, only emails actually composed count,
+            # and a failure must not start the contact's cooldown.
+            QMessageBox.critical(self, "Email Error", f"Failed to send email: {error}")
+
+        task_runner.submit(compose_outlook_email, contact, self.user_file, on_result=record, on_error=on_error)
+
+
+@traced(category="mail")
+def compose_outlook_email(contact, user_file):
+    """ Open a new Outlook message for the contact (runs on a task runner thread). """
+    from outlook_session import get_outlook_session
+    mail_to, subject, body = email_template(contact, user_file)
+    # The COM call itself runs on the Outlook session's own thread.
+    get_outlook_session().create_mail(mail_to, subject, body, display=True)
 
@@ -0,0 +1,116 @@
+from PySide6.QtWidgets import QStackedWidget, QWidget
+
+from tracing import span
+
+# Page refresh-on-show policies (a page's REFRESH_ON_SHOW attribute)
+REFRESH_NEVER = "never"    # the page keeps itself up to date, or has no data
+REFRESH_STALE = "stale"    # refresh() when one of its DATA_TABLES changed since it was last loaded
+REFRESH_ALWAYS = "always"  # refresh() every time it is shown
+
+
+class LazyStackedWidget(QStackedWidget):
+    """
+    QStackedWidget acting as a page registry: each page is registered with a title and
+    a factory, and created the first time it is made current (or page() is called).
+    Until then its index holds an empty placeholder.
+
+    Pages may declare how they are refreshed when shown again:
+        REFRESH_ON_SHOW = REFRESH_STALE
+        DATA_TABLES = ("contacts",)
+        def refresh(self): ...
+    Staleness is detected by comparing the data version counters of DATA_TABLES
+    (from `version_source`, e.g. database.get_data_versions) with those recorded
+    when the page last loaded its data. With a task_runner the counters are read on a
+    worker thread (a stale page is refreshed when they arrive), as version_source may
+    be a round trip to the database service.
+    """
+
+    def __init__(self, version_source=None, parent=None, task_runner=None):
+        super().__init__(parent)
+        self.version_source = version_source
+        self.task_runner = task_runner
+        self.titles = []
+        self.factories = []
+        self.built = {}     # index -> page widget
+        self.versions = {}  # index -> data versions the page last loaded
+
+    def add_page(self, title, factory):
+        """
+        :param title: shown in the sidebar
+        :param factory: callable returning the page widget
+        :return: the page's index
+        """
+        self.titles.append(title)
+        self.factories.append(factory)
+        return self.addWidget(QWidget())
+
+    def page(self, index):
+        """ The page at `index`, creating it if needed. """
+        page = self.built.get(index)
+        if page is None:
+            with span(f"build {self.titles[index]} page", "ui"):
+                page = self.factories[index]()
+            self.built[index] = page
+            self._record_versions(index)
+            placeholder = self.widget(index)
+            current = self.currentIndex()
+            self.insertWidget(index, page)
+            self.removeWidget(placeholder)
+            placeholder.deleteLater()
+            if current == index:
+                super().setCurrentIndex(index)
+        return page
+
+    def setCurrentIndex(self, index):
+        if index in self.built:
+            self.refresh_if_needed(index)
+        else:
+            self.page(index)
+        super().setCurrentIndex(index)
+
+    # ---- Refresh on show ----
+
+    def refresh_if_needed(self, index):
+        page = self.built[index]
+        policy = getattr(page, "REFRESH_ON_SHOW", REFRESH_NEVER)
+        if policy == REFRESH_NEVER:
+            return
+        if policy == REFRESH_ALWAYS:
+            self._refresh(index)
+            return
+
+        def refresh_if_stale(versions):
+            # Left for the next show if the user moved on to another page meanwhile.
+            if self.currentIndex() == index and versions != self.versions.get(index):
+                self.versions[index] = versions
+                self._refresh(index)
+        self._with_data_versions(page, refresh_if_stale)
+
+    def mark_fresh(self, index):
+        """
+        Record that a built page already reflects the current data, e.g. after it was
+        updated incrementally, so the next show doesn't requery.
+        """
+        if index in self.built:
+            self._record_versions(index)
+
+    def _refresh(self, index):
+        with span(f"refresh {self.titles[index]} page", "ui"):
+            self.built[index].refresh()
+
+    def _record_versions(self, index):
+        self._with_data_versions(self.built[index], lambda versions: self.versions.__setitem__(index, versions))
+
+    def _with_data_versions(self, page, callback):
+        """ Call callback with the page's DATA_TABLES versions (None if it has none) on the GUI thread. """
+        tables = getattr(page, "DATA_TABLES", ())
+        if not tables or self.version_source is None:
+            callback(None)
+            return
+
+        def select(versions):
+            callback(tuple(versions.get(table, 0) for table in tables))
+        if self.task_runner is None:
+            select(self.version_source())
+        else:
+            self.task_runner.submit(self.version_source, name="data versions", on_result=select)
@@ -0,0 +1,166 @@
+"""
+Mail backends used by outreach.py. A backend takes rendered emails and delivers or
+queues them; each worker thread calls thread_init() once before its first send().
+"""
+import mailbox
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+
+class OutgoingEmail:
+    def __init__(self, contact, to, subject, body):
+        self.contact = contact  # (id, name, position, email, country, contact_level)
+        self.to = to
+        self.subject = subject
+        self.body = body
+
+    def as_message(self, sender=""):
+        message = EmailMessage()
+        if sender:
+            message["From"] = sender
+        message["To"] = self.to
+        message["Subject"] = self.subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid()
+        message.set_content(self.body)
+        return message
+
+
+class MailBackend:
+    """
+    Base class. Subclasses implement send().
+    max_concurrency limits the number of threads sending at once (1 for COM).
+    Errors in permanent_errors are not retried.
+    """
+    name = ""
+    max_concurrency = 4
+    permanent_errors = ()
+
+    def thread_init(self):
+        """ Called once on each worker thread before it sends. """
+
+    def send(self, email):
+        raise NotImplementedError
+
+    def close(self):
+        """ Called once after the batch. """
+
+
+class OutlookBackend(MailBackend):
+    """
+    Creates the emails in Outlook: saved to Drafts, or opened for review with display=True.
+    All COM calls go through the shared OutlookSession thread, so one sender is enough.
+    A session timeout is not retried: the session thread may still finish creating the
+    email, and a retry would leave a second copy in Drafts.
+    """
+    name = "Outlook"
+    max_concurrency = 1
+    permanent_errors = (FutureTimeoutError,)
+
+    def __init__(self, display=False, session=None):
+        self.display = display
+        self._session = session
+
+    def send(self, email):
+        if self._session is None:
+            from outlook_session import get_outlook_session
+            self._session = get_outlook_session()
+        self._session.create_mail(email.to, email.subject, email.body, display=self.display)
+
+
+class SmtpBackend(MailBackend):
+    """ Sends through an SMTP server, with one connection per worker thread. """
+    name = "SMTP"
+    permanent_errors = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPAuthenticationError)
+
+    def __init__(self, host, port=587, sender="", username=None, password=None, starttls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.sender = sender or (username or "")
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    @classmethod
+    def from_environment(cls):
+        """ Configured by ROLLODEX_SMTP_HOST/_PORT/_USER/_PASSWORD/_SENDER, or None if unset. """
+        host = os.environ.get("ROLLODEX_SMTP_HOST")
+        if not host:
+            return None
+        return cls(host, int(os.environ.get("ROLLODEX_SMTP_PORT", "587")),
+                   sender=os.environ.get("ROLLODEX_SMTP_SENDER", ""),
+                   username=os.environ.get("ROLLODEX_SMTP_USER"),
+                   password=os.environ.get("ROLLODEX_SMTP_PASSWORD"))
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password or "")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def send(self, email):
+        try:
+            self._connection().send_message(email.as_message(self.sender))
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._local.connection = None  # reconnect on retry
+            raise
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+class EmlDirectoryBackend(MailBackend):
+    """
+    Writes each email as an .eml file into a directory, or into a Maildir
+    (tmp/new/cur) with maildir=True. Useful for testing and for review before sending.
+    """
+    name = ".eml folder"
+
+    def __init__(self, directory, maildir=False, sender=""):
+        self.directory = directory
+        self.maildir = maildir
+        self.sender = sender
+        self._lock = threading.Lock()
+        self._count = 0
+        if maildir:
+            self._mailbox = mailbox.Maildir(directory, create=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def send(self, email):
+        message = email.as_message(self.sender)
+        if self.maildir:
+            with self._lock:
+                self._mailbox.add(message)
+            return
+        with self._lock:
+            self._count += 1
+            number = self._count
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{number:05d}.eml")
+        # Write then rename, so a reader never sees a partial file.
+        with open(path + ".tmp", "wb") as file:
+            file.write(bytes(message))
+        os.replace(path + ".tmp", path)
@@ -1,10 +1,17 @@
+import startup_profile
+startup_profile.start()  # times the imports below when ROLLODEX_STARTUP_REPORT=1
+
 import sys
 import os
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QIcon, QAction
-from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QWidget
-from database import setup_database
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
 from gui import MainWindow #ContactNotifierApp
+from analytics_writer import analytics_writer
+from task_runner import task_runner
+
+# Longest the Exit action waits for pending saves; unfinished ones are logged by task_runner.
+EXIT_WRITE_TIMEOUT = 5.0
 
 class SystemTrayIcon(QSystemTrayIcon):
     def __init__(self, icon, parent=None):
@@ -26,6 +33,15 @@ class SystemTrayIcon(QSystemTrayIcon):
 
         
     def exit(self):
+        # Hide the window and tray icon first so the app is gone as soon as Exit is clicked,
+        # then finish pending saves (other queued background work is dropped) and write any
+        # buffered analytics events before quitting.
+        self.hide()
+        if self.parent() is not None:
+            self.parent().hide()
+        QApplication.processEvents()
+        task_runner.shutdown(wait=False, write_timeout=EXIT_WRITE_TIMEOUT)
+        analytics_writer.close()
         QApplication.exit()                          
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev & PyInstaller """
@@ -39,13 +55,12 @@ def main():
     else:
         app = QApplication.instance()
     
+    startup_profile.mark("imports done")
     window = MainWindow() #ContactNotifierApp()
-    w = QWidget()
+    startup_profile.mark("main window built")
     icon_path = resource_path("phone_app.png")
     trayIcon = SystemTrayIcon(QIcon(icon_path), window)
     
-    window = MainWindow()  #ContactNotifierApp()
-    
     def on_window_close(event):
         event.ignore()
         window.hide()  # Minimize the window to tray
@@ -59,7 +74,13 @@ def main():
     window.show()
     trayIcon.show()
     trayIcon.activated.connect(on_tray_icon_click)
-    
+
+    def on_first_window_shown():
+        startup_profile.mark("first window shown")
+        startup_profile.finish()
+    # Runs once the event loop has processed the initial show/paint events.
+    QTimer.singleShot(0, on_first_window_shown)
+
     sys.exit(app.exec())
 
 if __name__ == '__main__':
@@ -0,0 +1,451 @@
+"""
+Versioned schema migrations for contacts.db.
+
+The schema version is stored in PRAGMA user_version. migrate() applies every migration
+newer than that version, each in its own transaction together with the version bump,
+then runs ANALYZE so the query planner has fresh statistics.
+To change the schema, append a function to MIGRATIONS; never edit one that has shipped.
+
+Data derived by code that may change, such as the duplicate detection keys, is not
+written by the migrations but rebuilt afterwards when it is out of date
+(refresh_contact_keys).
+"""
+import logging
+import sqlite3
+
+from db_connection import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column_if_missing(conn, table, column, declaration):
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+# =============================================================================
+# Migrations
+# 1-4 describe the schema as it was before versioning, and are no-ops on
+# databases that already have those tables, columns and indexes.
+# =============================================================================
+def _v1_initial_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS contacts (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT,
+                        position TEXT,
+                        email TEXT,
+                        country TEXT,
+                        priority TEXT)''')
+    # Settings table (a single row)
+    conn.execute('''CREATE TABLE IF NOT EXISTS settings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        frequency TEXT,
+                        time TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS country_priority (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        country TEXT UNIQUE,
+                        priority INTEGER)''')
+    # Analytics table: records events when a contact is selected or emailed.
+    conn.execute('''CREATE TABLE IF NOT EXISTS analytics (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        contact_id INTEGER,
+                        event_type TEXT,   -- "selected" or "emailed"
+                        country TEXT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )''')
+
+
+def _v2_settings_and_event_details(conn):
+    _add_column_if_missing(conn, "settings", "template_path", "TEXT")
+    # Event details recorded by analytics_writer
+    _add_column_if_missing(conn, "analytics", "contact_level", "TEXT")
+    _add_column_if_missing(conn, "analytics", "priority", "INTEGER")
+    _add_column_if_missing(conn, "analytics", "latency_ms", "REAL")
+
+
+def _v3_contact_search(conn):
+    """
+    Indexes for search_contacts(), and the contacts_fts trigram index (substring search on name/position/email)
+    and the triggers that keep it in sync with the contacts table.
+    Does nothing if this SQLite build lacks FTS5 or the trigram tokenizer (3.34+);
+    search_contacts() then falls back to scanning.
+    """
+    # Indexes used by search_contacts() to resolve country/level filters.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contacts_country ON contacts(country)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contacts_priority ON contacts(priority)")
+    # Used for duplicate detection by email (bulk import)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contacts_email_lower ON contacts(lower(email))")
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'").fetchone()
+    if exists:
+        return
+    try:
+        conn.execute('''CREATE VIRTUAL TABLE contacts_fts USING fts5(
+                            name, position, email,
+                            content='contacts', content_rowid='id',
+                            tokenize='trigram')''')
+    except sqlite3.OperationalError:
+        return
+    _create_contact_fts_triggers(conn)
+    conn.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+
+
+def _create_contact_fts_triggers(conn):
+    conn.execute('''CREATE TRIGGER contacts_fts_insert AFTER INSERT ON contacts BEGIN
+                        INSERT INTO contacts_fts(rowid, name, position, email)
+                        VALUES (new.id, new.name, new.position, new.email);
+                    END''')
+    conn.execute('''CREATE TRIGGER contacts_fts_delete AFTER DELETE ON contacts BEGIN
+                        INSERT INTO contacts_fts(contacts_fts, rowid, name, position, email)
+                        VALUES ('delete', old.id, old.name, old.position, old.email);
+                    END''')
+    conn.execute('''CREATE TRIGGER contacts_fts_update AFTER UPDATE ON contacts BEGIN
+                        INSERT INTO contacts_fts(contacts_fts, rowid, name, position, email)
+                        VALUES ('delete', old.id, old.name, old.position, old.email);
+                        INSERT INTO contacts_fts(rowid, name, position, email)
+                        VALUES (new.id, new.name, new.position, new.email);
+                    END''')
+
+
+def _v4_analytics_rollups(conn):
+    """
+    Indexes on analytics, plus the rollup tables (per country, per contact, per day and country) and the
+    triggers that keep them up to date as analytics rows are inserted or deleted.
+    Existing events are aggregated once when the tables are first created.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_country_type_time ON analytics(country, event_type, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_contact ON analytics(contact_id)")
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analytics_country_rollup'").fetchone()
+    if exists:
+        return
+    conn.execute('''CREATE TABLE analytics_country_rollup (
+                        country TEXT PRIMARY KEY,
+                        selected_count INTEGER NOT NULL DEFAULT 0,
+                        emailed_count INTEGER NOT NULL DEFAULT 0)''')
+    conn.execute('''CREATE TABLE analytics_contact_rollup (
+                        contact_id INTEGER PRIMARY KEY,
+                        selected_count INTEGER NOT NULL DEFAULT 0,
+                        emailed_count INTEGER NOT NULL DEFAULT 0,
+                        last_selected DATETIME,
+                        last_emailed DATETIME)''')
+    conn.execute('''CREATE TABLE analytics_daily_rollup (
+                        day TEXT NOT NULL,        -- YYYY-MM-DD (UTC, like analytics.timestamp)
+                        country TEXT NOT NULL,
+                        selected_count INTEGER NOT NULL DEFAULT 0,
+                        emailed_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, country)) WITHOUT ROWID''')
+
+    # Countries are stored as '' instead of NULL so the primary keys can be upserted.
+    conn.execute('''CREATE TRIGGER analytics_rollup_insert AFTER INSERT ON analytics BEGIN
+                        INSERT INTO analytics_country_rollup (country, selected_count, emailed_count)
+                        VALUES (COALESCE(new.country, ''), new.event_type = 'selected', new.event_type = 'emailed')
+                        ON CONFLICT(country) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count;
+                        INSERT INTO analytics_contact_rollup (contact_id, selected_count, emailed_count, last_selected, last_emailed)
+                        VALUES (new.contact_id, new.event_type = 'selected', new.event_type = 'emailed',
+                                CASE WHEN new.event_type = 'selected' THEN new.timestamp END,
+                                CASE WHEN new.event_type = 'emailed' THEN new.timestamp END)
+                        ON CONFLICT(contact_id) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count,
+                            last_selected = MAX(COALESCE(last_selected, ''), COALESCE(excluded.last_selected, '')),
+                            last_emailed = MAX(COALESCE(last_emailed, ''), COALESCE(excluded.last_emailed, ''));
+                        INSERT INTO analytics_daily_rollup (day, country, selected_count, emailed_count)
+                        VALUES (date(new.timestamp), COALESCE(new.country, ''),
+                                new.event_type = 'selected', new.event_type = 'emailed')
+                        ON CONFLICT(day, country) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count;
+                    END''')
+    conn.execute('''CREATE TRIGGER analytics_rollup_delete AFTER DELETE ON analytics BEGIN
+                        UPDATE analytics_country_rollup SET
+                            selected_count = selected_count - (old.event_type = 'selected'),
+                            emailed_count = emailed_count - (old.event_type = 'emailed')
+                        WHERE country = COALESCE(old.country, '');
+                        UPDATE analytics_contact_rollup SET
+                            selected_count = selected_count - (old.event_type = 'selected'),
+                            emailed_count = emailed_count - (old.event_type = 'emailed')
+                        WHERE contact_id = old.contact_id;
+                        UPDATE analytics_daily_rollup SET
+                            selected_count = selected_count - (old.event_type = 'selected'),
+                            emailed_count = emailed_count - (old.event_type = 'emailed')
+                        WHERE day = date(old.timestamp) AND country = COALESCE(old.country, '');
+                    END''')
+
+    # Backfill from the events recorded so far.
+    conn.execute('''INSERT INTO analytics_country_rollup (country, selected_count, emailed_count)
+                    SELECT COALESCE(country, ''), SUM(event_type = 'selected'), SUM(event_type = 'emailed')
+                    FROM analytics GROUP BY COALESCE(country, '')''')
+    _backfill_contact_rollup(conn)
+    conn.execute('''INSERT INTO analytics_daily_rollup (day, country, selected_count, emailed_count)
+                    SELECT date(timestamp), COALESCE(country, ''), SUM(event_type = 'selected'), SUM(event_type = 'emailed')
+                    FROM analytics GROUP BY date(timestamp), COALESCE(country, '')''')
+
+
+def _backfill_contact_rollup(conn):
+    conn.execute('''INSERT INTO analytics_contact_rollup (contact_id, selected_count, emailed_count, last_selected, last_emailed)
+                    SELECT contact_id, SUM(event_type = 'selected'), SUM(event_type = 'emailed'),
+                           MAX(CASE WHEN event_type = 'selected' THEN timestamp END),
+                           MAX(CASE WHEN event_type = 'emailed' THEN timestamp END)
+                    FROM analytics WHERE contact_id IS NOT NULL GROUP BY contact_id''')
+
+
+def _v5_typed_contacts(conn):
+    """
+    Rebuilds the contacts table with NOT NULL columns, the contact level as an integer
+    referencing contact_levels, and a unique, case-insensitive email. Contacts sharing
+    an email are merged into the oldest one, which takes over their analytics history
+    and, like database.merge_contacts, fills its empty fields from them (lowest id first).
+    contacts_view presents rows in the old (id, name, position, email, country, level name) shape.
+    """
+    conn.execute("CREATE TABLE contact_levels (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.executemany("INSERT INTO contact_levels (id, name) VALUES (?, ?)",
+                     [(1, "First Contact"), (2, "Second Contact"), (3, "Third Contact")])
+    # Levels other than the standard three are kept as extra entries.
+    conn.execute("INSERT OR IGNORE INTO contact_levels (name) "
+                 "SELECT DISTINCT priority FROM contacts WHERE COALESCE(priority, '') <> ''")
+
+    conn.execute('''CREATE TEMP TABLE contact_merge AS
+                    SELECT c.id AS old_id, k.keep_id
+                    FROM contacts c
+                    JOIN (SELECT lower(trim(email)) AS email, MIN(id) AS keep_id FROM contacts
+                          WHERE COALESCE(trim(email), '') <> ''
+                          GROUP BY lower(trim(email)) HAVING COUNT(*) > 1) k
+                      ON lower(trim(c.email)) = k.email
+                    WHERE c.id <> k.keep_id''')
+    for field in ("name", "position", "country"):
+        conn.execute(f'''UPDATE contacts SET {field} = (
+                             SELECT c.{field} FROM contact_merge m JOIN contacts c ON c.id = m.old_id
+                             WHERE m.keep_id = contacts.id AND COALESCE(c.{field}, '') <> '' ORDER BY c.id LIMIT 1)
+                         WHERE COALESCE({field}, '') = '' AND id IN (SELECT keep_id FROM contact_merge)''')
+    for keep_id, old_ids in conn.execute("SELECT keep_id, group_concat(old_id, ', ') FROM contact_merge "
+                                         "GROUP BY keep_id ORDER BY keep_id").fetchall():
+        logger.warning("Contacts %s share an email with contact %s and were merged into it", old_ids, keep_id)
+    conn.execute('''UPDATE analytics
+                    SET contact_id = (SELECT keep_id FROM contact_merge WHERE old_id = analytics.contact_id)
+                    WHERE contact_id IN (SELECT old_id FROM contact_merge)''')
+
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'contacts'").fetchone()
+    conn.execute('''CREATE TABLE contacts_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        position TEXT NOT NULL DEFAULT '',
+                        email TEXT COLLATE NOCASE,
+                        country TEXT NOT NULL DEFAULT '',
+                        level INTEGER NOT NULL DEFAULT 1 REFERENCES contact_levels(id))''')
+    conn.execute('''INSERT INTO contacts_new (id, name, position, email, country, level)
+                    SELECT c.id, COALESCE(c.name, ''), COALESCE(c.position, ''), NULLIF(trim(c.email), ''),
+                           COALESCE(c.country, ''),
+                           COALESCE((SELECT l.id FROM contact_levels l WHERE l.name = c.priority), 1)
+                    FROM contacts c
+                    WHERE c.id NOT IN (SELECT old_id FROM contact_merge)''')
+    conn.execute("DROP TABLE contact_merge")
+    conn.execute("DROP TABLE contacts")  # also drops its indexes and triggers
+    conn.execute("ALTER TABLE contacts_new RENAME TO contacts")
+    if sequence:
+        # Don't hand out ids of deleted or merged contacts again; analytics may refer to them.
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'contacts'", sequence)
+
+    conn.execute("CREATE INDEX idx_contacts_country ON contacts(country)")
+    conn.execute("CREATE INDEX idx_contacts_level ON contacts(level)")
+    conn.execute("CREATE UNIQUE INDEX idx_contacts_email ON contacts(email) WHERE email IS NOT NULL")
+    conn.execute('''CREATE VIEW contacts_view AS
+                    SELECT c.id, c.name, c.position, c.email, c.country, l.name AS priority
+                    FROM contacts c JOIN contact_levels l ON l.id = c.level''')
+
+    if _table_exists(conn, "contacts_fts"):
+        _create_contact_fts_triggers(conn)
+        conn.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+    if _table_exists(conn, "analytics_contact_rollup"):
+        conn.execute("DELETE FROM analytics_contact_rollup")
+        _backfill_contact_rollup(conn)
+
+
+def _v6_data_versions(conn):
+    """
+    A change counter per table, bumped by triggers on every write. The GUI compares
+    these to decide whether a page's data is stale (see database.get_data_versions).
+    """
+    conn.execute('''CREATE TABLE data_versions (
+                        name TEXT PRIMARY KEY,
+                        version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID''')
+    for table in VERSIONED_TABLES:
+        conn.execute("INSERT INTO data_versions (name) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f'''CREATE TRIGGER {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                                UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                            END''')
+
+
+# Tables whose changes are counted in data_versions.
+VERSIONED_TABLES = ("contacts", "country_priority", "analytics")
+
+# Days after a contact was selected or emailed before notifications may pick them again.
+DEFAULT_COOLDOWN_DAYS = 14
+
+
+def _v7_last_contacted(conn):
+    """
+    analytics_contact_rollup.last_contacted, the time of a contact's latest event of
+    any type, kept current by a trigger and indexed so the contacts inside the
+    notification cooldown are found without scanning analytics
+    (see database.get_recently_contacted). Also adds settings.cooldown_days.
+    """
+    _add_column_if_missing(conn, "analytics_contact_rollup", "last_contacted", "DATETIME")
+    conn.execute('''UPDATE analytics_contact_rollup SET last_contacted =
+                        NULLIF(MAX(COALESCE(last_selected, ''), COALESCE(last_emailed, '')), '')''')
+    # A separate trigger, upserting on its own, so it does not depend on firing after analytics_rollup_insert.
+    conn.execute('''CREATE TRIGGER analytics_last_contacted AFTER INSERT ON analytics
+                    WHEN new.contact_id IS NOT NULL BEGIN
+                        INSERT INTO analytics_contact_rollup (contact_id, last_contacted)
+                        VALUES (new.contact_id, new.timestamp)
+                        ON CONFLICT(contact_id) DO UPDATE SET
+                            last_contacted = MAX(COALESCE(last_contacted, ''), excluded.last_contacted);
+                    END''')
+    conn.execute("CREATE INDEX idx_contact_rollup_last_contacted ON analytics_contact_rollup (last_contacted)")
+    _add_column_if_missing(conn, "settings", "cooldown_days", f"INTEGER NOT NULL DEFAULT {DEFAULT_COOLDOWN_DAYS}")
+
+
+def _v8_contact_keys(conn):
+    """
+    contact_keys, the duplicate detection blocking keys of every contact (see dedupe.py),
+    so the candidates for a duplicate are found by key lookups instead of comparing every
+    pair. database.py writes the keys with the contact; a trigger removes them with it.
+    contact_keys_version holds the dedupe.KEYS_VERSION the stored keys were written with
+    (a single row); the keys of existing contacts are written by refresh_contact_keys.
+    """
+    conn.execute('''CREATE TABLE contact_keys (
+                        key TEXT NOT NULL,
+                        contact_id INTEGER NOT NULL,
+                        PRIMARY KEY (key, contact_id)) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX idx_contact_keys_contact ON contact_keys (contact_id)")
+    conn.execute('''CREATE TRIGGER contacts_keys_delete AFTER DELETE ON contacts BEGIN
+                        DELETE FROM contact_keys WHERE contact_id = old.id;
+                    END''')
+    conn.execute("CREATE TABLE contact_keys_version (version INTEGER NOT NULL)")
+    conn.execute("INSERT INTO contact_keys_version (version) VALUES (0)")
+
+
+def _v9_analytics_timestamp_index(conn):
+    """
+    An index on analytics(timestamp), so reads of the raw events in a time range that
+    don't filter on country use an index too (idx_analytics_country_type_time only
+    serves those that do; the summaries read the rollup tables).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON analytics (timestamp)")
+
+
+def _v10_contact_rollup_null_ids(conn):
+    """
+    Replaces analytics_rollup_insert so events without a contact_id no longer add a
+    row to analytics_contact_rollup (its contact_id is the rowid, so NULL made up a new
+    id), and contacts never selected or emailed keep NULL rather than '' in last_selected
+    and last_emailed. The contact rollup is recounted from the events to drop such rows.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS analytics_rollup_insert")
+    conn.execute('''CREATE TRIGGER analytics_rollup_insert AFTER INSERT ON analytics BEGIN
+                        INSERT INTO analytics_country_rollup (country, selected_count, emailed_count)
+                        VALUES (COALESCE(new.country, ''), new.event_type = 'selected', new.event_type = 'emailed')
+                        ON CONFLICT(country) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count;
+                        INSERT INTO analytics_daily_rollup (day, country, selected_count, emailed_count)
+                        VALUES (date(new.timestamp), COALESCE(new.country, ''),
+                                new.event_type = 'selected', new.event_type = 'emailed')
+                        ON CONFLICT(day, country) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count;
+                    END''')
+    # MAX() with a NULL argument is NULL, hence the COALESCEs.
+    conn.execute('''CREATE TRIGGER analytics_contact_rollup_insert AFTER INSERT ON analytics
+                    WHEN new.contact_id IS NOT NULL BEGIN
+                        INSERT INTO analytics_contact_rollup (contact_id, selected_count, emailed_count, last_selected, last_emailed)
+                        VALUES (new.contact_id, new.event_type = 'selected', new.event_type = 'emailed',
+                                CASE WHEN new.event_type = 'selected' THEN new.timestamp END,
+                                CASE WHEN new.event_type = 'emailed' THEN new.timestamp END)
+                        ON CONFLICT(contact_id) DO UPDATE SET
+                            selected_count = selected_count + excluded.selected_count,
+                            emailed_count = emailed_count + excluded.emailed_count,
+                            last_selected = COALESCE(MAX(last_selected, excluded.last_selected),
+                                                     last_selected, excluded.last_selected),
+                            last_emailed = COALESCE(MAX(last_emailed, excluded.last_emailed),
+                                                    last_emailed, excluded.last_emailed);
+                    END''')
+    conn.execute("DELETE FROM analytics_contact_rollup")
+    _backfill_contact_rollup(conn)
+    conn.execute('''UPDATE analytics_contact_rollup SET last_contacted =
+                        (SELECT MAX(timestamp) FROM analytics WHERE analytics.contact_id = analytics_contact_rollup.contact_id)''')
+
+
+MIGRATIONS = [
+    _v1_initial_schema,
+    _v2_settings_and_event_details,
+    _v3_contact_search,
+    _v4_analytics_rollups,
+    _v5_typed_contacts,
+    _v6_data_versions,
+    _v7_last_contacted,
+    _v8_contact_keys,
+    _v9_analytics_timestamp_index,
+    _v10_contact_rollup_null_ids,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Bring the database up to SCHEMA_VERSION.
+    :return: list of the versions applied
+    """
+    applied = []
+    while get_schema_version(conn) < SCHEMA_VERSION:
+        # IMMEDIATE takes the write lock up front, so two processes starting together
+        # can't both apply a migration; the version is re-read once the lock is held.
+        with transaction(immediate=True):
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                break
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        applied.append(version + 1)
+    refresh_contact_keys(conn)
+    if applied:
+        conn.execute("ANALYZE")
+    return applied
+
+
+def refresh_contact_keys(conn):
+    """
+    Rewrite every contact's duplicate detection keys if they were written by another
+    version of dedupe.blocking_keys (dedupe.KEYS_VERSION); otherwise only reads one row.
+    :return: True if the keys were rebuilt
+    """
+    from dedupe import KEYS_VERSION, blocking_keys  # dedupe imports database, which imports this module
+    if conn.execute("SELECT version FROM contact_keys_version").fetchone()[0] == KEYS_VERSION:
+        return False
+    with transaction(immediate=True):
+        if conn.execute("SELECT version FROM contact_keys_version").fetchone()[0] == KEYS_VERSION:
+            return False
+        conn.execute("DELETE FROM contact_keys")
+        conn.executemany("INSERT INTO contact_keys (key, contact_id) VALUES (?, ?)",
+                         ((key, contact_id)
+                          for contact_id, name, email in conn.execute("SELECT id, name, email FROM contacts").fetchall()
+                          for key in blocking_keys(name, email)))
+        conn.execute("UPDATE contact_keys_version SET version = ?", (KEYS_VERSION,))
+    logger.info("Rebuilt the duplicate detection keys (version %s)", KEYS_VERSION)
+    return True
@@ -0,0 +1,125 @@
+"""
+Reminder delivery for the headless entry point (rollodex.py). A notifier receives the
+picked contact and shows or stores the reminder; the GUI uses its own popup instead.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+REMINDER_TITLE = "Contact to Reach Out"
+
+
+def format_reminder(contact):
+    """ The reminder text for a (id, name, position, email, country, contact_level) tuple. """
+    return (f"Name: {contact[1]}\n"
+            f"Position: {contact[2]}\n"
+            f"Email: {contact[3] or ''}\n"
+            f"Country: {contact[4]}\n"
+            f"Contact Level: {contact[5]}")
+
+
+class Notifier:
+    """ Base class. Subclasses implement notify(). """
+    name = ""
+
+    def notify(self, contact):
+        raise NotImplementedError
+
+    def close(self):
+        """ Called once when the daemon stops. """
+
+
+class StdoutNotifier(Notifier):
+    """ Prints the reminder, e.g. for cron mail or a terminal. """
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def notify(self, contact):
+        stream = self.stream or sys.stdout
+        print(f"{REMINDER_TITLE}\n{format_reminder(contact)}\n", file=stream, flush=True)
+
+
+class DesktopNotifier(Notifier):
+    """
+    Shows a desktop notification with the platform's own tool (notify-send on Linux,
+    osascript on macOS, a PowerShell balloon tip on Windows), without loading Qt.
+    """
+    name = "desktop"
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+
+    def _command(self, title, text):
+        if sys.platform == "darwin":
+            script = f"display notification {json.dumps(text)} with title {json.dumps(title)}"
+            return ["osascript", "-e", script]
+        if sys.platform == "win32":
+            script = ("Add-Type -AssemblyName System.Windows.Forms;"
+                      "$n = New-Object System.Windows.Forms.NotifyIcon;"
+                      "$n.Icon = [System.Drawing.SystemIcons]::Information;"
+                      "$n.Visible = $true;"
+                      f"$n.ShowBalloonTip(10000, {_powershell_string(title)}, {_powershell_string(text)}, 'Info');"
+                      "Start-Sleep -Seconds 10; $n.Dispose()")
+            return ["powershell", "-NoProfile", "-NonInteractive", "-Command", script]
+        if shutil.which("notify-send"):
+            return ["notify-send", "--app-name=Rollodex", title, text]
+        return None
+
+    def notify(self, contact):
+        command = self._command(REMINDER_TITLE, format_reminder(contact))
+        if command is None:
+            raise RuntimeError("No desktop notification tool found (install notify-send).")
+        if sys.platform == "win32":
+            # The balloon stays up while PowerShell sleeps; don't wait for it.
+            subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            subprocess.run(command, check=True, timeout=self.timeout, capture_output=True)
+
+
+def _powershell_string(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+class FileDropNotifier(Notifier):
+    """
+    Writes each reminder as a JSON file into a directory, for another program
+    (a mail rule, a sync folder, a status bar script) to pick up.
+    """
+    name = "file"
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def notify(self, contact):
+        record = {"title": REMINDER_TITLE, "text": format_reminder(contact),
+                  "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "contact": dict(zip(("id", "name", "position", "email", "country", "contact_level"), contact))}
+        path = os.path.join(self.directory, f"reminder-{time.strftime('%Y%m%d-%H%M%S')}-{contact[0]}.json")
+        # Write then rename, so a reader never sees a partial file.
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(record, file, indent=2)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+NOTIFIERS = {notifier.name: notifier for notifier in (StdoutNotifier, DesktopNotifier, FileDropNotifier)}
+
+
+def create_notifier(name, directory=None):
+    """
+    :param name: a key of NOTIFIERS
+    :param directory: where FileDropNotifier writes its files
+    """
+    if name not in NOTIFIERS:
+        raise ValueError(f"Unknown notifier '{name}' (choose from {', '.join(NOTIFIERS)})")
+    if name == "file":
+        if not directory:
+            raise ValueError("The file notifier needs a directory.")
+        return FileDropNotifier(directory)
+    return NOTIFIERS[name]()
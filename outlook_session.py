@@ -0,0 +1,345 @@
+"""
+A single long-lived Outlook COM session, owned by a dedicated single-threaded
+apartment (STA) thread. Other threads send it commands through a queue:
+
+    session = get_outlook_session()
+    name = session.get_user_name()
+    session.call(lambda outlook, namespace: namespace.GetDefaultFolder(6).Items.Count)
+
+The Outlook.Application and MAPI namespace are created once and reused. Before a
+command runs, the connection is health-checked if it has been idle for
+HEALTH_CHECK_INTERVAL seconds. If a command fails and the check then fails too,
+the session reconnects and runs the command once more.
+
+Setting ROLLODEX_OUTLOOK=fake uses FakeOutlookBackend, an in-process stand-in with
+the same interface, so the session can be tested and benchmarked without Outlook.
+"""
+import atexit
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from tracing import span, traced
+
+OL_FOLDER_CALENDAR = 9
+OL_MAIL_ITEM = 0
+
+# Seconds a connection may sit idle before it is checked again before use.
+HEALTH_CHECK_INTERVAL = 60.0
+
+# Default time to wait for a command to finish.
+DEFAULT_TIMEOUT = 60.0
+
+
+# =============================================================================
+# Backends: how the session thread connects to Outlook
+# =============================================================================
+class ComOutlookBackend:
+    """ The real Outlook, through pywin32 (Windows only). """
+
+    def thread_init(self):
+        import pythoncom
+        pythoncom.CoInitialize()
+
+    def thread_exit(self):
+        import pythoncom
+        pythoncom.CoUninitialize()
+
+    def connect(self):
+        """ :return: (application, MAPI namespace) """
+        import win32com.client
+        outlook = win32com.client.Dispatch("Outlook.Application")
+        return outlook, outlook.GetNamespace("MAPI")
+
+
+class _FakeItems(list):
+    _FILTER_DATE = re.compile(r"\[(Start|End)\] (>=|<=) '([^']+)'")
+
+    def Sort(self, key):
+        self.sort(key=lambda item: getattr(item, key.strip("[]")))
+
+    def Restrict(self, condition):
+        items = _FakeItems(self)
+        for field, operator, value in self._FILTER_DATE.findall(condition):
+            bound = datetime.strptime(value, "%m/%d/%Y %I:%M %p")
+            if operator == ">=":
+                items = _FakeItems(item for item in items if getattr(item, field) >= bound)
+            else:
+                items = _FakeItems(item for item in items if getattr(item, field) <= bound)
+        return items
+
+
+class FakeAppointment:
+    def __init__(self, start, end, subject=""):
+        self.Start = start  # naive local wall-clock datetimes, like Outlook
+        self.End = end
+        self.Subject = subject
+
+
+class _FakeMailItem:
+    def __init__(self, application):
+        self._application = application
+        self.To = ""
+        self.Subject = ""
+        self.Body = ""
+
+    def Display(self):
+        self._application.displayed.append(self)
+
+    def Save(self):
+        self._application.drafts.append(self)
+
+
+class _FakeNamespace:
+    def __init__(self, application):
+        self._application = application
+
+    @property
+    def CurrentUser(self):
+        self._application.check()
+        return type("Recipient", (), {"Name": self._application.user_name})()
+
+    def GetDefaultFolder(self, folder):
+        self._application.check()
+        return type("Folder", (), {"Items": _FakeItems(self._application.appointments)})()
+
+
+class FakeOutlookApplication:
+    """ Records created mail in `drafts`/`displayed`; `appointments` are FakeAppointments. """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.user_name = backend.user_name
+        self.appointments = backend.appointments
+        self.drafts = backend.drafts
+        self.displayed = backend.displayed
+        self.alive = True
+
+    def check(self):
+        if self._backend.latency:
+            time.sleep(self._backend.latency)
+        if not self.alive:
+            raise ConnectionError("The RPC server is unavailable (fake)")
+
+    def GetNamespace(self, name):
+        return _FakeNamespace(self)
+
+    def CreateItem(self, item_type):
+        self.check()
+        return _FakeMailItem(self)
+
+
+class FakeOutlookBackend:
+    """
+    In-process stand-in for Outlook.
+    :param latency: seconds added to every call, to imitate COM round trips
+    Call disconnect() to make the current connection fail, as if Outlook was restarted.
+    """
+
+    def __init__(self, user_name="Doe, John", appointments=(), latency=0.0):
+        self.user_name = user_name
+        self.appointments = list(appointments)
+        self.latency = latency
+        self.drafts = []
+        self.displayed = []
+        self.connections = 0
+        self.application = None
+
+    def thread_init(self):
+        pass
+
+    def thread_exit(self):
+        pass
+
+    def connect(self):
+        self.connections += 1
+        self.application = FakeOutlookApplication(self)
+        return self.application, self.application.GetNamespace("MAPI")
+
+    def disconnect(self):
+        if self.application is not None:
+            self.application.alive = False
+
+
+# =============================================================================
+# Session
+# =============================================================================
+class OutlookSession:
+    def __init__(self, backend=None, health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.backend = backend or ComOutlookBackend()
+        self.health_check_interval = health_check_interval
+        self.reconnects = 0
+        self._commands = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Only touched on the session thread:
+        self._outlook = None
+        self._namespace = None
+        self._last_used = 0.0
+
+    # ---- Command interface (any thread) ----
+
+    def submit(self, command):
+        """
+        Queue command(outlook, namespace) to run on the session thread.
+        COM objects must not leave that thread: return plain values.
+        :return: concurrent.futures.Future with the command's result
+        """
+        future = Future()
+        self._ensure_started()
+        self._commands.put((command, future))
+        return future
+
+    def call(self, command, timeout=DEFAULT_TIMEOUT):
+        """ submit() and wait for the result. """
+        return self.submit(command).result(timeout)
+
+    def close(self, timeout=5):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._commands.put(None)
+            thread.join(timeout)
+
+    # ---- Commands ----
+
+    # The command methods are traced as "outlook" spans, which include waiting for the
+    # session thread; the COM work itself is traced there as "com" spans (_execute).
+
+    @traced(category="outlook")
+    def get_user_name(self):
+        return self.call(lambda outlook, namespace: namespace.CurrentUser.Name)
+
+    @traced(category="outlook")
+    def get_appointments(self, start, end):
+        """
+        :param start: datetime (local wall-clock time)
+        :param end: datetime (local wall-clock time)
+        :return: list of (start, end) naive local datetimes of appointments in [start, end]
+        """
+        def command(outlook, namespace):
+            items = namespace.GetDefaultFolder(OL_FOLDER_CALENDAR).Items
+            items.Sort("[Start]")
+            items = items.Restrict(f"[Start] >= '{start.strftime('%m/%d/%Y %I:%M %p')}' "
+                                   f"AND [End] <= '{end.strftime('%m/%d/%Y %I:%M %p')}'")
+            return [(_naive(item.Start), _naive(item.End)) for item in items]
+        return self.call(command)
+
+    @traced(category="outlook")
+    def create_mail(self, to, subject, body, display=True):
+        """ Create an email; open it for the user (display=True) or save it to Drafts. """
+        def command(outlook, namespace):
+            mail = outlook.CreateItem(OL_MAIL_ITEM)
+            mail.To = to
+            mail.Subject = subject
+            mail.Body = body
+            if display:
+                mail.Display()
+            else:
+                mail.Save()
+        return self.call(command)
+
+    # ---- Session thread ----
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="OutlookSession", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            self.backend.thread_init()
+        except Exception as e:
+            self._fail_all(e)
+            return
+        try:
+            while True:
+                item = self._commands.get()
+                if item is None:
+                    return
+                command, future = item
+                if future.set_running_or_notify_cancel():
+                    self._execute(command, future)
+        finally:
+            self._outlook = self._namespace = None
+            try:
+                self.backend.thread_exit()
+            except Exception:
+                pass
+
+    def _fail_all(self, error):
+        """ thread_init failed: fail queued commands, and let the next submit() start over. """
+        with self._lock:
+            self._thread = None
+        while True:
+            try:
+                item = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    def _execute(self, command, future):
+        # e.g. "OutlookSession.create_mail" for the command defined in create_mail()
+        name = getattr(command, "__qualname__", "command").split(".<locals>")[0]
+        try:
+            with span(name, "com"):
+                self._ensure_connected()
+                try:
+                    result = command(self._outlook, self._namespace)
+                except Exception:
+                    if self._healthy():
+                        raise
+                    # Outlook went away underneath us: reconnect and try once more.
+                    self._reconnect()
+                    result = command(self._outlook, self._namespace)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            self._last_used = time.monotonic()
+            future.set_result(result)
+
+    def _ensure_connected(self):
+        if self._outlook is None:
+            with span("Outlook connect", "com"):
+                self._outlook, self._namespace = self.backend.connect()
+        elif time.monotonic() - self._last_used > self.health_check_interval and not self._healthy():
+            self._reconnect()
+
+    def _healthy(self):
+        try:
+            self._namespace.CurrentUser.Name
+        except Exception:
+            return False
+        self._last_used = time.monotonic()
+        return True
+
+    def _reconnect(self):
+        self._outlook = self._namespace = None
+        with span("Outlook reconnect", "com"):
+            self._outlook, self._namespace = self.backend.connect()
+        self.reconnects += 1
+
+
+def _naive(moment):
+    """ pywin32 returns timezone-aware pywintypes datetimes; Outlook means local wall-clock time. """
+    return datetime(moment.year, moment.month, moment.day, moment.hour, moment.minute, moment.second)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_outlook_session():
+    """ Shared OutlookSession (FakeOutlookBackend if ROLLODEX_OUTLOOK=fake). """
+    global _session
+    with _session_lock:
+        if _session is None:
+            backend = FakeOutlookBackend() if os.environ.get("ROLLODEX_OUTLOOK") == "fake" else None
+            _session = OutlookSession(backend)
+            atexit.register(_session.close)
+        return _session
@@ -0,0 +1,138 @@
+"""
+Batch outreach: pick several contacts, render all their emails in one pass and hand
+them to a mail backend (see mail_backends.py) from a bounded pool of worker threads,
+retrying failed sends.
+"""
+import queue
+import threading
+import time
+
+from analytics_writer import analytics_writer
+from email_utils import render_emails
+from mail_backends import OutgoingEmail
+from tracing import span
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 2
+RETRY_DELAY = 1.0  # seconds before the first retry; doubled for each further attempt
+
+
+class OutreachReport:
+    def __init__(self, total):
+        self.total = total
+        self.sent = []    # OutgoingEmail
+        self.failed = []  # (OutgoingEmail, error message)
+        self.cancelled = False
+
+    @property
+    def processed(self):
+        return len(self.sent) + len(self.failed)
+
+    def summary(self):
+        text = f"Queued {len(self.sent)} of {self.total} emails."
+        if self.failed:
+            text += f" {len(self.failed)} failed:\n" + "\n".join(
+                f"{email.to}: {error}" for email, error in self.failed[:10])
+        if self.cancelled:
+            text += " Cancelled."
+        return text
+
+
+def pick_contacts(sampler, count):
+    """ `count` distinct contacts, weighted like the single notification (ContactSampler). """
+    return sampler.pick_many(count)
+
+
+def build_emails(contacts, user_file):
+    """ Render the emails for all contacts (calendar and templates are read once). """
+    return [OutgoingEmail(contact, to, subject, body)
+            for contact, (to, subject, body) in zip(contacts, render_emails(contacts, user_file))]
+
+
+def send_emails(emails, backend, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+                retry_delay=RETRY_DELAY, progress=None, cancel_event=None, priorities=None):
+    """
+    Deliver emails through the backend using at most min(concurrency, backend.max_concurrency)
+    threads. A failed send is retried up to `retries` times with exponential backoff,
+    unless the error is one of backend.permanent_errors. Each email sent is recorded as
+    an "emailed" analytics event.
+    :param progress: called as progress(report) after each email (from a worker thread)
+    :param cancel_event: threading.Event; once set, emails not yet started are skipped
+    :param priorities: dict country -> priority, recorded with the analytics events
+    :return: OutreachReport
+    """
+    report = OutreachReport(len(emails))
+    cancel_event = cancel_event or threading.Event()
+    priorities = priorities or {}
+    lock = threading.Lock()
+    pending = queue.Queue()
+    for email in emails:
+        pending.put(email)
+
+    def finished(email, error=None, latency_ms=None):
+        with lock:
+            if error is None:
+                report.sent.append(email)
+            else:
+                report.failed.append((email, error))
+        if error is None:
+            contact = email.contact
+            analytics_writer.record(contact[0], contact[4], "emailed", contact_level=contact[5],
+                                    priority=priorities.get(contact[4]), latency_ms=latency_ms)
+        if progress:
+            progress(report)
+
+    def worker():
+        try:
+            backend.thread_init()
+        except Exception as e:
+            init_error = str(e)
+        else:
+            init_error = None
+        while not cancel_event.is_set():
+            try:
+                email = pending.get_nowait()
+            except queue.Empty:
+                return
+            if init_error is not None:
+                finished(email, init_error)
+                continue
+            started = time.perf_counter()
+            error = _send_with_retries(backend, email, retries, retry_delay, cancel_event)
+            finished(email, error, (time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker, name=f"Outreach-{i}", daemon=True)
+               for i in range(max(1, min(concurrency, backend.max_concurrency, len(emails))))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        backend.close()
+    report.cancelled = cancel_event.is_set() and report.processed < report.total
+    return report
+
+
+def _send_with_retries(backend, email, retries, retry_delay, cancel_event):
+    """ :return: None if sent, else the last error message """
+    for attempt in range(retries + 1):
+        try:
+            with span("send_email", "mail", backend=backend.name, attempt=attempt):
+                backend.send(email)
+            return None
+        except backend.permanent_errors as e:
+            return str(e) or type(e).__name__
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if attempt < retries and cancel_event.wait(retry_delay * 2 ** attempt):
+            break
+    return error
+
+
+def run_outreach(contacts, user_file, backend, progress=None, cancel_event=None, priorities=None,
+                 concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES):
+    """ build_emails() then send_emails(); meant to run on a worker thread. """
+    emails = build_emails(contacts, user_file)
+    return send_emails(emails, backend, concurrency, retries, progress=progress,
+                       cancel_event=cancel_event, priorities=priorities)
@@ -0,0 +1,276 @@
+"""
+Headless entry point: the reminder and the contact store without the Qt GUI.
+
+    python -m rollodex pick [-n 3] [--notifier stdout|desktop|file --directory DIR]
+    python -m rollodex import contacts.csv
+    python -m rollodex export contacts.json [--analytics]
+    python -m rollodex stats [--range last_30_days]
+    python -m rollodex dedupe [--threshold 0.85] [--merge]
+    python -m rollodex daemon [--notifier desktop]
+    python -m rollodex --db shared.db serve [--port 8765]
+    python -m rollodex --db shared.db --token SECRET serve --host 0.0.0.0
+
+With --service URL (or ROLLODEX_DB_SERVICE) commands use a database service started
+with `serve` instead of opening the file (see db_service.py).
+
+The daemon shows a reminder on the day(s)/time set in the settings (shared with the
+GUI, re-read every wake-up) and records the same analytics events as the GUI.
+Set ROLLODEX_STARTUP_REPORT=1 to print import times and peak RSS, as for main.py.
+With --trace FILE the command's database, mail and calendar timings are saved as a
+Chrome trace (see tracing.py).
+"""
+import startup_profile
+startup_profile.start()  # times the imports below when ROLLODEX_STARTUP_REPORT=1
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+import database
+import db_connection
+import tracing
+from analytics_writer import analytics_writer
+from database import get_data_versions, get_analytics_summary, analytics_date_range
+from notifiers import NOTIFIERS, create_notifier
+from sampler import build_sampler, DEFAULT_COUNTRY_PRIORITY
+from scheduler import next_fire_time, timer_delay_ms, MAX_TIMER_INTERVAL, MISSED_GRACE
+from settings_store import settings_store
+
+# Tables whose changes make the daemon reload its contacts before the next reminder.
+SAMPLER_TABLES = ("contacts", "country_priority")
+
+STATS_RANGES = ["all", "last_7_days", "last_30_days", "this_quarter", "this_year"]
+
+
+def remind(sampler, notifier, count=1, record=True):
+    """
+    Pick `count` contacts the way the GUI notification does (MainWindow.notify_with),
+    record the "selected" events and hand each contact to the notifier.
+    :return: the picked contacts
+    """
+    contacts = sampler.pick_many(count)
+    for contact in contacts:
+        if record:
+            priority = sampler.priorities.get(contact[4], DEFAULT_COUNTRY_PRIORITY)
+            analytics_writer.record(contact[0], contact[4], "selected", contact_level=contact[5], priority=priority)
+            sampler.mark_contacted(contact[0])
+        notifier.notify(contact)
+    return contacts
+
+
+# =============================================================================
+# Commands
+# =============================================================================
+def command_pick(args):
+    sampler = build_sampler(settings_store.get().cooldown_days)
+    contacts = remind(sampler, create_notifier(args.notifier, args.directory), args.count, record=not args.dry_run)
+    if not contacts:
+        print("No contacts available to notify." if not len(sampler) else
+              f"Every contact was contacted in the last {settings_store.get().cooldown_days} days.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_import(args):
+    from contact_io import import_contacts
+    report = import_contacts(args.path)
+    print(report.summary())
+    for number, reason in report.invalid[:20]:
+        print(f"  record {number}: {reason}", file=sys.stderr)
+    return 0
+
+
+def command_export(args):
+    from contact_io import export_contacts, export_analytics
+    count = (export_analytics if args.analytics else export_contacts)(args.path)
+    print(f"Exported {count} {'events' if args.analytics else 'contacts'} to {args.path}.")
+    return 0
+
+
+def command_stats(args):
+    rows = get_analytics_summary(*analytics_date_range(args.range))
+    print(f"{'Country':24s} {'Selected':>9s} {'Emailed':>9s}")
+    for country, selected, emailed in rows:
+        print(f"{country or '(none)':24s} {selected:9d} {emailed:9d}")
+    print(f"{'Total':24s} {sum(row[1] for row in rows):9d} {sum(row[2] for row in rows):9d}")
+    return 0
+
+
+def command_dedupe(args):
+    from dedupe import find_duplicates, group_duplicates
+    pairs = find_duplicates(args.threshold)
+    for pair in pairs:
+        print(f"{pair.score:5.0%}  {pair.first[0]:>6d} {pair.first[1]} <{pair.first[3] or ''}>  =  "
+              f"{pair.second[0]:>6d} {pair.second[1]} <{pair.second[3] or ''}>  ({', '.join(pair.reasons)})")
+    groups = group_duplicates(pairs)
+    print(f"{len(pairs)} possible duplicate pairs in {len(groups)} groups.", file=sys.stderr)
+    if args.merge and groups:
+        with database.write_batch():
+            for group in groups:
+                database.merge_contacts(group[0], group[1:])
+        print(f"Merged {sum(len(group) - 1 for group in groups)} contacts into {len(groups)}.", file=sys.stderr)
+    return 0
+
+
+def command_daemon(args):
+    daemon = ReminderDaemon(create_notifier(args.notifier, args.directory))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    if args.now:
+        daemon.fire()
+    daemon.run()
+    return 0
+
+
+def command_serve(args):
+    from db_service import DatabaseService
+    service = DatabaseService(args.host, args.port, token=args.token)
+    print(f"Serving {db_connection.DB_NAME} at {service.url}", file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+class ReminderDaemon:
+    """
+    Sleeps until the next configured reminder time, like gui.NotificationScheduler:
+    sleeps are capped at MAX_TIMER_INTERVAL and checked against the wall clock, and a
+    reminder missed by more than MISSED_GRACE (machine asleep) is skipped.
+    The contacts are reloaded only when data_versions shows they changed.
+    """
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self.sampler = None
+        self.sampler_versions = None
+        self.sampler_cooldown = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        settings = settings_store.reload()
+        next_fire = next_fire_time(settings.frequency, settings.time, datetime.now())
+        try:
+            while not self._stop.is_set():
+                now = datetime.now()
+                if next_fire is not None and now >= next_fire:
+                    missed_by = now - next_fire
+                    next_fire = next_fire_time(settings.frequency, settings.time, now)
+                    if missed_by <= MISSED_GRACE:
+                        self.fire()
+                if next_fire is None:  # no days configured: just watch the settings
+                    self._stop.wait(MAX_TIMER_INTERVAL.total_seconds())
+                else:
+                    self._stop.wait(timer_delay_ms(next_fire, datetime.now()) / 1000)
+                # Pick up changes made in the GUI (or another process) since the last wake-up.
+                changed = settings_store.reload()
+                if (changed.frequency, changed.time) != (settings.frequency, settings.time):
+                    next_fire = next_fire_time(changed.frequency, changed.time, datetime.now())
+                settings = changed
+        finally:
+            self.notifier.close()
+            analytics_writer.close()
+
+    def fire(self):
+        try:
+            if not remind(self.current_sampler(), self.notifier):
+                print(f"{datetime.now():%Y-%m-%d %H:%M} no contact to remind about", file=sys.stderr)
+        except Exception as e:  # keep running; the next reminder may work
+            print(f"{datetime.now():%Y-%m-%d %H:%M} reminder failed: {e}", file=sys.stderr)
+
+    def current_sampler(self):
+        versions = {name: version for name, version in get_data_versions().items() if name in SAMPLER_TABLES}
+        cooldown = settings_store.get().cooldown_days
+        if self.sampler is None or versions != self.sampler_versions or cooldown != self.sampler_cooldown:
+            self.sampler = build_sampler(cooldown)
+            self.sampler_versions, self.sampler_cooldown = versions, cooldown
+        return self.sampler
+
+
+# =============================================================================
+# Command line
+# =============================================================================
+def build_parser():
+    parser = argparse.ArgumentParser(prog="rollodex", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help=f"database file (default: {db_connection.DB_NAME})")
+    parser.add_argument("--service", default=None, help="URL of a database service, e.g. http://127.0.0.1:8765")
+    parser.add_argument("--token", default=None, help="database service token (default: ROLLODEX_DB_SERVICE_TOKEN)")
+    parser.add_argument("--trace", default=None, metavar="FILE", help="save timings as Chrome trace JSON on exit")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_notifier_options(command):
+        command.add_argument("--notifier", choices=list(NOTIFIERS), default="stdout")
+        command.add_argument("--directory", help="where the file notifier writes reminders")
+
+    pick = commands.add_parser("pick", help="pick contact(s) to reach out to now")
+    pick.add_argument("-n", "--count", type=int, default=1)
+    pick.add_argument("--dry-run", action="store_true", help="don't record the pick or start a cooldown")
+    add_notifier_options(pick)
+    pick.set_defaults(handler=command_pick)
+
+    import_ = commands.add_parser("import", help="import contacts from .csv, .json, .jsonl or .vcf")
+    import_.add_argument("path")
+    import_.set_defaults(handler=command_import)
+
+    export = commands.add_parser("export", help="export contacts (or analytics events) to a file")
+    export.add_argument("path")
+    export.add_argument("--analytics", action="store_true")
+    export.set_defaults(handler=command_export)
+
+    stats = commands.add_parser("stats", help="selected/emailed counts per country")
+    stats.add_argument("--range", choices=STATS_RANGES, default="all")
+    stats.set_defaults(handler=command_stats)
+
+    dedupe = commands.add_parser("dedupe", help="list (and merge) likely duplicate contacts")
+    dedupe.add_argument("--threshold", type=float, default=0.85, help="lowest score reported, 0 to 1")
+    dedupe.add_argument("--merge", action="store_true", help="merge each group into its oldest contact")
+    dedupe.set_defaults(handler=command_dedupe)
+
+    daemon = commands.add_parser("daemon", help="run in the background and remind on schedule")
+    daemon.add_argument("--now", action="store_true", help="also remind once at start")
+    add_notifier_options(daemon)
+    daemon.set_defaults(handler=command_daemon)
+
+    serve = commands.add_parser("serve", help="share the database file with other copies of the app")
+    serve.add_argument("--host", default="127.0.0.1", help="other than a loopback address requires --token")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(handler=command_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        db_connection.configure(args.db)
+    args.token = args.token or os.environ.get("ROLLODEX_DB_SERVICE_TOKEN")
+    if args.command == "serve":
+        database.use_service(None)  # the service itself always opens the file
+    elif args.service:
+        database.use_service(args.service, args.token)
+    if args.trace:
+        tracing.enable()
+    startup_profile.mark("ready")
+    startup_profile.finish()
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        analytics_writer.close()
+        if args.trace:
+            print(f"Saved {tracing.export_chrome_trace(args.trace)} spans to {args.trace}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
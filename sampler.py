@@ -0,0 +1,264 @@
+import calendar
+import heapq
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from database import get_all_contacts, get_country_priorities, get_recently_contacted
+
+# Preferred order when picking within a country: First Contact > Second Contact > Third Contact.
+LEVEL_ORDER = ["First Contact", "Second Contact", "Third Contact"]
+
+# Priority assumed for countries without an entry in country_priority.
+DEFAULT_COUNTRY_PRIORITY = 3
+
+
+def parse_timestamp(timestamp):
+    """ "YYYY-MM-DD HH:MM:SS" UTC (as stored in analytics) -> seconds since the epoch. """
+    return calendar.timegm(time.strptime(timestamp[:19], "%Y-%m-%d %H:%M:%S"))
+
+
+def country_weight(priority):
+    """ Lower numeric priority means higher importance; we use (6 - priority) as weight. """
+    return max(6 - priority, 0)
+
+
+class AliasTable:
+    """
+    Vose's alias method: O(n) to build, O(1) per weighted draw.
+    """
+
+    def __init__(self, items, weights, rng=random):
+        self.items = list(items)
+        self.rng = rng
+        n = len(self.items)
+        total = float(sum(weights))
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        if n == 0 or total <= 0:
+            self.items = []
+            return
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in large + small:  # leftovers are 1.0 up to rounding error
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self):
+        if not self.items:
+            return None
+        u = self.rng.random() * len(self.items)
+        i = int(u)
+        return self.items[i] if u - i < self.prob[i] else self.items[self.alias[i]]
+
+
+class _Bucket:
+    """ Set of contact ids with O(1) add, remove and uniform random choice. """
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, contact_id):
+        if contact_id not in self.positions:
+            self.positions[contact_id] = len(self.ids)
+            self.ids.append(contact_id)
+
+    def remove(self, contact_id):
+        position = self.positions.pop(contact_id, None)
+        if position is None:
+            return
+        last = self.ids.pop()
+        if last != contact_id:
+            self.ids[position] = last
+            self.positions[last] = position
+
+    def choice(self, rng):
+        return self.ids[int(rng.random() * len(self.ids))]
+
+
+class ContactSampler:
+    """
+    Weighted random contact selection used for notifications.
+    A country is drawn with weight (6 - priority) among countries that have contacts,
+    then a contact is drawn uniformly from the best contact level present in it.
+    Contacts are kept in per-country / per-level buckets that are updated incrementally,
+    and the country alias table is rebuilt only when the set of countries or their
+    priorities change, so a pick is O(1).
+
+    With a cooldown (seconds), a contact selected or emailed less than `cooldown` ago
+    is taken out of the buckets and put in a min-heap keyed by the time it becomes
+    eligible again; each pick first moves the contacts whose time has come back into
+    the buckets, so excluding them costs O(log n) per contact rather than a scan.
+    """
+
+    def __init__(self, contacts=(), priorities=(), rng=None, last_contacted=None, cooldown=0, clock=time.time):
+        """
+        :param last_contacted: {contact_id: "YYYY-MM-DD HH:MM:SS" UTC}, e.g. from
+                               database.get_recently_contacted
+        :param cooldown: seconds after a contact before the contact may be picked again
+        :param clock: returns the current time in seconds since the epoch
+        """
+        self.rng = rng or random.Random()
+        self.cooldown = cooldown
+        self.clock = clock
+        self.load(contacts, priorities, last_contacted)
+
+    def load(self, contacts, priorities, last_contacted=None):
+        """
+        Replace all state.
+        :param contacts: tuples (id, name, position, email, country, contact_level)
+        :param priorities: tuples (country, priority)
+        :param last_contacted: {contact_id: "YYYY-MM-DD HH:MM:SS" UTC}
+        """
+        self.contacts = {}
+        self.countries = {}  # country -> {"all": _Bucket, level: _Bucket, ...}, eligible contacts only
+        self.priorities = dict(priorities)
+        self._alias = None
+        self._cooling = {}  # contact_id -> time it becomes eligible
+        self._heap = []  # (eligible time, contact_id); entries not matching _cooling are stale
+        last_contacted = last_contacted or {}
+        for contact in contacts:
+            contacted = last_contacted.get(contact[0])
+            self.add_contact(contact, None if contacted is None else parse_timestamp(contacted) + self.cooldown)
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def cooling_count(self):
+        """ Number of contacts currently inside the cooldown. """
+        self._release_eligible()
+        return len(self._cooling)
+
+    # ---- incremental updates ----
+
+    def add_contact(self, contact, eligible_at=None):
+        """ Add or replace a contact; it is not picked before `eligible_at` (seconds since the epoch). """
+        if contact[0] in self.contacts:
+            self.remove_contact(contact[0])
+        self.contacts[contact[0]] = contact
+        if eligible_at is not None and eligible_at > self.clock():
+            self._cooling[contact[0]] = eligible_at
+            heapq.heappush(self._heap, (eligible_at, contact[0]))
+            if len(self._heap) > 2 * len(self._cooling) + 64:
+                self._compact_heap()
+        else:
+            self._index(contact)
+
+    def remove_contact(self, contact_id):
+        contact = self.contacts.pop(contact_id, None)
+        if contact is None:
+            return
+        if self._cooling.pop(contact_id, None) is None:
+            self._unindex(contact)
+        # A heap entry for it is skipped when it reaches the top.
+
+    def update_contact(self, contact):
+        self.add_contact(contact, self._cooling.get(contact[0]))
+
+    def mark_contacted(self, contact_id, when=None):
+        """ Start the cooldown of a contact who was just selected or emailed. """
+        contact = self.contacts.get(contact_id)
+        if contact is not None and self.cooldown > 0:
+            self.add_contact(contact, (self.clock() if when is None else when) + self.cooldown)
+
+    def set_country_priority(self, country, priority):
+        self.priorities[country] = priority
+        if country in self.countries:
+            self._alias = None
+
+    def _index(self, contact):
+        buckets = self.countries.get(contact[4])
+        if buckets is None:
+            buckets = self.countries[contact[4]] = {"all": _Bucket()}
+            self._alias = None
+        buckets["all"].add(contact[0])
+        buckets.setdefault(contact[5], _Bucket()).add(contact[0])
+
+    def _unindex(self, contact):
+        buckets = self.countries[contact[4]]
+        buckets["all"].remove(contact[0])
+        buckets[contact[5]].remove(contact[0])
+        if not buckets["all"]:
+            del self.countries[contact[4]]
+            self._alias = None
+
+    def _release_eligible(self):
+        """ Move contacts whose cooldown has ended back into the buckets. """
+        heap = self._heap
+        if not heap:
+            return
+        now = self.clock()
+        while heap and heap[0][0] <= now:
+            eligible_at, contact_id = heapq.heappop(heap)
+            if self._cooling.get(contact_id) == eligible_at:
+                del self._cooling[contact_id]
+                self._index(self.contacts[contact_id])
+
+    def _compact_heap(self):
+        self._heap = [(eligible_at, contact_id) for contact_id, eligible_at in self._cooling.items()]
+        heapq.heapify(self._heap)
+
+    # ---- selection ----
+
+    def _country_table(self):
+        if self._alias is None:
+            countries = list(self.countries)
+            weights = [country_weight(self.priorities.get(country, DEFAULT_COUNTRY_PRIORITY))
+                       for country in countries]
+            self._alias = AliasTable(countries, weights, self.rng)
+        return self._alias
+
+    def pick(self):
+        """ Return one contact tuple, or None if there are no (eligible) contacts. """
+        self._release_eligible()
+        country = self._country_table().sample()
+        if country is None:
+            return None
+        buckets = self.countries[country]
+        for level in LEVEL_ORDER:
+            bucket = buckets.get(level)
+            if bucket:
+                return self.contacts[bucket.choice(self.rng)]
+        # Fallback: choose any contact
+        return self.contacts[buckets["all"].choice(self.rng)]
+
+    def pick_many(self, count):
+        """
+        Pick up to `count` distinct contacts, e.g. this week's outreach list.
+        Each pick follows the same country/level weighting as pick().
+        """
+        picked = []
+        while len(picked) < count:
+            contact = self.pick()
+            if contact is None:
+                break
+            picked.append(contact)
+            self.remove_contact(contact[0])
+        for contact in picked:
+            self.add_contact(contact)
+        return picked
+
+
+def build_sampler(cooldown_days=0):
+    """
+    Load a ContactSampler with every contact, the country priorities and the contacts
+    still inside a cooldown of `cooldown_days` days (reads the database; call off the GUI thread).
+    """
+    since = (datetime.now(timezone.utc) - timedelta(days=cooldown_days)).strftime("%Y-%m-%d %H:%M:%S")
+    last_contacted = get_recently_contacted(since) if cooldown_days > 0 else {}
+    return ContactSampler(get_all_contacts(), get_country_priorities(),
+                          last_contacted=last_contacted, cooldown=cooldown_days * 86400)
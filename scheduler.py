@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Longest single timer interval. The timer is re-armed at least this often so that
+# sleep/resume and wall-clock changes are noticed without polling.
+MAX_TIMER_INTERVAL = timedelta(minutes=10)
+
+# A notification that was missed (machine asleep, clock moved forward) is still shown
+# if we notice it within this window; otherwise it is skipped until the next occurrence.
+MISSED_GRACE = timedelta(hours=6)
+
+
+def next_fire_time(frequency, time_str, after):
+    """
+    Computes the next notification time strictly after `after`.
+    :param frequency: list of day names (e.g. ["Monday", "Thursday"]) or a comma separated string
+    :param time_str: time of day in "HH:MM" format
+    :param after: naive local datetime to search from
+    :return: datetime of the next notification, or None if no days are configured
+    """
+    if isinstance(frequency, str):
+        frequency = frequency.split(",")
+    weekdays = {DAY_NAMES.index(day.strip().capitalize()) for day in frequency
+                if day.strip().capitalize() in DAY_NAMES}
+    if not weekdays or not time_str:
+        return None
+
+    hour, minute = (int(part) for part in time_str.split(":"))
+    for offset in range(8):
+        day = after + timedelta(days=offset)
+        candidate = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate.weekday() in weekdays and candidate > after:
+            return candidate
+    return None
+
+
+def timer_delay_ms(target, now):
+    """
+    Milliseconds to arm a single-shot timer for, capped at MAX_TIMER_INTERVAL.
+    """
+    delay = min(target - now, MAX_TIMER_INTERVAL)
+    return max(0, int(delay.total_seconds() * 1000))
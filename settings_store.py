@@ -0,0 +1,96 @@
+import threading
+from dataclasses import dataclass, replace
+
+from database import get_settings, set_settings
+from db_connection import on_database_switch
+from migrations import DEFAULT_COOLDOWN_DAYS
+
+
+@dataclass(frozen=True)
+class Settings:
+    """ Typed view of the single row in the settings table. """
+    frequency: tuple = ()           # day names, e.g. ("Monday", "Thursday")
+    time: str = "13:00"             # "HH:MM", local time
+    template_path: str = "user.json"
+    cooldown_days: int = DEFAULT_COOLDOWN_DAYS  # before a contacted person is picked again
+
+
+class SettingsStore:
+    """
+    Keeps the settings in memory after the first read and writes changes through to
+    SQLite. Subscribers are called with the new Settings after every update.
+    Updates may come from any thread: each one reads, persists and caches the settings
+    under the lock, and subscribers are called after it is released.
+    """
+
+    def __init__(self):
+        self._settings = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """ Return the current Settings, loading them from the database on first use. """
+        if self._settings is None:
+            with self._lock:
+                if self._settings is None:
+                    self._settings = self._read()
+        return self._settings
+
+    def _read(self):
+        frequency, time_str, template_path, cooldown_days = get_settings()
+        return Settings(tuple(frequency), time_str, template_path, cooldown_days)
+
+    def update(self, **changes):
+        """
+        Change one or more fields, persist them and notify subscribers.
+        Example: store.update(frequency=["Monday"], time="09:30")
+        """
+        if "frequency" in changes:
+            changes["frequency"] = tuple(changes["frequency"])
+        with self._lock:
+            current = self._settings if self._settings is not None else self._read()
+            settings = replace(current, **changes)
+            if settings == current:
+                self._settings = current
+                return settings
+            set_settings(list(settings.frequency), settings.time, settings.template_path, settings.cooldown_days)
+            self._settings = settings
+        self._publish()
+        return settings
+
+    def reload(self):
+        """ Re-read the database, e.g. after another process changed the settings. """
+        with self._lock:
+            previous = self._settings
+            settings = self._settings = self._read()
+        if previous is not None and settings != previous:
+            self._publish()
+        return settings
+
+    def invalidate(self):
+        """ Forget the cached settings; the next get() reads them again. Subscribers aren't called. """
+        with self._lock:
+            self._settings = None
+
+    def _publish(self):
+        # With the settings current at this point, so subscribers of two racing updates
+        # both end up with the later one, whatever order they are called in.
+        with self._lock:
+            settings = self._settings
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(settings)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+
+# Shared instance used by the GUI and the scheduler.
+settings_store = SettingsStore()
+on_database_switch(settings_store.invalidate)
@@ -0,0 +1,142 @@
+"""
+Startup time report, enabled by setting ROLLODEX_STARTUP_REPORT=1.
+
+main.py imports this module first and calls start(), which times every module
+imported afterwards (own time and cumulative time including its imports, like
+python -X importtime). mark() records named milestones such as the first window
+being shown, and report() prints both to stderr, with the peak resident set size.
+main.py (GUI) and rollodex.py (headless) both report, so the two can be compared.
+"""
+import os
+import sys
+import time
+
+_started = time.perf_counter()
+
+ENABLED = os.environ.get("ROLLODEX_STARTUP_REPORT", "") not in ("", "0")
+
+# Modules listed in the report (slowest first).
+REPORT_TOP_MODULES = 15
+
+
+class _TimedLoader:
+    def __init__(self, loader, profile):
+        self.loader = loader
+        self.profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        profile = self.profile
+        profile._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - started
+            children = profile._stack.pop()
+            if profile._stack:
+                profile._stack[-1] += total
+            profile.imports[module.__name__] = (total - children, total)
+
+
+class _TimingFinder:
+    """ Meta path finder that wraps the loaders found by the remaining finders. """
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self.profile)
+                return spec
+        return None
+
+
+def peak_rss_bytes():
+    """ Peak resident set size of this process, or None where it can't be read. """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+class StartupProfile:
+    def __init__(self):
+        self.imports = {}      # module -> (own seconds, cumulative seconds)
+        self.milestones = []   # (label, seconds since process start)
+        self._stack = []
+        self._finder = None
+
+    def start(self):
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def stop(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def mark(self, label):
+        self.milestones.append((label, time.perf_counter() - _started))
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        print("Startup report", file=file)
+        for label, seconds in self.milestones:
+            print(f"  {seconds * 1000:8.1f} ms  {label}", file=file)
+        peak = peak_rss_bytes()
+        if peak is not None:
+            print(f"  Peak RSS: {peak / 2 ** 20:.1f} MiB, {len(sys.modules)} modules loaded", file=file)
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        print(f"  Slowest imports (cumulative / own, ms) of {len(self.imports)}:", file=file)
+        for name, (own, total) in slowest[:REPORT_TOP_MODULES]:
+            print(f"  {total * 1000:8.1f} {own * 1000:8.1f}  {name}", file=file)
+
+
+profile = StartupProfile()
+
+
+def start():
+    if ENABLED:
+        profile.start()
+
+
+def mark(label):
+    if ENABLED:
+        profile.mark(label)
+
+
+def finish():
+    """ Stop timing imports and print the report. """
+    if ENABLED:
+        profile.stop()
+        profile.report()
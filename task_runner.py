@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait as wait_futures
+from typing import Callable, Generic, Optional, TypeVar
+
+from PySide6.QtCore import QObject, Signal
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Task(Generic[T]):
+    """
+    Handle for work submitted to a TaskRunner. Wraps a concurrent.futures.Future whose
+    result is the function's return value, plus the timings written to the task log.
+    """
+
+    def __init__(self, name, key=None, write=False):
+        self.name = name
+        self.key = key
+        self.write = write
+        self.future = None
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """
+        Cancel the task: it won't start if it hasn't yet, and if it is running its
+        callbacks won't be called.
+        """
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def cancelled(self) -> bool:
+        """ Also useful inside long-running functions, to stop early. """
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> T:
+        """ Block until the task finished and return its value (or raise its error). """
+        return self.future.result(timeout)
+
+    @property
+    def wait_ms(self):
+        return None if self.started_at is None else (self.started_at - self.submitted_at) * 1000
+
+    @property
+    def run_ms(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at) * 1000
+
+
+class _Dispatcher(QObject):
+    """ Lives in the GUI thread; signals emitted from workers are delivered there (queued). """
+    finished = Signal(object, object, object)  # task, on_result, on_error
+    progress = Signal(object, object, object)  # task, on_progress, value
+
+
+class TaskRunner:
+    """
+    Runs blocking work (database queries, file and COM calls) on a thread pool and
+    delivers results back on the Qt GUI thread.
+
+        task_runner.submit(search_contacts, name="ann", key="contact-search",
+                           on_result=self.show_ids, on_error=self.show_error)
+
+    Submitting a task with the same `key` as an unfinished one cancels the older one,
+    so only the latest of a series of requests (e.g. filter queries while typing)
+    reaches its callback. Tasks that change data are submitted with write=True, so
+    shutdown() finishes them instead of cancelling them. Each task's queue and run time is logged at DEBUG level
+    (logger "task_runner"), failures without an on_error callback at ERROR level.
+    The TaskRunner must be created on the GUI thread.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._latest = {}  # key -> most recent Task with that key
+        self._active = set()  # tasks not finished yet
+        self._dispatcher = _Dispatcher()
+        self._dispatcher.finished.connect(self._deliver)
+        self._dispatcher.progress.connect(self._deliver_progress)
+
+    def submit(self, function: Callable[..., T], *args, key=None, name=None, write=False,
+               on_result: Optional[Callable[[T], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               on_progress: Optional[Callable[[object], None]] = None, **kwargs) -> Task[T]:
+        """
+        Run function(*args, **kwargs) on a worker thread.
+        :param key: tasks with the same key supersede each other (older ones are cancelled)
+        :param name: label for the task log (default: the function's name)
+        :param write: the task saves something; shutdown() waits for it rather than cancelling it
+        :param on_result: called on the GUI thread with the return value
+        :param on_error: called on the GUI thread with the exception
+        :param on_progress: if given, the function also receives a `progress` keyword
+            argument; values passed to it are delivered to on_progress on the GUI thread
+        :return: Task
+        """
+        task = Task(name or getattr(function, "__name__", "task"), key, write)
+        if on_progress is not None:
+            kwargs["progress"] = lambda value: self._dispatcher.progress.emit(task, on_progress, value)
+        previous = None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="TaskRunner")
+            if key is not None:
+                previous = self._latest.get(key)
+                self._latest[key] = task
+            task.future = self._executor.submit(self._run, task, function, args, kwargs)
+            self._active.add(task)
+        # Outside the lock: cancelling a queued future runs its done callback right here.
+        if previous is not None:
+            previous.cancel()
+        task.future.add_done_callback(lambda future: self._finished(task, on_result, on_error))
+        return task
+
+    def shutdown(self, wait=True, write_timeout=30.0):
+        """
+        Stop the pool. Queued tasks are cancelled, except writes: those, queued or
+        running, are waited for (up to write_timeout seconds) so that quitting right
+        after a save doesn't lose it. Other running tasks finish in the background
+        unless `wait`. Their callbacks are not called.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            active = list(self._active)
+            self._latest.clear()
+        for task in active:
+            if not task.write:
+                task.cancel()
+        writes = [task for task in active if task.write]
+        if writes:
+            not_done = wait_futures([task.future for task in writes], write_timeout).not_done
+            if not_done:
+                dropped = [task.name for task in writes if task.future in not_done]
+                logger.error("%d write task(s) still unfinished at shutdown after %g s, their changes may be lost: %s",
+                             len(dropped), write_timeout, ", ".join(dropped))
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _finished(self, task, on_result, on_error):
+        with self._lock:
+            self._active.discard(task)
+        self._dispatcher.finished.emit(task, on_result, on_error)
+
+    def _run(self, task, function, args, kwargs):
+        if task.cancelled():
+            raise CancelledError()
+        task.started_at = time.perf_counter()
+        try:
+            with span(task.name, "task", wait_ms=round(task.wait_ms, 3)):
+                return function(*args, **kwargs)
+        finally:
+            task.finished_at = time.perf_counter()
+
+    def _deliver(self, task, on_result, on_error):
+        with self._lock:
+            if task.key is not None and self._latest.get(task.key) is task:
+                del self._latest[task.key]
+        if task.cancelled() or task.future.cancelled():
+            logger.debug("%s: cancelled", task.name)
+            return
+        error = task.future.exception()
+        if error is None:
+            logger.debug("%s: waited %.1f ms, ran %.1f ms", task.name, task.wait_ms, task.run_ms)
+            if on_result is not None:
+                on_result(task.future.result())
+        elif on_error is not None:
+            logger.debug("%s: failed after %.1f ms: %s", task.name, task.run_ms or 0.0, error)
+            on_error(error)
+        else:
+            logger.error("%s failed", task.name, exc_info=error)
+
+    def _deliver_progress(self, task, on_progress, value):
+        if not task.cancelled():
+            on_progress(value)
+
+
+# Shared runner used by the GUI pages (created when gui.py is imported, on the GUI thread).
+task_runner = TaskRunner()
@@ -0,0 +1,3 @@
+"""
+Tests of the pure logic modules and the schema migrations (python -m pytest).
+"""
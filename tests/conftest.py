@@ -0,0 +1,12 @@
+import pytest
+
+import db_connection
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """ A new, migrated database file in place of contacts.db for the duration of a test. """
+    previous = db_connection.DB_NAME
+    db_connection.configure(str(tmp_path / "contacts.db"))
+    yield db_connection.get_connection()
+    db_connection.configure(previous)
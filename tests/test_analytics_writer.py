@@ -0,0 +1,90 @@
+import sqlite3
+import time
+
+import pytest
+
+import analytics_writer as module
+from analytics_writer import CLOSE_ATTEMPTS, AnalyticsWriter
+from database import add_contact_to_db
+
+
+@pytest.fixture
+def contact_id(fresh_db):
+    return add_contact_to_db("Ann Lee", "", "ann@example.com", "USA", "First Contact")
+
+
+@pytest.fixture
+def writer(fresh_db):
+    writer = AnalyticsWriter(flush_size=3, flush_interval=0.01)
+    yield writer
+    writer.close()
+
+
+def _event_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM analytics").fetchone()[0]
+
+
+def _failing_writes(monkeypatch, failures):
+    """ Makes the next `failures` writes raise; returns the list of events actually written. """
+    written, calls = [], []
+
+    def record_contact_events(events):
+        calls.append(events)
+        if len(calls) <= failures:
+            raise sqlite3.OperationalError("database is locked")
+        written.extend(events)
+    monkeypatch.setattr(module, "record_contact_events", record_contact_events)
+    return written
+
+
+def test_a_full_batch_is_written_without_waiting(fresh_db, contact_id):
+    writer = AnalyticsWriter(flush_size=3, flush_interval=60)
+    for _ in range(3):
+        writer.record(contact_id, "USA", "selected")
+    deadline = time.monotonic() + 5
+    while _event_count(fresh_db) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _event_count(fresh_db) == 3
+    writer.record(contact_id, "USA", "emailed")
+    time.sleep(0.1)
+    assert _event_count(fresh_db) == 3  # waits for the interval or a full batch
+    assert writer.flush(timeout=5)
+    assert _event_count(fresh_db) == 4
+    assert writer.close()
+
+
+def test_flush_writes_what_is_pending(fresh_db, contact_id, writer):
+    assert writer.flush()  # nothing recorded yet
+    writer.record(contact_id, "USA", "emailed", contact_level="First Contact", priority=2, latency_ms=12.5)
+    assert writer.flush(timeout=5)
+    assert fresh_db.execute("SELECT contact_id, event_type, country, contact_level, priority, latency_ms "
+                            "FROM analytics").fetchall() == [(contact_id, "emailed", "USA", "First Contact", 2, 12.5)]
+
+
+def test_close_retries_a_failed_write(monkeypatch, writer):
+    written = _failing_writes(monkeypatch, CLOSE_ATTEMPTS - 1)
+    writer.flush_interval = 60  # only close() writes
+    writer.record(1, "USA", "selected")
+    writer.flush_interval = 0.01  # the pause between close()'s attempts
+    assert writer.close(timeout=10)
+    assert len(written) == 1 and writer.lost_events == 0
+
+
+def test_close_counts_events_it_could_not_write(monkeypatch, writer):
+    written = _failing_writes(monkeypatch, CLOSE_ATTEMPTS)
+    writer.flush_interval = 60
+    writer.record(1, "USA", "selected")
+    writer.record(1, "USA", "emailed")
+    writer.flush_interval = 0.01
+    assert not writer.close(timeout=10)
+    assert written == [] and writer.lost_events == 2
+    assert not writer.flush()
+
+
+def test_events_recorded_after_close_are_written_or_counted_as_lost(monkeypatch, fresh_db, contact_id, writer):
+    assert writer.close()
+    writer.record(contact_id, "USA", "selected")
+    assert _event_count(fresh_db) == 1 and writer.lost_events == 0
+    _failing_writes(monkeypatch, 1)
+    writer.record(contact_id, "USA", "selected")
+    assert writer.lost_events == 1 and not writer.close()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytz = pytest.importorskip("pytz")
+
+from calendar_provider import CalendarProvider, FreeSlotCache, compute_free_slots, merge_intervals  # noqa: E402
+
+LONDON = pytz.timezone("Europe/London")
+
+
+def at(day, hour, minute=0, tz=LONDON):
+    return tz.localize(datetime(2025, 3, day, hour, minute))
+
+
+def test_merge_intervals():
+    assert merge_intervals([(5, 7), (1, 3), (2, 4), (4, 5), (9, 10)]) == [(1, 7), (9, 10)]
+
+
+def test_free_slots_skip_today_and_weekends():
+    # Friday 2025-03-07; the next working days are Monday and Tuesday.
+    slots = compute_free_slots([], at(7, 8), at(11, 23))
+    assert slots == [(at(10, 9), at(10, 17)), (at(11, 9), at(11, 17))]
+
+
+def test_busy_time_is_removed_and_slots_are_aligned():
+    busy = [(at(10, 10, 10), at(10, 11)), (at(10, 10, 45), at(10, 12, 5)), (at(10, 16, 50), at(10, 18))]
+    slots = compute_free_slots(busy, at(9, 12), at(10, 23))
+    assert slots == [(at(10, 9), at(10, 10)), (at(10, 12, 30), at(10, 16, 30))]
+
+
+def test_gaps_shorter_than_the_granularity_are_dropped():
+    busy = [(at(10, 9), at(10, 12, 10)), (at(10, 12, 30), at(10, 17))]
+    assert compute_free_slots(busy, at(9, 12), at(10, 23)) == []
+
+
+def test_end_time_cuts_the_last_window():
+    assert compute_free_slots([], at(9, 12), at(10, 13)) == [(at(10, 9), at(10, 13))]
+
+
+def test_working_hours_across_a_dst_change():
+    # British Summer Time starts on Sunday 2025-03-30: 09:00 is 09:00 UTC before and 08:00 UTC after.
+    hours = {weekday: [("09:00", "10:00")] for weekday in range(7)}
+    slots = compute_free_slots([], at(28, 12), at(31, 23), working_hours=hours, granularity=timedelta(hours=1))
+    assert [start.astimezone(pytz.utc).hour for start, _ in slots] == [9, 8, 8]
+    assert [start.hour for start, _ in slots] == [9, 9, 9]
+
+
+class FakeProvider(CalendarProvider):
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def get_busy_slots(self, start, end):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return []
+
+    def get_user_name(self):
+        return "Ann Lee"
+
+
+def test_free_slot_cache_fetches_once_while_fresh():
+    provider = FakeProvider()
+    cache = FreeSlotCache(provider, ttl=300)
+    slots, user_name = cache.get(timeout=5)
+    assert user_name == "Ann Lee" and slots
+    assert cache.get(timeout=5) == (slots, user_name)
+    assert provider.calls == 1
+
+
+def test_free_slot_cache_raises_the_provider_error_when_nothing_is_cached():
+    cache = FreeSlotCache(FakeProvider(OSError("Outlook is not running")))
+    with pytest.raises(OSError, match="Outlook is not running"):
+        cache.get(timeout=5)
@@ -0,0 +1,78 @@
+import io
+import json
+
+import pytest
+
+import contact_io
+from contact_io import export_contacts, import_contacts, read_contacts, validate_contact
+from database import add_contact_to_db, get_all_contacts
+
+CONTACTS = [
+    ("Ann Lee", "Head of Sales, EMEA; Berlin", "ann@example.com", "Germany", "First Contact"),
+    ("Jürgen Öztürk", "Line one\nline two \\ backslash", "jurgen@example.de", "Côte d'Ivoire", "Second Contact"),
+    ("Bob Ray", "", "", "USA", "Third Contact"),
+]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".json", ".jsonl", ".vcf"])
+def test_export_then_read_round_trips(fresh_db, tmp_path, extension):
+    for contact in CONTACTS:
+        add_contact_to_db(*contact)
+    path = str(tmp_path / f"contacts{extension}")
+    assert export_contacts(path) == len(CONTACTS)
+    read = [(c.get("name"), c.get("position", ""), c.get("email") or "", c.get("country"), c.get("level"))
+            for c in read_contacts(path)]
+    assert read == CONTACTS
+
+
+def test_vcard_values_are_escaped(fresh_db, tmp_path):
+    add_contact_to_db(*CONTACTS[0])
+    path = tmp_path / "contacts.vcf"
+    export_contacts(str(path))
+    assert b"TITLE:Head of Sales\\, EMEA\\; Berlin\r\n" in path.read_bytes()
+
+
+def test_folded_vcard_lines_are_joined(tmp_path):
+    path = tmp_path / "contacts.vcf"
+    path.write_text("BEGIN:VCARD\r\nFN:Ann\r\n  Lee\r\nEMAIL;TYPE=work:ann@example.com\r\n"
+                    "ADR;TYPE=work:;;Street;City;;12345;Germany\r\nEND:VCARD\r\n", encoding="utf-8")
+    assert list(read_contacts(str(path))) == [{"name": "Ann Lee", "email": "ann@example.com", "country": "Germany"}]
+
+
+def test_json_arrays_are_read_incrementally():
+    records = [{"Full Name": f"Contact {i}", "id": 10 ** i} for i in range(20)]
+    file = io.StringIO(json.dumps(records, indent=1))
+    assert list(contact_io._iter_json_array(file, chunk_size=7)) == records
+    with pytest.raises(ValueError):
+        list(contact_io._iter_json_array(io.StringIO('[{"name": "Ann"}, {"name"'), chunk_size=7))
+
+
+@pytest.mark.parametrize("contact, reason", [
+    ({"email": "ann@example.com", "country": "USA"}, "missing name"),
+    ({"name": "Ann", "email": "not an email", "country": "USA"}, "invalid email"),
+    ({"name": "Ann", "email": "ann@example.com"}, "missing country"),
+    ({"name": "Ann", "email": "ann@example.com", "country": "USA", "level": "Boss"}, "unknown contact level 'Boss'"),
+])
+def test_invalid_contacts_are_rejected(contact, reason):
+    assert validate_contact(contact) == (None, reason)
+
+
+def test_contacts_without_an_email_are_valid():
+    assert validate_contact({"name": "Ann", "country": "USA", "level": "second contact"}) == \
+        (("Ann", "", "", "USA", "Second Contact"), None)
+
+
+def test_import_skips_duplicates_and_invalid_rows(fresh_db, tmp_path):
+    add_contact_to_db("Ann Lee", "", "ann@example.com", "USA", "First Contact")
+    path = tmp_path / "contacts.csv"
+    path.write_text("Full Name,E-mail,Country,Title\n"
+                    "Ann Lee,ANN@example.com,USA,\n"      # already in the database
+                    "Bob Ray,bob@example.com,UK,CTO\n"
+                    "Bob Ray,bob@example.com,UK,CTO\n"    # earlier in the file
+                    "No Email,,France,\n"
+                    "Also No Email,,France,\n"
+                    ",nobody@example.com,Spain,\n", encoding="utf-8")
+    report = import_contacts(str(path))
+    assert (report.inserted, report.duplicates, report.invalid) == (3, 2, [(6, "missing name")])
+    assert {contact[1]: contact[3] for contact in get_all_contacts()} == {
+        "Ann Lee": "ann@example.com", "Bob Ray": "bob@example.com", "No Email": None, "Also No Email": None}
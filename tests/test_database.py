@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from database import add_contact_to_db, get_all_contacts, search_contacts
+
+
+def test_level_added_by_a_rolled_back_insert_is_not_reused(fresh_db):
+    add_contact_to_db("Ann Lee", "", "ann@example.com", "USA", "First Contact")
+    # A new level is inserted, then the duplicate email rolls the whole insert back.
+    with pytest.raises(sqlite3.IntegrityError):
+        add_contact_to_db("Bob Ray", "", "ann@example.com", "USA", "Boss")
+    contact_id = add_contact_to_db("Cy Doe", "", "cy@example.com", "UK", "Boss")
+    assert (contact_id, "Cy Doe", "", "cy@example.com", "UK", "Boss") in get_all_contacts()
+
+
+@pytest.fixture
+def contacts(fresh_db):
+    rows = [("Jürgen Öztürk", "Head of R&D", "jurgen@example.de", "Germany", "First Contact"),
+            ('Ann "The Boss" Lee', "50% owner", "ann@example.com", "USA", "Second Contact"),
+            ("Bob O'Neil", "CTO", "bob@example.com", "UK", "First Contact")]
+    return [add_contact_to_db(*row) for row in rows]
+
+
+def test_search_uses_the_trigram_index_for_longer_filters(contacts):
+    jurgen, ann, bob = contacts
+    assert search_contacts(name="ÖZTÜ") == [jurgen]
+    assert search_contacts(email="example.com") == [ann, bob]
+    assert search_contacts(name="lee", position="owner") == [ann]
+    assert search_contacts(name="zzz") == []
+
+
+def test_short_filters_fold_non_ascii_case(contacts):
+    jurgen, ann, bob = contacts
+    assert search_contacts(name="Ö") == search_contacts(name="ö") == [jurgen]
+    assert search_contacts(name="o") == [ann, bob]  # no accent folding
+    assert search_contacts(position="r&") == [jurgen]
+
+
+def test_search_escapes_quotes_and_special_characters(contacts):
+    jurgen, ann, bob = contacts
+    assert search_contacts(name='"the boss"') == [ann]
+    assert search_contacts(name='"t') == [ann]
+    assert search_contacts(name="o'neil") == search_contacts(name="'n") == [bob]
+    assert search_contacts(position="50%") == search_contacts(position="%") == [ann]
+    assert search_contacts(name="*") == search_contacts(name="lee OR") == []
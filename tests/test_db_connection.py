@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db_connection
+from db_connection import get_connection, transaction
+
+
+def _deferred_foreign_key(conn):
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)")
+
+
+def test_failed_commit_is_rolled_back(fresh_db):
+    _deferred_foreign_key(fresh_db)
+    with pytest.raises(sqlite3.IntegrityError):
+        with transaction() as conn:
+            conn.execute("INSERT INTO child VALUES (1)")  # only checked at COMMIT
+    conn = get_connection()
+    assert not conn.in_transaction
+    with transaction() as conn:
+        conn.execute("INSERT INTO parent VALUES (1)")
+        conn.execute("INSERT INTO child VALUES (1)")
+    assert conn.execute("SELECT COUNT(*) FROM child").fetchone()[0] == 1
+
+
+def test_error_in_block_rolls_back_and_is_raised(fresh_db):
+    with pytest.raises(KeyError):
+        with transaction() as conn:
+            conn.execute("CREATE TABLE t (x)")
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise KeyError("boom")
+    assert get_connection().execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchone() is None
+
+
+def test_nested_transactions_commit_once(fresh_db):
+    with transaction() as conn:
+        conn.execute("CREATE TABLE t (x)")
+        with transaction():
+            conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.in_transaction
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+
+
+def test_switching_files_leaves_other_threads_connections_open(fresh_db, tmp_path):
+    opened, switched, done = threading.Event(), threading.Event(), threading.Event()
+    results = []
+
+    def worker():
+        conn = get_connection()
+        with transaction():
+            conn.execute("CREATE TABLE t (x)")
+            opened.set()
+            switched.wait(5)
+            conn.execute("INSERT INTO t VALUES (1)")  # still the old file, still open
+        results.append(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+        results.append(get_connection() is not conn)  # reopened on the next call
+        done.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    opened.wait(5)
+    db_connection.configure(str(tmp_path / "other.db"))
+    switched.set()
+    done.wait(5)
+    thread.join()
+    assert results == [1, True]
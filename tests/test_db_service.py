@@ -0,0 +1,90 @@
+import http.client
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from db_connection import ServiceError
+from db_service import MAX_REQUEST_BYTES, DatabaseService, ServiceClient
+
+
+@pytest.fixture
+def service(fresh_db):
+    service = DatabaseService(port=0, token="secret").start()
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def client(service):
+    return ServiceClient(service.url, token="secret", timeout=10)
+
+
+def _contact(name, email):
+    return (name, "", email, "USA", "First Contact")
+
+
+def test_failing_call_rolls_back_only_its_own_savepoint(service):
+    group = [("add_contact_to_db", _contact("Ann Lee", "ann@example.com"), {}, Future()),
+             ("add_contact_to_db", _contact("Bob Ray", "ann@example.com"), {}, Future()),  # duplicate email
+             ("add_contact_to_db", _contact("Cy Doe", "cy@example.com"), {}, Future())]
+    service._commit(group)
+    assert isinstance(group[1][3].exception(), sqlite3.IntegrityError)
+    assert group[0][3].result() == 1 and group[2][3].result() is not None
+    assert [contact[1] for contact in service.database.get_all_contacts()] == ["Ann Lee", "Cy Doe"]
+    assert service.status()["commits"] == 1
+
+
+def test_errors_are_raised_with_their_own_type(client):
+    client.call("add_contact_to_db", _contact("Ann Lee", "ann@example.com"))
+    with pytest.raises(sqlite3.IntegrityError):
+        client.call("add_contact_to_db", _contact("Bob Ray", "ann@example.com"))
+
+
+def test_cached_reads_are_invalidated_by_writes(service, client):
+    contact_id = client.call("add_contact_to_db", _contact("Ann Lee", "ann@example.com"))
+    assert client.call("get_contact", (contact_id,))[1] == "Ann Lee"
+    assert client.call("get_contact", (contact_id,))[1] == "Ann Lee"
+    assert service.status()["cache_hits"] == 1
+    client.call("update_contact_in_db", (contact_id, "Ann Smith", "", "ann@example.com", "USA", "First Contact"))
+    assert client.call("get_contact", (contact_id,))[1] == "Ann Smith"
+
+
+def test_changes_returns_when_something_is_committed(service, client):
+    generation = client.status()["generation"]
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(client.wait_for_changes(generation, timeout=10)))
+    waiter.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    ServiceClient(service.url, token="secret").call("add_contact_to_db", _contact("Ann Lee", "ann@example.com"))
+    waiter.join(10)
+    assert time.monotonic() - started < 5
+    assert results[0]["generation"] != generation
+    assert results[0]["versions"]["contacts"] >= 1
+
+
+def test_changes_rejects_malformed_parameters(service):
+    connection = http.client.HTTPConnection(*service.server.server_address[:2], timeout=10)
+    connection.request("GET", "/changes?since=abc", headers={"X-Rollodex-Token": "secret"})
+    assert connection.getresponse().status == 400
+
+
+def test_requests_need_the_token(service):
+    with pytest.raises(ServiceError, match="403"):
+        ServiceClient(service.url, token="wrong").status()
+
+
+def test_oversized_requests_are_refused(service):
+    connection = http.client.HTTPConnection(*service.server.server_address[:2], timeout=10)
+    connection.putrequest("POST", "/rpc")
+    connection.putheader("Content-Length", str(MAX_REQUEST_BYTES + 1))
+    connection.endheaders()
+    assert connection.getresponse().status == 413
+
+
+def test_serving_off_loopback_needs_a_token():
+    with pytest.raises(ValueError, match="without a token"):
+        DatabaseService(host="0.0.0.0", port=0)
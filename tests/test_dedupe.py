@@ -0,0 +1,79 @@
+from dedupe import DUPLICATE_THRESHOLD, blocking_keys, name_tokens, normalize_email, score, soundex
+
+
+def contact(contact_id, name, email="", country=""):
+    return (contact_id, name, "", email, country, "First Contact")
+
+
+def test_name_tokens_reorders_and_drops_titles_and_accents():
+    assert name_tokens("Dr. Smith, Zoë") == ["zoe", "smith"]
+    assert name_tokens("Jean-Luc Müller") == ["jean", "luc", "muller"]
+
+
+def test_name_tokens_keep_other_scripts():
+    assert name_tokens("Иван Петров") == ["иван", "петров"]
+    assert name_tokens("王小明") == ["王小明"]
+
+
+def test_soundex():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert soundex("Ashcraft") == "A261"
+    assert soundex("Иван") == ""
+
+
+def test_normalize_email():
+    assert normalize_email(" John.Smith+news@GoogleMail.com ") == ("johnsmith", "gmail.com")
+    assert normalize_email("j.smith+x@example.org") == ("j.smith", "example.org")
+    assert normalize_email("not an email") is None
+
+
+def test_same_email_scores_one():
+    assert score(contact(1, "John Smith", "JS@x.com"), contact(2, "Someone Else", "js@X.com"))[0] == 1.0
+
+
+def test_reordered_and_misspelled_names_are_duplicates():
+    assert score(contact(1, "John Smith"), contact(2, "Smith, Jon"))[0] >= DUPLICATE_THRESHOLD
+    assert score(contact(1, "John Smith"), contact(2, "John Smtih"))[0] >= DUPLICATE_THRESHOLD
+
+
+def test_different_non_latin_names_are_not_duplicates():
+    value, reasons = score(contact(1, "Иван Петров", "ivan@a.ru", "Russia"),
+                           contact(2, "Ольга Смирнова", "ivan@b.ru", "Russia"))
+    assert value < DUPLICATE_THRESHOLD
+    assert "same name" not in reasons
+
+
+def test_same_non_latin_name_is_a_duplicate():
+    assert score(contact(1, "Иван Петров"), contact(2, "Петров, Иван"))[0] >= DUPLICATE_THRESHOLD
+
+
+def test_missing_names_are_no_evidence():
+    value, reasons = score(contact(1, "", "ann@a.com"), contact(2, "", "ann@b.com"))
+    assert value < DUPLICATE_THRESHOLD
+    assert "same name" not in reasons
+
+
+def test_blocking_keys_share_a_key_for_reordered_names():
+    assert blocking_keys("John Smith", "") & blocking_keys("Smith, Jon", "")
+
+
+def test_blocking_keys_have_no_empty_soundex_keys():
+    keys = blocking_keys("Иван Петров", "ivan@example.ru")
+    assert not any(key.startswith(("p:", "d:")) for key in keys)
+    assert not blocking_keys("Иван Петров", "") & blocking_keys("Ольга Смирнова", "")
+
+
+def test_find_duplicates_and_similar(fresh_db):
+    from database import add_contacts_to_db
+    from dedupe import find_duplicates, find_similar, group_duplicates
+    add_contacts_to_db([
+        ("John Smith", "", "john.smith@example.com", "UK", "First Contact"),
+        ("Ann Lee", "", "ann@example.com", "USA", "First Contact"),
+        ("Smith, Jon", "", "john.smith@other.org", "UK", "Second Contact"),
+        ("Иван Петров", "", "ivan@a.ru", "Russia", "First Contact"),
+        ("Ольга Смирнова", "", "ivan@b.ru", "Russia", "First Contact"),
+    ])
+    pairs = find_duplicates()
+    assert [(pair.first[0], pair.second[0]) for pair in pairs] == [(1, 3)]
+    assert group_duplicates(pairs) == [[1, 3]]
+    assert {pair.second[0] for pair in find_similar("Jon Smith", "", "UK")} == {1, 3}
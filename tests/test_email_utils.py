@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+pytest.importorskip("pytz")
+
+import email_utils  # noqa: E402
+from email_utils import email_body, render_emails  # noqa: E402
+
+
+class StaticSlotCache:
+    def get(self):
+        return [], "Sam"
+
+
+@pytest.fixture
+def user_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_utils, "get_free_slot_cache", StaticSlotCache)
+    path = tmp_path / "user.json"
+    path.write_text(json.dumps({
+        "email_body": "Dear {recipient_name}, regards {user_name}",
+        "templates": [{"name": "UK", "country": "UK", "body": "Hello {recipient_name}"},
+                      {"name": "UK follow-up", "country": "UK", "contact_level": "Second Contact",
+                       "body": "Hello again {recipient_name} ({contact_level})"}]}), encoding="utf-8")
+    return str(path)
+
+
+def test_email_body_uses_the_template_for_the_country_and_level(user_file):
+    assert email_body("Ann", "USA", user_file) == "Dear Ann, regards Sam"
+    assert email_body("Ann", "UK", user_file) == "Hello Ann"
+    assert email_body("Ann", "UK", user_file, "Second Contact") == "Hello again Ann (Second Contact)"
+
+
+def test_email_body_matches_render_emails(user_file):
+    contact = (1, "Ann", "CTO", "ann@example.com", "UK", "Second Contact")
+    assert email_body(contact[1], contact[4], user_file, contact[5]) == render_emails([contact], user_file)[0][2]
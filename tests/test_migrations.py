@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+import database
+import db_connection
+from migrations import SCHEMA_VERSION
+
+# The schema and data of contacts.db before versioned migrations (schema version 0).
+BASELINE_SCHEMA = """
+CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, position TEXT, email TEXT,
+                       country TEXT, priority TEXT);
+CREATE TABLE settings (id INTEGER PRIMARY KEY AUTOINCREMENT, frequency TEXT, time TEXT);
+CREATE TABLE country_priority (id INTEGER PRIMARY KEY AUTOINCREMENT, country TEXT UNIQUE, priority INTEGER);
+CREATE TABLE analytics (id INTEGER PRIMARY KEY AUTOINCREMENT, contact_id INTEGER, event_type TEXT,
+                        country TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP);
+INSERT INTO contacts VALUES (1, 'NeMatic', 'Manager', 'matic@email.com', 'USA', 'Second Contact');
+INSERT INTO contacts VALUES (2, 'Ne Matic', '', 'Matic@Email.com ', '', 'First Contact');
+INSERT INTO contacts VALUES (3, 'Иван Петров', 'Economist', 'ivan@example.ru', 'Russia', NULL);
+INSERT INTO settings VALUES (26, 'Monday', '00:00');
+INSERT INTO country_priority VALUES (2, 'Canada', 2), (3, 'USA', 1);
+INSERT INTO analytics VALUES (1, 1, 'selected', 'USA', '2025-02-02 21:53:00');
+INSERT INTO analytics VALUES (2, 2, 'emailed', 'USA', '2025-02-03 09:00:00');
+INSERT INTO analytics VALUES (3, 3, 'selected', 'Russia', '2025-02-04 10:00:00');
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = str(tmp_path / "contacts.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    previous = db_connection.DB_NAME
+    db_connection.configure(path)
+    yield db_connection.get_connection()
+    db_connection.configure(previous)
+
+
+def test_baseline_is_migrated_to_the_current_version(baseline_db):
+    assert baseline_db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    # Contacts 1 and 2 share an email: 2 is merged into 1, which keeps its own fields.
+    assert database.get_all_contacts() == [
+        (1, "NeMatic", "Manager", "matic@email.com", "USA", "Second Contact"),
+        (3, "Иван Петров", "Economist", "ivan@example.ru", "Russia", "First Contact"),
+    ]
+    assert database.get_contact_analytics(1) == (1, 1, "2025-02-02 21:53:00", "2025-02-03 09:00:00")
+    assert sorted(database.get_analytics_summary()) == [("Russia", 1, 0), ("USA", 1, 1)]
+
+
+def test_contact_keys_are_built_for_existing_contacts(baseline_db):
+    from dedupe import KEYS_VERSION, blocking_keys
+    stored = {}
+    for key, contact_id in baseline_db.execute("SELECT key, contact_id FROM contact_keys"):
+        stored.setdefault(contact_id, set()).add(key)
+    assert stored == {1: blocking_keys("NeMatic", "matic@email.com"),
+                      3: blocking_keys("Иван Петров", "ivan@example.ru")}
+    assert baseline_db.execute("SELECT version FROM contact_keys_version").fetchone()[0] == KEYS_VERSION
+
+
+def test_events_without_a_contact_skip_the_contact_rollup(baseline_db):
+    rows = baseline_db.execute("SELECT COUNT(*) FROM analytics_contact_rollup").fetchone()[0]
+    database.record_contact_events([(None, "selected", "USA", "2025-03-01 10:00:00", None, None, None)])
+    assert baseline_db.execute("SELECT COUNT(*) FROM analytics_contact_rollup").fetchone()[0] == rows
+    assert ("USA", 2, 1) in database.get_analytics_summary()
+
+
+def test_contacts_never_emailed_keep_null_last_emailed(baseline_db):
+    database.record_contact_events([(3, "selected", "Russia", "2025-03-01 10:00:00", None, None, None)])
+    assert baseline_db.execute("SELECT last_selected, last_emailed, last_contacted FROM analytics_contact_rollup "
+                               "WHERE contact_id = 3").fetchone() == ("2025-03-01 10:00:00", None, "2025-03-01 10:00:00")
@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from mail_backends import MailBackend, OutgoingEmail, OutlookBackend
+from outreach import send_emails
+
+
+def email(contact_id):
+    return OutgoingEmail((contact_id, "Ann Lee", "", "ann@example.com", "USA", "First Contact"),
+                         "ann@example.com", "Hello", "Body")
+
+
+class FailingBackend(MailBackend):
+    name = "failing"
+    permanent_errors = (PermissionError,)
+
+    def __init__(self, error):
+        self.error = error
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def send(self, email):
+        with self.lock:
+            self.attempts += 1
+        raise self.error
+
+
+class TimingOutSession:
+    def __init__(self):
+        self.calls = 0
+
+    def create_mail(self, to, subject, body, display=True):
+        self.calls += 1
+        raise FutureTimeoutError()
+
+
+def test_transient_errors_are_retried():
+    backend = FailingBackend(ConnectionError("connection reset"))
+    report = send_emails([email(1)], backend, retries=2, retry_delay=0)
+    assert backend.attempts == 3
+    assert [(sent.contact[0], error) for sent, error in report.failed] == [(1, "connection reset")]
+    assert not report.sent
+
+
+def test_permanent_errors_are_not_retried():
+    backend = FailingBackend(PermissionError("recipient refused"))
+    report = send_emails([email(1), email(2)], backend, retries=2, retry_delay=0)
+    assert backend.attempts == 2
+    assert report.processed == 2 and len(report.failed) == 2
+
+
+def test_outlook_session_timeouts_are_not_retried():
+    session = TimingOutSession()
+    report = send_emails([email(1)], OutlookBackend(session=session), retries=2, retry_delay=0)
+    assert session.calls == 1
+    assert report.failed[0][1] == "TimeoutError"
+
+
+def test_cancelled_batch_skips_the_rest():
+    cancel = threading.Event()
+    cancel.set()
+    report = send_emails([email(1), email(2)], FailingBackend(OSError()), cancel_event=cancel)
+    assert report.processed == 0 and report.cancelled
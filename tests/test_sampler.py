@@ -0,0 +1,73 @@
+import random
+from collections import Counter
+
+from sampler import AliasTable, ContactSampler, parse_timestamp
+
+DAY = 86400
+
+
+def contact(contact_id, country, level="First Contact"):
+    return (contact_id, f"Contact {contact_id}", "", f"c{contact_id}@example.com", country, level)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_alias_table_follows_the_weights():
+    table = AliasTable("abc", [1, 2, 7], random.Random(1))
+    counts = Counter(table.sample() for _ in range(20000))
+    assert abs(counts["a"] / 20000 - 0.1) < 0.02
+    assert abs(counts["b"] / 20000 - 0.2) < 0.02
+    assert abs(counts["c"] / 20000 - 0.7) < 0.02
+
+
+def test_alias_table_never_draws_zero_weights():
+    table = AliasTable("abc", [0, 3, 0], random.Random(2))
+    assert {table.sample() for _ in range(1000)} == {"b"}
+    assert AliasTable("ab", [0, 0]).sample() is None
+    assert AliasTable([], []).sample() is None
+
+
+def test_pick_prefers_the_best_level_in_a_country():
+    sampler = ContactSampler([contact(1, "USA", "Third Contact"), contact(2, "USA", "Second Contact")],
+                             [("USA", 1)], rng=random.Random(3))
+    assert {sampler.pick()[0] for _ in range(100)} == {2}
+
+
+def test_pick_weights_countries_by_priority():
+    sampler = ContactSampler([contact(1, "USA"), contact(2, "Chile")], [("USA", 1), ("Chile", 5)],
+                             rng=random.Random(4))
+    counts = Counter(sampler.pick()[0] for _ in range(12000))
+    assert abs(counts[1] / 12000 - 5 / 6) < 0.02
+
+
+def test_recently_contacted_are_held_back_until_the_cooldown_ends():
+    clock = Clock(parse_timestamp("2025-03-10 12:00:00"))
+    sampler = ContactSampler([contact(1, "USA"), contact(2, "USA")], [("USA", 1)], rng=random.Random(5),
+                             last_contacted={1: "2025-03-09 12:00:00"}, cooldown=2 * DAY, clock=clock)
+    assert sampler.cooling_count() == 1
+    assert {sampler.pick()[0] for _ in range(50)} == {2}
+    clock.now += DAY
+    assert sampler.cooling_count() == 0
+    assert {sampler.pick()[0] for _ in range(50)} == {1, 2}
+
+
+def test_mark_contacted_starts_the_cooldown():
+    clock = Clock(1_000_000)
+    sampler = ContactSampler([contact(1, "USA")], [("USA", 1)], cooldown=DAY, clock=clock)
+    sampler.mark_contacted(1)
+    assert sampler.pick() is None
+    clock.now += DAY
+    assert sampler.pick()[0] == 1
+
+
+def test_pick_many_returns_distinct_contacts_and_keeps_them():
+    sampler = ContactSampler([contact(i, "USA") for i in range(5)], [("USA", 1)], rng=random.Random(6))
+    picked = sampler.pick_many(10)
+    assert sorted(entry[0] for entry in picked) == [0, 1, 2, 3, 4]
+    assert len(sampler) == 5 and sampler.pick() is not None
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from scheduler import MAX_TIMER_INTERVAL, next_fire_time, timer_delay_ms
+
+# 2025-03-10 is a Monday.
+MONDAY_NOON = datetime(2025, 3, 10, 12, 0)
+
+
+def test_later_the_same_day():
+    assert next_fire_time(["Monday"], "15:30", MONDAY_NOON) == datetime(2025, 3, 10, 15, 30)
+
+
+def test_strictly_after():
+    assert next_fire_time(["Monday"], "12:00", MONDAY_NOON) == datetime(2025, 3, 17, 12, 0)
+
+
+def test_next_configured_day():
+    assert next_fire_time("Thursday, friday", "09:00", MONDAY_NOON) == datetime(2025, 3, 13, 9, 0)
+
+
+def test_wraps_to_next_week():
+    assert next_fire_time(["Sunday"], "08:00", datetime(2025, 3, 16, 9, 0)) == datetime(2025, 3, 23, 8, 0)
+
+
+def test_nothing_configured():
+    assert next_fire_time([], "09:00", MONDAY_NOON) is None
+    assert next_fire_time(["Someday"], "09:00", MONDAY_NOON) is None
+    assert next_fire_time(["Monday"], "", MONDAY_NOON) is None
+
+
+def test_timer_delay_is_capped_and_never_negative():
+    assert timer_delay_ms(MONDAY_NOON + timedelta(seconds=90), MONDAY_NOON) == 90000
+    assert timer_delay_ms(MONDAY_NOON + timedelta(days=2), MONDAY_NOON) == MAX_TIMER_INTERVAL.total_seconds() * 1000
+    assert timer_delay_ms(MONDAY_NOON - timedelta(minutes=5), MONDAY_NOON) == 0
@@ -0,0 +1,34 @@
+import tracing
+from tracing import Span, _percentile, operation_stats, span
+
+
+def test_percentile_is_nearest_rank():
+    assert _percentile([1, 2, 3, 4, 5], 0.50) == 3
+    assert _percentile(list(range(1, 10)), 0.50) == 5
+    assert _percentile(list(range(1, 101)), 0.95) == 95
+    assert _percentile(list(range(1, 101)), 0.99) == 99
+    assert _percentile([7], 0.99) == 7
+
+
+def test_operation_stats():
+    spans = [Span("load", "db", 0, duration_ms * 1_000_000, 1, None) for duration_ms in (4, 1, 3, 2, 5)]
+    spans.append(Span("send", "mail", 0, 100_000_000, 1, None))
+    send, load = operation_stats(spans)
+    assert (send.name, send.count, send.total_ms) == ("send", 1, 100.0)
+    assert (load.name, load.count, load.total_ms) == ("load", 5, 15.0)
+    assert (load.p50_ms, load.max_ms) == (3.0, 5.0)
+
+
+def test_spans_are_only_recorded_while_enabled():
+    tracing.clear()
+    with span("off"):
+        pass
+    tracing.enable()
+    try:
+        with span("on", "test", rows=3):
+            pass
+    finally:
+        tracing.disable()
+    recorded = tracing.get_spans()
+    tracing.clear()
+    assert [(entry.name, entry.category, entry.args) for entry in recorded] == [("on", "test", {"rows": 3})]
@@ -0,0 +1,199 @@
+"""
+Timing spans for finding out where the app spends its time (e.g. when it "hangs").
+
+    with span("load contacts", "ui", rows=500):
+        ...
+
+    @traced(category="calendar")
+    def get_free_time_slots(...): ...
+
+Every database function, the Outlook (COM) calls, calendar reads, mail sends, contact
+table loads, page builds and background tasks are instrumented. Recording is off until
+enable() is called or ROLLODEX_TRACE=1 is set; while off, a span costs one flag check.
+Spans go into a fixed-size ring buffer (a deque: appends are atomic, so threads record
+without a lock) and can be summarized per operation (operation_stats, shown on the
+GUI's diagnostics page, Ctrl+Shift+D) or saved as Chrome trace-event JSON
+(export_chrome_trace) for chrome://tracing or https://ui.perfetto.dev.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+# Spans kept; the oldest are dropped first.
+DEFAULT_CAPACITY = 50000
+
+# (name, category, start ns, duration ns, thread id, args dict or None)
+Span = namedtuple("Span", "name category start duration thread args")
+
+OperationStats = namedtuple("OperationStats", "name category count total_ms p50_ms p95_ms p99_ms max_ms")
+
+_enabled = os.environ.get("ROLLODEX_TRACE", "") not in ("", "0")
+_spans = deque(maxlen=DEFAULT_CAPACITY)
+_thread_names = {}  # thread id -> name, recorded with a thread's first span
+_origin = time.perf_counter_ns()
+
+
+# =============================================================================
+# Recording
+# =============================================================================
+def enable(capacity=None):
+    """
+    Start recording spans.
+    :param capacity: ring buffer size (spans kept); changing it drops what was recorded
+    """
+    global _enabled, _spans
+    if capacity is not None and capacity != _spans.maxlen:
+        _spans = deque(maxlen=capacity)
+    _enabled = True
+
+
+def disable():
+    """ Stop recording; spans recorded so far are kept. """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    _spans.clear()
+
+
+def _record(name, category, start, duration, args):
+    thread = threading.get_ident()
+    if thread not in _thread_names:
+        _thread_names[thread] = threading.current_thread().name
+    _spans.append(Span(name, category, start, duration, thread, args))
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        args = self.args if exc_type is None else {**(self.args or {}), "error": exc_type.__name__}
+        _record(self.name, self.category, self.start, duration, args)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category="app", **args):
+    """
+    Context manager timing its block as one span. Keyword arguments are stored with it
+    (shown in the trace viewer). Exceptions are recorded as args["error"] and re-raised.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, category, args or None)
+
+
+def traced(function=None, *, name=None, category="app"):
+    """
+    Decorator recording a span for every call, named after the function by default.
+    Usable bare (@traced) or with options (@traced(category="db")). For generator
+    functions only the call that creates the generator is timed.
+    """
+    def decorate(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def call(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            error = None
+            try:
+                return function(*args, **kwargs)
+            except BaseException as e:
+                error = {"error": type(e).__name__}
+                raise
+            finally:
+                _record(span_name, category, start, time.perf_counter_ns() - start, error)
+        return call
+
+    return decorate(function) if function is not None else decorate
+
+
+# =============================================================================
+# Reading
+# =============================================================================
+def get_spans():
+    """ A copy of the recorded spans, oldest first. """
+    return list(_spans.copy())  # deque.copy() runs without releasing the GIL
+
+
+def _percentile(ordered, fraction):
+    """ Nearest-rank percentile of a sorted list: the value at rank ceil(fraction * n). """
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def operation_stats(spans=None):
+    """
+    Per-operation duration statistics.
+    :param spans: list of Span (default: everything recorded)
+    :return: list of OperationStats, the operation with the most total time first
+    """
+    durations = {}
+    for recorded in get_spans() if spans is None else spans:
+        durations.setdefault((recorded.name, recorded.category), []).append(recorded.duration / 1e6)
+    stats = []
+    for (name, category), values in durations.items():
+        values.sort()
+        stats.append(OperationStats(name, category, len(values), sum(values), _percentile(values, 0.50),
+                                    _percentile(values, 0.95), _percentile(values, 0.99), values[-1]))
+    stats.sort(key=lambda entry: entry.total_ms, reverse=True)
+    return stats
+
+
+def chrome_trace(spans=None):
+    """ The spans as a Chrome trace-event document (complete "X" events, times in microseconds). """
+    spans = get_spans() if spans is None else spans
+    pid = os.getpid()
+    events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": thread, "args": {"name": name}}
+              for thread, name in list(_thread_names.items())]
+    for recorded in spans:
+        event = {"name": recorded.name, "cat": recorded.category, "ph": "X", "pid": pid, "tid": recorded.thread,
+                 "ts": (recorded.start - _origin) / 1000, "dur": recorded.duration / 1000}
+        if recorded.args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                             for key, value in recorded.args.items()}
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path, spans=None):
+    """
+    Write the spans as Chrome trace-event JSON.
+    :return: number of spans written
+    """
+    document = chrome_trace(spans)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file)
+    return sum(1 for event in document["traceEvents"] if event["ph"] == "X")